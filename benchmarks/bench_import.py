@@ -0,0 +1,134 @@
+"""Import-time benchmark for the meatball package and the app entry point.
+
+Each case imports a module (or runs streamlit_app.py once in bare mode) in
+a fresh interpreter, as a cold-starting container would. Interpreter
+startup is measured separately and subtracted. The slowest modules of each
+case, by self time, are taken from Python's -X importtime output.
+
+Results use the same layout as bench_music.py, so --compare works the same
+way.
+
+Usage:
+    python benchmarks/bench_import.py --output imports.json
+    python benchmarks/bench_import.py --compare imports.json --threshold 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_music import compare
+
+APP = os.path.join(ROOT, 'streamlit_app.py')
+CASES = {
+    'meatball': 'import meatball',
+    'meatball.music.sequence': 'import meatball.music.sequence',
+    'meatball.ui.session': 'import meatball.ui.session',
+    'meatball.ui.components': 'import meatball.ui.components',
+    'streamlit_app': f'import runpy; runpy.run_path({APP!r})',
+}
+TOP_MODULES = 10
+
+def _run(code: str) -> Tuple[float, str]:
+    """Run code in a fresh interpreter; return wall time and importtime output."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr}")
+    return elapsed, result.stderr
+
+def _slowest_modules(importtime: str) -> List[Dict[str, float]]:
+    """Modules with the largest self import time, in seconds."""
+    modules = []
+    for line in importtime.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append({'module': name.strip(), 'self': int(self_us) / 1e6,
+                        'cumulative': int(cumulative_us) / 1e6})
+    modules.sort(key=lambda module: module['self'], reverse=True)
+    return modules[:TOP_MODULES]
+
+def run_benchmarks(repeat: int) -> Tuple[Dict[str, Dict[str, float]], Dict[str, List[Dict[str, float]]]]:
+    """Time every case.
+
+    Args:
+        repeat: Fresh interpreters started per case
+
+    Returns:
+        Tuple of (timings in seconds per case, slowest modules per case)
+    """
+    # Warm the file system cache and bytecode before timing anything
+    for code in CASES.values():
+        _run(code)
+    startup = statistics.median(_run('pass')[0] for _ in range(repeat))
+
+    results = {}
+    slowest = {}
+    for name, code in CASES.items():
+        samples = []
+        for _ in range(repeat):
+            elapsed, importtime = _run(code)
+            samples.append(max(elapsed - startup, 0.0))
+        results[name] = {
+            'min': min(samples),
+            'median': statistics.median(samples),
+            'max': max(samples),
+            'calls': 1
+        }
+        slowest[name] = _slowest_modules(importtime)
+    results['interpreter_startup'] = {'min': startup, 'median': startup, 'max': startup, 'calls': 1}
+    return results, slowest
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='Write results as JSON to this file (default: stdout)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed relative slowdown before a case counts as regressed')
+    parser.add_argument('--repeat', type=int, default=5, help='Interpreters started per case')
+    args = parser.parse_args(argv)
+
+    results, slowest = run_benchmarks(args.repeat)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        },
+        'results': results,
+        'slowest_modules': slowest
+    }
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        report['regressions'] = compare(results, baseline, args.threshold)
+        for regression in report['regressions']:
+            print(f"REGRESSION {regression['name']}: {regression['baseline'] * 1e3:.1f} ms -> "
+                  f"{regression['current'] * 1e3:.1f} ms ({regression['ratio']:.2f}x)", file=sys.stderr)
+        status = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Micro-benchmarks for the music generation package.
+
+Times the theory helpers, the progression builders and sequence generation
+for every progression type while sweeping the number of chords, and writes
+the results as JSON. With --compare, the run is checked against a stored
+baseline and regressions beyond a threshold are reported (exit status 1).
+
+Usage:
+    python benchmarks/bench_music.py --output bench.json
+    python benchmarks/bench_music.py --compare baseline.json --threshold 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import meatball
+from meatball.music.theory import NOTES, CHORD_TYPES, get_scale_degrees, get_note_display
+from meatball.music.progressions import generate_two_five_one, generate_diatonic_cycle
+from meatball.music.sequence import generate_chord_sequence, generate_metronome_sequence
+
+PROGRESSION_TYPES = ['Random', 'II-V-I', 'Diatonic Cycle', 'Functional Harmony']
+CHORD_COUNTS = [4, 16, 128, 1_000, 10_000, 100_000, 1_000_000]
+QUICK_CHORD_COUNTS = [4, 16, 128, 1_000]
+
+def measure(func: Callable[[], Any], repeat: int = 5, min_time: float = 0.2) -> Dict[str, float]:
+    """Time a callable, calibrating the number of calls per sample like timeit.
+
+    Args:
+        func: Function to time
+        repeat: Number of samples
+        min_time: Minimum duration of one sample in seconds
+
+    Returns:
+        Dict with the number of calls per sample and the min/median/max time
+        per call in seconds
+    """
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    # Slow cases (e.g. a million chords) get fewer samples
+    if elapsed / number > 1.0:
+        repeat = min(repeat, 3)
+    samples = sorted(t / number for t in timer.repeat(repeat=repeat, number=number))
+    return {
+        'number': number,
+        'repeat': repeat,
+        'min': samples[0],
+        'median': samples[len(samples) // 2],
+        'max': samples[-1]
+    }
+
+def run_benchmarks(chord_counts: List[int], repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """Run every benchmark case.
+
+    Args:
+        chord_counts: Values of num_chords to sweep
+        repeat: Number of samples per case
+
+    Returns:
+        Timing results keyed by case name
+    """
+    results = {}
+    notes = list(NOTES)
+    chord_types = list(CHORD_TYPES)
+
+    def record(name: str, func: Callable[[], Any]) -> None:
+        results[name] = measure(func, repeat)
+        print(f"{name:50s} {results[name]['min'] * 1e6:14.2f} us", file=sys.stderr)
+
+    record('get_scale_degrees', lambda: [get_scale_degrees(note) for note in notes])
+    record('get_note_display', lambda: [get_note_display(note) for note in notes])
+    record('generate_two_five_one', lambda: [generate_two_five_one(note) for note in notes])
+    record('generate_diatonic_cycle', lambda: [generate_diatonic_cycle(note) for note in notes])
+
+    for num_chords in chord_counts:
+        for progression_type in PROGRESSION_TYPES:
+            record(
+                f'generate_chord_sequence[{progression_type}][{num_chords}]',
+                lambda: generate_chord_sequence(num_chords, progression_type, notes, chord_types, 2.0)
+            )
+        record(
+            f'generate_metronome_sequence[{num_chords}]',
+            lambda: generate_metronome_sequence(num_chords, 4, 0.5)
+        )
+    return results
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float
+) -> List[Dict[str, Any]]:
+    """Find cases that got slower than a baseline.
+
+    The fastest sample of each case is compared, as it is the least affected
+    by noise from the rest of the machine.
+
+    Args:
+        results: Results of the current run
+        baseline: Results of the baseline run
+        threshold: Allowed relative slowdown (0.2 means 20%)
+
+    Returns:
+        One entry per regressed case with both timings and the ratio
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['min'] / baseline[name]['min']
+        if ratio > 1.0 + threshold:
+            regressions.append({
+                'name': name,
+                'baseline': baseline[name]['min'],
+                'current': result['min'],
+                'ratio': ratio
+            })
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='Write results as JSON to this file (default: stdout)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed relative slowdown before a case counts as regressed')
+    parser.add_argument('--repeat', type=int, default=5, help='Samples per case')
+    parser.add_argument('--quick', action='store_true', help='Only sweep up to 1000 chords')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(QUICK_CHORD_COUNTS if args.quick else CHORD_COUNTS, args.repeat)
+    report = {
+        'meta': {
+            'meatball': meatball.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        },
+        'results': results
+    }
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        report['regressions'] = compare(results, baseline, args.threshold)
+        for regression in report['regressions']:
+            print(f"REGRESSION {regression['name']}: {regression['baseline'] * 1e6:.2f} us -> "
+                  f"{regression['current'] * 1e6:.2f} us ({regression['ratio']:.2f}x)", file=sys.stderr)
+        status = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Memory footprint of one user's Streamlit session state.
+
+Runs the app headless with Streamlit's AppTest, starts a practice session
+for a few settings and reports the deep size in bytes of everything the
+session keeps in st.session_state, the figure that multiplies with the
+number of concurrent users on one server.
+
+Usage:
+    python benchmarks/bench_session.py
+    python benchmarks/bench_session.py --output session.json
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest
+
+# (progression, number of chords or "endless") per scenario
+SCENARIOS = [
+    ('Random', '16'),
+    ('Random', '128'),
+    ('II-V-I', '128'),
+    ('Random', 'endless'),
+]
+
+def deep_sizeof(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """Approximate memory held by an object and everything it references.
+
+    Follows containers, object attributes and the frames of suspended
+    generators; objects reachable twice are counted once.
+
+    Args:
+        obj: Object to measure
+        seen: Ids of objects already counted
+
+    Returns:
+        Size in bytes
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, np.ndarray):
+        return size if obj.base is None else size + obj.nbytes
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, 'gi_frame'):
+        if obj.gi_frame is not None:
+            size += sum(deep_sizeof(v, seen) for v in obj.gi_frame.f_locals.values())
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+def measure_session(progression: str, chords: str) -> Dict[str, Any]:
+    """Start a practice session in a fresh app and measure its state.
+
+    Args:
+        progression: Progression type
+        chords: Number of chords, or "endless"
+
+    Returns:
+        Dict with the total size and the size of each session state entry
+    """
+    at = AppTest.from_file(os.path.join(ROOT, 'streamlit_app.py'), default_timeout=30)
+    at.query_params.update({'seed': '1', 'progression': progression, 'chords': chords})
+    at.run()
+    at.button(key='practice_button').click().run()
+    state = at.session_state.to_dict()
+    entries = {key: deep_sizeof(value) for key, value in state.items()}
+    return {
+        'progression': progression,
+        'chords': chords,
+        'total': deep_sizeof(state),
+        'entries': dict(sorted(entries.items(), key=lambda item: -item[1]))
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--top', type=int, default=5, help='Largest entries to list per scenario')
+    args = parser.parse_args(argv)
+
+    results = [measure_session(progression, chords) for progression, chords in SCENARIOS]
+    for result in results:
+        print(f"{result['progression']:>8} {result['chords']:>8} chords: {result['total']:>7} bytes")
+        for key, size in list(result['entries'].items())[:args.top]:
+            print(f"{'':>20}{key}: {size}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
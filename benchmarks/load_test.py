@@ -0,0 +1,220 @@
+"""Load test of the Streamlit app with many simulated users.
+
+Each simulated user drives its own headless copy of streamlit_app.py with
+Streamlit's AppTest:
+- changes notes, chord types, tempo and number of chords
+- starts practice
+- asks for further windows the way the player component does
+- stops and starts again
+
+AppTest keeps global runtime state, so users run concurrently in worker
+processes, one user at a time per process. Nothing needs a browser or the
+network.
+
+The report gives:
+- rerun latency percentiles, overall and per action
+- the size of the payload sent to the player component
+- each session's state size, and the process's memory growth per user
+
+Usage:
+    python benchmarks/load_test.py --users 50 --concurrency 8
+    python benchmarks/load_test.py --users 200 --output load.json
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from streamlit.testing.v1 import AppTest
+from bench_session import deep_sizeof
+from meatball.music.theory import NOTES, CHORD_TYPES
+from meatball.ui.session import MEASURES_PER_WINDOW
+
+APP = os.path.join(ROOT, 'streamlit_app.py')
+PERCENTILES = (50, 90, 99)
+
+class SimulatedUser:
+    """One browser session driving the app through a practice routine."""
+
+    def __init__(self, user_id: int, seed: int, timeout: float):
+        self.user_id = user_id
+        self.rng = random.Random(seed)
+        self.app = AppTest.from_file(APP, default_timeout=timeout)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.payloads: List[int] = []
+
+    def run(self, action: str, element: Optional[Any] = None) -> None:
+        """Rerun the app (through an element interaction, if given) and time it."""
+        start = time.perf_counter()
+        (element or self.app).run()
+        self.latencies[action].append((time.perf_counter() - start) * 1000.0)
+        if self.app.exception:
+            raise RuntimeError(f"User {self.user_id}: {action} failed: {self.app.exception[0].message}")
+        for component in self.app.get('component_instance'):
+            self.payloads.append(component.proto.ByteSize())
+
+    def slider(self, label: str) -> Any:
+        return next(slider for slider in self.app.slider if slider.label == label)
+
+    def play(self, windows: int) -> None:
+        """Request windows of measures like the player does while playing."""
+        state = self.app.session_state
+        for _ in range(windows):
+            if state.window_start is None:
+                return
+            state['player'] = {'session': state.practice_id,
+                               'need': state.window_start + MEASURES_PER_WINDOW}
+            self.run('player_request')
+
+    def routine(self, practices: int, windows: int) -> Dict[str, Any]:
+        """Run the full routine and return this user's measurements."""
+        self.run('load')
+        initial_state = deep_sizeof(self.app.session_state.to_dict())
+        for _ in range(practices):
+            for note in self.rng.sample(NOTES, 3):
+                self.run('toggle_note', self.app.checkbox(key=f'note_{note}').check())
+            for note in self.rng.sample(NOTES, 2):
+                self.run('toggle_note', self.app.checkbox(key=f'note_{note}').uncheck())
+            chord_type = self.rng.choice(list(CHORD_TYPES))
+            self.run('toggle_chord_type', self.app.checkbox(key=f'chord_{chord_type}').check())
+            self.run('set_bpm', self.slider('Tempo (BPM)').set_value(self.rng.randrange(60, 200)))
+            self.run('set_num_chords', self.slider('Number of Chords').set_value(self.rng.choice([32, 64, 128])))
+
+            self.run('start', self.app.button(key='practice_button').click())
+            self.play(windows)
+            self.run('set_bpm', self.slider('Tempo (BPM)').set_value(self.rng.randrange(60, 200)))
+            self.run('stop', self.app.button(key='practice_button').click())
+        self.run('start', self.app.button(key='practice_button').click())
+        final_state = deep_sizeof(self.app.session_state.to_dict())
+        return {
+            'latencies': dict(self.latencies),
+            'payloads': self.payloads,
+            'state_bytes': final_state,
+            'state_growth': final_state - initial_state
+        }
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    array = np.asarray(values, dtype=np.float64)
+    stats = {'count': len(array), 'mean': float(array.mean()), 'max': float(array.max())}
+    for percentile, value in zip(PERCENTILES, np.percentile(array, PERCENTILES)):
+        stats[f'p{percentile}'] = float(value)
+    return stats
+
+def _max_rss_bytes() -> int:
+    """Peak resident memory of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def _simulate_batch(
+    user_ids: List[int],
+    seed: int,
+    practices: int,
+    windows: int,
+    timeout: float
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Run users one after another in a worker process.
+
+    Returns:
+        Tuple of (each user's measurements, growth of the worker's peak
+        resident memory while running them, in bytes)
+    """
+    # Warm up imports and caches so the first user is not penalised
+    SimulatedUser(-1, seed, timeout).run('load')
+    rss_before = _max_rss_bytes()
+    results = [SimulatedUser(user_id, seed + user_id, timeout).routine(practices, windows)
+               for user_id in user_ids]
+    return results, _max_rss_bytes() - rss_before
+
+def run_load_test(
+    users: int,
+    concurrency: int,
+    practices: int = 2,
+    windows: int = 2,
+    seed: int = 0,
+    timeout: float = 60.0
+) -> Dict[str, Any]:
+    """Drive the app with many simulated users.
+
+    Args:
+        users: Number of simulated users
+        concurrency: Users running at the same time
+        practices: Practice sessions started per user
+        windows: Extra windows requested per practice session
+        seed: Seed of the users' random choices
+        timeout: Timeout of a single rerun in seconds
+
+    Returns:
+        Report with latency percentiles (ms), payload sizes (bytes), session
+        state sizes (bytes) and process memory growth
+    """
+    batches = [list(range(worker, users, concurrency)) for worker in range(concurrency)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(_simulate_batch, batches, [seed] * concurrency,
+                                 [practices] * concurrency, [windows] * concurrency,
+                                 [timeout] * concurrency))
+    elapsed = time.perf_counter() - start
+    results = [result for batch_results, _ in outcomes for result in batch_results]
+    rss_growth = sum(growth for _, growth in outcomes)
+
+    latencies = defaultdict(list)
+    for result in results:
+        for action, values in result['latencies'].items():
+            latencies[action].extend(values)
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        'users': users,
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'reruns_per_second': len(all_latencies) / elapsed,
+        'latency_ms': _percentiles(all_latencies),
+        'latency_ms_by_action': {action: _percentiles(values) for action, values in sorted(latencies.items())},
+        'payload_bytes': _percentiles([size for result in results for size in result['payloads']]),
+        'session_state_bytes': _percentiles([result['state_bytes'] for result in results]),
+        'session_state_growth_bytes': _percentiles([result['state_growth'] for result in results]),
+        'peak_rss_growth_bytes_per_user': rss_growth / users
+    }
+
+def _format_stats(stats: Dict[str, float], unit: str) -> str:
+    return '  '.join(f"{key}={stats[key]:.1f}{unit}" for key in ('mean', 'p50', 'p90', 'p99', 'max'))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20, help='Number of simulated users')
+    parser.add_argument('--concurrency', type=int, default=4, help='Users running at the same time')
+    parser.add_argument('--practices', type=int, default=2, help='Practice sessions per user')
+    parser.add_argument('--windows', type=int, default=2, help='Windows requested per practice session')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the simulated choices')
+    parser.add_argument('--output', help='Write the report as JSON to this file')
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args.users, args.concurrency, args.practices, args.windows, args.seed)
+    print(f"{report['users']} users, concurrency {report['concurrency']}: "
+          f"{report['seconds']:.1f} s, {report['reruns_per_second']:.1f} reruns/s")
+    print(f"rerun latency   {_format_stats(report['latency_ms'], ' ms')}")
+    for action, stats in report['latency_ms_by_action'].items():
+        print(f"  {action:<18}{_format_stats(stats, ' ms')}")
+    print(f"player payload  {_format_stats(report['payload_bytes'], ' B')}")
+    print(f"session state   {_format_stats(report['session_state_bytes'], ' B')}")
+    print(f"state growth    {_format_stats(report['session_state_growth_bytes'], ' B')}")
+    print(f"peak RSS growth {report['peak_rss_growth_bytes_per_user'] / 1024:.1f} KiB per user")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""Command-line generation of practice sessions, without the Streamlit UI.
+
+Sessions are streamed a window of measures at a time, so memory use does
+not grow with the number of chords or sessions. Session i is generated from
+seed + i, and the same seed and settings produce the same chords as the app.
+
+JSON Lines output has one line per window, holding the session index and
+seed, the first measure, the chord symbols and the bass, chord voicing and
+metronome events as exported by EventTimeline.to_dicts (times in seconds).
+MIDI output is one file per session. As in the player, each window is
+voice-led on its own.
+
+Usage:
+    meatball --sessions 1000 --chords 64 --seed 7 -o bank.jsonl
+    meatball --progression II-V-I --notes C F Bb --format midi -o exercises/
+    meatball --sessions 10000 --workers 4 --format midi -o bank/
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO
+from .music.theory import NOTES, CHORD_TYPES
+from .music.progressions import PROGRESSIONS
+from .music.markov import MARKOV_PROGRESSION
+from .music.metronome import MetronomePattern, SUBDIVISIONS
+from .music.timeline import EventTimeline
+from .music.midi import write_midi_stream
+from .music.sequence import (
+    SEED_LIMIT, iter_chord_symbols, make_rng, new_seed, build_chord_timeline, build_voicing_timeline,
+    build_metronome_timeline
+)
+
+# Measures generated at a time, and per JSON line
+WINDOW_MEASURES = 256
+# Sessions handed to each worker process ahead of the one being written
+SESSIONS_AHEAD = 4
+
+class SessionSpec(NamedTuple):
+    """Settings shared by every generated session.
+
+    Attributes:
+        progression_type: "Random", MARKOV_PROGRESSION or a progression name
+        selected_notes: Root notes (or keys) to choose from
+        selected_chord_types: Chord types to choose from
+        num_chords: Chords per session
+        bpm: Tempo in beats per minute
+        time_signature: Beats per measure
+        pattern: Metronome click pattern
+        window: Measures generated at a time
+    """
+    progression_type: str
+    selected_notes: List[str]
+    selected_chord_types: List[str]
+    num_chords: int
+    bpm: int
+    time_signature: int
+    pattern: MetronomePattern
+    window: int = WINDOW_MEASURES
+
+    @property
+    def seconds_per_beat(self) -> float:
+        return 60.0 / self.bpm
+
+    @property
+    def seconds_per_measure(self) -> float:
+        return self.seconds_per_beat * self.time_signature
+
+def iter_session_windows(spec: SessionSpec, seed: int) -> Iterator[Dict[str, Any]]:
+    """Generate one session a window of measures at a time.
+
+    Args:
+        spec: Session settings
+        seed: Seed of the session
+
+    Yields:
+        Dicts with 'start' (first measure), 'chords', 'timeline' (bass,
+        chord voicing and metronome events, timed from the start of the
+        session) and 'final' entries
+    """
+    chords = iter_chord_symbols(spec.progression_type, spec.selected_notes,
+                                spec.selected_chord_types, make_rng(seed))
+    start = 0
+    while start < spec.num_chords:
+        wanted = min(spec.window, spec.num_chords - start)
+        display_sequence = list(islice(chords, wanted))
+        end = start + len(display_sequence)
+        final = end == spec.num_chords or len(display_sequence) < wanted
+        yield {
+            'start': start,
+            'chords': display_sequence,
+            'timeline': EventTimeline.merge(
+                build_chord_timeline(display_sequence, spec.seconds_per_measure, start),
+                build_voicing_timeline(display_sequence, spec.seconds_per_measure, start),
+                build_metronome_timeline(len(display_sequence), spec.time_signature,
+                                         spec.seconds_per_beat, spec.pattern, start)
+            ),
+            'final': final
+        }
+        if final:
+            return
+        start = end
+
+def session_jsonl(spec: SessionSpec, index: int, seed: int) -> Iterator[str]:
+    """JSON lines of one session, one per window."""
+    for window in iter_session_windows(spec, seed):
+        timeline = window['timeline']
+        line = {
+            'session': index,
+            'seed': seed,
+            'start': window['start'],
+            'chords': window['chords'],
+            'bass': timeline.select('bass').to_dicts(),
+            'voicings': timeline.select('chords').to_dicts(),
+            'metronome': timeline.select('metronome').to_dicts(),
+            'final': window['final']
+        }
+        yield json.dumps(line, separators=(',', ':')) + '\n'
+
+def write_session_midi(file: BinaryIO, spec: SessionSpec, seed: int) -> None:
+    """Write one session to a seekable binary file as MIDI."""
+    timelines = (window['timeline'] for window in iter_session_windows(spec, seed))
+    write_midi_stream(file, timelines, spec.bpm, spec.time_signature)
+
+def _session_lines(spec: SessionSpec, index: int, seed: int, path: str) -> str:
+    """Write the JSON lines of one session to a file, for worker processes."""
+    with open(path, 'w') as f:
+        f.writelines(session_jsonl(spec, index, seed))
+    return path
+
+def _session_file(spec: SessionSpec, seed: int, path: str) -> str:
+    """Write one session to a MIDI file, for worker processes."""
+    with open(path, 'wb') as f:
+        write_session_midi(f, spec, seed)
+    return path
+
+def _bounded_map(executor: ProcessPoolExecutor, fn: Callable[..., Any], tasks: Iterable[tuple],
+                 limit: int) -> Iterator[Any]:
+    """Ordered results of fn over tasks with at most limit tasks in flight."""
+    pending: Deque = deque()
+    for task in tasks:
+        pending.append(executor.submit(fn, *task))
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def session_seed(seed: int, index: int) -> int:
+    """Seed of session index of a run started from seed."""
+    return (seed + index) % SEED_LIMIT
+
+def write_jsonl(out: TextIO, spec: SessionSpec, num_sessions: int, seed: int, workers: int = 1) -> None:
+    """Stream sessions as JSON Lines.
+
+    Args:
+        out: Text file to write to
+        spec: Session settings
+        num_sessions: Number of sessions
+        seed: Seed of the first session
+        workers: Processes generating sessions; each writes its sessions
+            to temporary files, which are copied to out in session order
+    """
+    if workers > 1:
+        with tempfile.TemporaryDirectory(prefix='meatball-') as directory, \
+                ProcessPoolExecutor(workers) as executor:
+            tasks = ((spec, index, session_seed(seed, index), os.path.join(directory, f"{index}.jsonl"))
+                     for index in range(num_sessions))
+            for path in _bounded_map(executor, _session_lines, tasks, workers * SESSIONS_AHEAD):
+                with open(path) as f:
+                    shutil.copyfileobj(f, out)
+                os.remove(path)
+    else:
+        for index in range(num_sessions):
+            out.writelines(session_jsonl(spec, index, session_seed(seed, index)))
+
+def write_midi_files(directory: str, spec: SessionSpec, num_sessions: int, seed: int, workers: int = 1) -> None:
+    """Write one MIDI file per session into a directory.
+
+    Args:
+        directory: Output directory, created if needed
+        spec: Session settings
+        num_sessions: Number of sessions
+        seed: Seed of the first session
+        workers: Processes generating and writing sessions
+    """
+    os.makedirs(directory, exist_ok=True)
+    digits = len(str(max(num_sessions - 1, 0)))
+    tasks = ((spec, session_seed(seed, index), os.path.join(directory, f"session_{index:0{digits}d}.mid"))
+             for index in range(num_sessions))
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            for _ in _bounded_map(executor, _session_file, tasks, workers * SESSIONS_AHEAD):
+                pass
+    else:
+        for task in tasks:
+            _session_file(*task)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    progressions = ['Random', MARKOV_PROGRESSION] + list(PROGRESSIONS)
+    parser = argparse.ArgumentParser(prog='meatball', description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=1, help='Number of sessions to generate')
+    parser.add_argument('--chords', type=int, default=16, help='Chords (measures) per session')
+    parser.add_argument('--progression', default='Random', choices=progressions, help='Progression type')
+    parser.add_argument('--notes', nargs='+', default=list(NOTES), choices=NOTES, metavar='NOTE',
+                        help='Root notes (or keys) to choose from (default: all)')
+    parser.add_argument('--chord-types', nargs='+', default=list(CHORD_TYPES), choices=list(CHORD_TYPES),
+                        metavar='TYPE', help='Chord types to choose from (default: all)')
+    parser.add_argument('--bpm', type=int, default=120, help='Tempo in beats per minute')
+    parser.add_argument('--time-signature', type=int, default=4, help='Beats per measure')
+    parser.add_argument('--subdivision', type=int, default=1, choices=sorted(SUBDIVISIONS),
+                        help='Metronome clicks per beat')
+    parser.add_argument('--swing', type=float, default=0.5, help='Swing of even subdivisions (0.5 is straight)')
+    parser.add_argument('--seed', type=int, help='Seed of the first session (default: random)')
+    parser.add_argument('--format', choices=('jsonl', 'midi'),
+                        help='Output format (default: midi for .mid outputs, jsonl otherwise)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='Output file, "-" for stdout; for MIDI, a .mid file or a directory')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes generating sessions')
+    parser.add_argument('--window', type=int, default=WINDOW_MEASURES,
+                        help='Measures generated at a time and per JSON line')
+    args = parser.parse_args(argv)
+
+    if args.format is None:
+        args.format = 'midi' if args.output.lower().endswith('.mid') else 'jsonl'
+    for name in ('sessions', 'chords', 'bpm', 'time_signature', 'workers', 'window'):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be at least 1")
+    if not 0.0 < args.swing < 1.0:
+        parser.error("--swing must be between 0 and 1")
+    if args.format == 'midi' and args.sessions > 1 and args.output.lower().endswith('.mid'):
+        parser.error("MIDI output of several sessions needs a directory, not a .mid file")
+    if args.format == 'midi' and args.sessions > 1 and args.output == '-':
+        parser.error("MIDI output of several sessions needs a directory")
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    spec = SessionSpec(
+        args.progression, args.notes, args.chord_types, args.chords, args.bpm, args.time_signature,
+        MetronomePattern(subdivision=args.subdivision, swing=args.swing), args.window
+    )
+    seed = new_seed() if args.seed is None else args.seed
+
+    if args.format == 'jsonl':
+        if args.output == '-':
+            write_jsonl(sys.stdout, spec, args.sessions, seed, args.workers)
+        else:
+            with open(args.output, 'w') as f:
+                write_jsonl(f, spec, args.sessions, seed, args.workers)
+    elif args.output == '-':
+        # The track length is written last, so spool through a file
+        with tempfile.TemporaryFile() as f:
+            write_session_midi(f, spec, seed)
+            f.seek(0)
+            shutil.copyfileobj(f, sys.stdout.buffer)
+    elif args.output.lower().endswith('.mid'):
+        with open(args.output, 'wb') as f:
+            write_session_midi(f, spec, seed)
+    else:
+        # Any other path is a directory of session files, created if needed
+        write_midi_files(args.output, spec, args.sessions, seed, args.workers)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""Opt-in timing spans and counters for finding where rerun time goes.
+
+Instrumentation is off unless the MEATBALL_DIAGNOSTICS environment
+variable is set (or enable() is called). While it is off, span() returns a
+shared do-nothing context manager and timed functions make a single flag
+check, so the hooks can stay in hot paths.
+
+When on, span durations are kept in bounded per-stage buffers for
+percentile summaries, and every record can also be appended to a JSONL
+file (MEATBALL_DIAGNOSTICS=<path>).
+
+Example:
+    with span('sidebar'):
+        build_sidebar()
+
+    rerun = span('rerun').start()
+    ...
+    rerun.stop()
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, TypeVar
+import numpy as np
+
+# Durations kept per stage for percentiles
+HISTORY_SIZE = 1000
+# Records buffered before they are appended to the JSONL file
+FLUSH_EVERY = 100
+PERCENTILES = (50, 90, 99)
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+class _State:
+    """Process-wide instrumentation state, shared by all sessions."""
+
+    def __init__(self):
+        self.enabled = False
+        self.path: Optional[str] = None
+        self.lock = threading.Lock()
+        self.durations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=HISTORY_SIZE))
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.pending: List[Dict[str, Any]] = []
+
+_state = _State()
+
+class _NullSpan:
+    """Context manager that does nothing, used while instrumentation is off."""
+
+    __slots__ = ()
+
+    def start(self) -> '_NullSpan':
+        return self
+
+    def stop(self) -> None:
+        return None
+
+    __enter__ = start
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    """Context manager that records its own duration."""
+
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def start(self) -> '_Span':
+        self.started = time.perf_counter()
+        return self
+
+    def stop(self) -> None:
+        _record('span', self.name, (time.perf_counter() - self.started) * 1000.0)
+
+    __enter__ = start
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+def _record(kind: str, name: str, value: float) -> None:
+    """Store one measurement and queue it for the JSONL file."""
+    flush_now = False
+    with _state.lock:
+        if kind == 'span':
+            _state.durations[name].append(value)
+        else:
+            _state.counters[name] += value
+        if _state.path is not None:
+            _state.pending.append({'ts': time.time(), 'kind': kind, 'name': name, 'value': value})
+            flush_now = len(_state.pending) >= FLUSH_EVERY
+    if flush_now:
+        flush()
+
+def enable(path: Optional[str] = None) -> None:
+    """Turn instrumentation on.
+
+    Args:
+        path: JSONL file that records are appended to, or None to keep them
+            in memory only
+    """
+    _state.path = path
+    _state.enabled = True
+
+def disable() -> None:
+    """Turn instrumentation off, writing out any buffered records."""
+    flush()
+    _state.enabled = False
+
+def is_enabled() -> bool:
+    """Whether instrumentation is on."""
+    return _state.enabled
+
+def reset() -> None:
+    """Drop all recorded measurements."""
+    with _state.lock:
+        _state.durations.clear()
+        _state.counters.clear()
+        _state.pending.clear()
+
+def span(name: str):
+    """Time a block of code.
+
+    Use it as a context manager, or call start() and stop() on it for code
+    that cannot be indented into a block.
+
+    Args:
+        name: Stage name, e.g. "sidebar"
+
+    Returns:
+        Span recording the block's duration in milliseconds
+    """
+    if not _state.enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator that times every call of a function.
+
+    Args:
+        name: Stage name
+
+    Returns:
+        Decorator
+    """
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _state.enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+def count(name: str, value: float = 1) -> None:
+    """Add to a counter, e.g. payload bytes sent.
+
+    Args:
+        name: Counter name
+        value: Amount to add
+    """
+    if _state.enabled:
+        _record('count', name, value)
+
+def flush() -> None:
+    """Append buffered records to the JSONL file."""
+    with _state.lock:
+        records, _state.pending = _state.pending, []
+        path = _state.path
+    if not records or path is None:
+        return
+    with open(path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+def summary() -> Dict[str, Dict[str, float]]:
+    """Per-stage statistics of the recent span durations.
+
+    Returns:
+        Dict of stage name to a dict with 'count', 'mean', 'max' and one
+        'p<N>' entry per percentile, all in milliseconds
+    """
+    with _state.lock:
+        durations = {name: np.array(values) for name, values in _state.durations.items() if values}
+    stats = {}
+    for name, values in sorted(durations.items()):
+        stats[name] = {'count': len(values), 'mean': float(values.mean()), 'max': float(values.max())}
+        for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+            stats[name][f'p{percentile}'] = float(value)
+    return stats
+
+def counters() -> Dict[str, float]:
+    """Current counter totals."""
+    with _state.lock:
+        return dict(sorted(_state.counters.items()))
+
+def export_json(path: str) -> None:
+    """Write the current summary and counters to a JSON file.
+
+    Args:
+        path: Output file
+    """
+    with open(path, 'w') as f:
+        json.dump({'spans': summary(), 'counters': counters()}, f, indent=2)
+
+_env = os.environ.get('MEATBALL_DIAGNOSTICS')
+if _env:
+    enable(None if _env.lower() in ('1', 'true', 'yes', 'on') else _env)
@@ -0,0 +1,198 @@
+"""Markov-chain chord generation with functional harmony and modulation.
+
+The chain walks over (key, diatonic chord) states. Within a key, chords
+follow functional-harmony transitions between the seven scale-degree
+functions (e.g. ii goes mostly to V, V mostly back to I). From the tonic,
+the walk may modulate to a nearby key on the circle of fifths, entering it
+through that key's ii or V.
+
+Transition matrices are built once per choice of keys and chord types and
+stored as cumulative rows, each shifted up by its state index and all
+flattened into one sorted array. Each step of a walk is then a single
+binary search, and many walks are advanced together in one searchsorted.
+"""
+
+from functools import lru_cache
+from typing import Iterator, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from .theory import note_to_pitch_class
+from .progressions import compile_progression, progression_in_key
+
+# Name of the Markov mode, offered next to "Random" and the progressions
+MARKOV_PROGRESSION = 'Functional Harmony'
+
+# Chords that can fill each function, as Roman numerals; the walk uses the
+# ones whose chord type is selected
+FUNCTION_CHORDS: Tuple[Tuple[str, ...], ...] = (
+    ('I', 'Imaj7'),
+    ('ii', 'ii7'),
+    ('iii', 'iii7'),
+    ('IV', 'IVmaj7'),
+    ('V', 'V7', 'Vsus4'),
+    ('vi', 'vi7'),
+    ('vii°', 'viiø7'),
+)
+TONIC, SUPERTONIC, DOMINANT = 0, 1, 4
+
+# Probability of moving from one function (row) to another (column)
+FUNCTION_TRANSITIONS = np.array([
+    # I     ii    iii   IV    V     vi    vii
+    [0.05, 0.20, 0.10, 0.25, 0.20, 0.15, 0.05],  # I
+    [0.05, 0.05, 0.00, 0.05, 0.70, 0.00, 0.15],  # ii
+    [0.05, 0.10, 0.05, 0.20, 0.00, 0.60, 0.00],  # iii
+    [0.25, 0.20, 0.00, 0.05, 0.40, 0.00, 0.10],  # IV
+    [0.65, 0.00, 0.00, 0.05, 0.10, 0.15, 0.05],  # V
+    [0.05, 0.45, 0.05, 0.35, 0.10, 0.00, 0.00],  # vi
+    [0.70, 0.00, 0.10, 0.00, 0.10, 0.10, 0.00],  # vii
+])
+
+# Chance of leaving the key from a tonic chord
+MODULATION_RATE = 0.15
+# Functions a new key is entered through
+MODULATION_TARGETS = {SUPERTONIC: 0.5, DOMINANT: 0.5}
+# Relative weight of each further step around the circle of fifths
+FIFTHS_DECAY = 0.25
+
+# Steps drawn at a time by iter_markov_chords
+WALK_BATCH_SIZE = 256
+# Chains kept by markov_chain; each holds a (states x states) matrix
+MARKOV_CACHE_SIZE = 32
+
+class MarkovChain(NamedTuple):
+    """Precomputed chord chain.
+
+    Attributes:
+        symbols: Chord symbol of each state
+        cumulative: Cumulative transition probabilities, one row per state,
+            shape (num_states, num_states)
+        starts: States a walk can start on (the tonic chords of every key)
+        search: Row i of cumulative plus i, flattened; sorted, so walk finds
+            the next state of any state with one binary search
+    """
+    symbols: Tuple[str, ...]
+    cumulative: np.ndarray
+    starts: np.ndarray
+    search: np.ndarray
+
+def _fifths_distance(a: int, b: int) -> int:
+    """Steps between two pitch classes around the circle of fifths."""
+    steps = (b - a) * 7 % 12
+    return min(steps, 12 - steps)
+
+@lru_cache(maxsize=MARKOV_CACHE_SIZE)
+def markov_chain(keys: Tuple[str, ...], chord_types: Tuple[str, ...]) -> MarkovChain:
+    """Build the chord chain for a choice of keys and chord types.
+
+    Args:
+        keys: Keys (major tonics) the walk may visit
+        chord_types: Chord types the walk may play; when none of them fits
+            any function, every chord of FUNCTION_CHORDS is used
+
+    Returns:
+        Chain shared by every caller; the last MARKOV_CACHE_SIZE chains
+        are kept
+    """
+    if not keys:
+        raise ValueError("At least one key is needed")
+    variants = [(function, numeral)
+                for function, numerals in enumerate(FUNCTION_CHORDS)
+                for numeral in numerals
+                if compile_progression(numeral)[0][3] in chord_types]
+    if not variants:
+        variants = [(function, numeral)
+                    for function, numerals in enumerate(FUNCTION_CHORDS) for numeral in numerals]
+    functions = np.array([function for function, _ in variants])
+    # Split each function's probability between the chords that fill it
+    share = 1.0 / np.bincount(functions, minlength=len(FUNCTION_CHORDS))[functions]
+
+    within = FUNCTION_TRANSITIONS[functions][:, functions] * share[None, :]
+    is_tonic = (functions == TONIC).astype(np.float64)
+    pivot = np.array([MODULATION_TARGETS.get(function, 0.0) for function in functions]) * share
+
+    pitch_classes = [note_to_pitch_class(key) for key in keys]
+    key_weights = np.array([[0.0 if a == b else FIFTHS_DECAY ** (_fifths_distance(a, b) - 1)
+                             for b in pitch_classes] for a in pitch_classes])
+    key_weights /= np.maximum(key_weights.sum(axis=1, keepdims=True), 1e-12)
+    modulation = MODULATION_RATE if len(keys) > 1 else 0.0
+
+    # States are ordered key by key: state = key * len(variants) + variant
+    transitions = (np.kron(np.eye(len(keys)), within * (1.0 - modulation * is_tonic)[:, None])
+                   + np.kron(key_weights, modulation * np.outer(is_tonic, pivot)))
+    totals = transitions.sum(axis=1, keepdims=True)
+    # Rows left empty by the chord type choice stay in their key, uniformly
+    uniform = np.kron(np.eye(len(keys)), np.full((len(variants), len(variants)), 1.0 / len(variants)))
+    transitions = np.where(totals > 0, transitions / np.where(totals > 0, totals, 1.0), uniform)
+
+    cumulative = np.minimum(np.cumsum(transitions, axis=1), 1.0)
+    cumulative[:, -1] = 1.0
+    cumulative.flags.writeable = False
+    search = (cumulative + np.arange(len(cumulative))[:, None]).ravel()
+    search.flags.writeable = False
+
+    symbols = tuple(progression_in_key(numeral, key)[0] for key in keys for _, numeral in variants)
+    starts = np.flatnonzero(np.tile(functions == TONIC, len(keys)))
+    if not len(starts):
+        starts = np.arange(len(symbols))
+    return MarkovChain(symbols, cumulative, starts, search)
+
+def walk(
+    chain: MarkovChain,
+    rng: np.random.Generator,
+    length: int,
+    num_walks: int = 1,
+    start: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Walk the chain.
+
+    Args:
+        chain: Chord chain from markov_chain
+        rng: NumPy random generator
+        length: Chords per walk
+        num_walks: Independent walks, advanced together
+        start: State of each walk before its first chord; by default walks
+            begin on a random tonic chord
+
+    Returns:
+        States of shape (num_walks, length); chain.symbols maps them to chords
+    """
+    states = np.empty((num_walks, length), dtype=np.int64)
+    if length == 0:
+        return states
+    uniforms = rng.random((length, num_walks))
+    if start is None:
+        current = chain.starts[rng.integers(len(chain.starts), size=num_walks)]
+        states[:, 0] = current
+        first = 1
+    else:
+        current = np.asarray(start, dtype=np.int64)
+        first = 0
+    num_states = len(chain.symbols)
+    for step in range(first, length):
+        # Index of the first cumulative probability above the uniform draw,
+        # searched for in the current state's row of chain.search
+        found = np.searchsorted(chain.search, current + uniforms[step], side='right')
+        current = np.minimum(found - current * num_states, num_states - 1)
+        states[:, step] = current
+    return states
+
+def iter_markov_chords(
+    keys: Sequence[str],
+    chord_types: Sequence[str],
+    rng: np.random.Generator
+) -> Iterator[str]:
+    """Lazily generate an endless Markov chord stream.
+
+    Args:
+        keys: Keys the walk may visit
+        chord_types: Chord types the walk may play
+        rng: NumPy random generator
+
+    Yields:
+        Chord symbols, one per measure
+    """
+    chain = markov_chain(tuple(keys), tuple(chord_types))
+    states = walk(chain, rng, WALK_BATCH_SIZE)[0]
+    while True:
+        for state in states.tolist():
+            yield chain.symbols[state]
+        states = walk(chain, rng, WALK_BATCH_SIZE, start=states[-1:])[0]
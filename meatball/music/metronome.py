@@ -0,0 +1,85 @@
+"""Metronome click patterns.
+
+A pattern describes one measure of clicks: which beats are accented, how
+many clicks each beat is divided into, and how much the off-beat clicks
+swing. Click positions for any number of measures are produced as integer
+tick arrays in one vectorised step.
+"""
+
+from typing import NamedTuple, Tuple
+import numpy as np
+from .tempo import PPQ
+
+# Click levels, from weakest to strongest
+SUBDIVISION, BEAT, ACCENT = 0, 1, 2
+
+# Note and velocity played for each click level
+CLICK_NOTES = ('C5', 'E5', 'G5')
+CLICK_VELOCITIES = (40, 64, 127)
+ACCENT_NOTE = CLICK_NOTES[ACCENT]
+BEAT_NOTE = CLICK_NOTES[BEAT]
+ACCENT_VELOCITY = CLICK_VELOCITIES[ACCENT]
+BEAT_VELOCITY = CLICK_VELOCITIES[BEAT]
+
+CLICK_SECONDS = 0.1  # Length of a click
+
+SUBDIVISIONS = {1: 'Quarter notes', 2: 'Eighth notes', 3: 'Triplets', 4: 'Sixteenth notes'}
+
+class MetronomePattern(NamedTuple):
+    """One measure of metronome clicks.
+
+    Attributes:
+        accents: Beats of the measure (0-based) played as accents
+        subdivision: Clicks per beat
+        swing: Share of each pair of subdivision clicks taken by the first
+            one; 0.5 is straight, 2/3 is triplet swing. Only applies to even
+            subdivisions.
+    """
+    accents: Tuple[int, ...] = (0,)
+    subdivision: int = 1
+    swing: float = 0.5
+
+DEFAULT_PATTERN = MetronomePattern()
+
+def _measure_template(pattern: MetronomePattern, beats_per_measure: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Tick offsets and levels of the clicks in one measure."""
+    if pattern.subdivision < 1 or PPQ % pattern.subdivision:
+        raise ValueError(f"Unsupported subdivision: {pattern.subdivision}")
+    if not 0.0 < pattern.swing < 1.0:
+        raise ValueError(f"Swing must be between 0 and 1, got {pattern.swing}")
+
+    step = PPQ // pattern.subdivision
+    positions = np.arange(beats_per_measure * pattern.subdivision)
+    offsets = positions * step
+    if pattern.subdivision % 2 == 0:
+        # Delay every second click of each pair
+        late = positions % 2 == 1
+        offsets[late] = (positions[late] - 1) * step + round(2 * step * pattern.swing)
+
+    levels = np.where(positions % pattern.subdivision == 0, BEAT, SUBDIVISION).astype(np.uint8)
+    accents = [beat for beat in pattern.accents if 0 <= beat < beats_per_measure]
+    levels[np.array(accents, dtype=np.int64) * pattern.subdivision] = ACCENT
+    return offsets, levels
+
+def click_ticks(
+    pattern: MetronomePattern,
+    num_measures: int,
+    beats_per_measure: int,
+    start_measure: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Click positions of a pattern over a run of measures.
+
+    Args:
+        pattern: Click pattern of one measure
+        num_measures: Number of measures
+        beats_per_measure: Beats per measure (time signature)
+        start_measure: Index of the first measure
+
+    Returns:
+        Tuple of (tick positions as int64, click levels as uint8), in order
+    """
+    offsets, levels = _measure_template(pattern, beats_per_measure)
+    measure_ticks = np.arange(start_measure, start_measure + num_measures, dtype=np.int64)
+    measure_ticks *= beats_per_measure * PPQ
+    ticks = (measure_ticks[:, None] + offsets[None, :]).ravel()
+    return ticks, np.tile(levels, num_measures)
@@ -0,0 +1,375 @@
+"""Standard MIDI File export and import.
+
+Files are written as format 0 (one track): the bass on channel 1, the
+metronome on channel 2 and chord voicings on channel 3, with the tempo
+and time signature as meta events. The writer encodes every event with
+array operations into one preallocated buffer, and write_midi_stream does
+the same a window of events at a time; the reader parses files in
+fixed-size chunks and yields notes in batches, so long files never have
+to fit in memory.
+"""
+
+import struct
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+import numpy as np
+from .tempo import PPQ, TempoMap
+from .timeline import EventTimeline, INSTRUMENTS
+
+# General MIDI program of each instrument (acoustic bass, woodblock, acoustic
+# grand piano); the channel of an instrument is its index in INSTRUMENTS
+PROGRAMS = (32, 115, 0)
+
+READ_CHUNK_SIZE = 1 << 16
+NOTE_BATCH_SIZE = 4096
+
+_NOTE_OFF, _NOTE_ON, _PROGRAM_CHANGE = 0x80, 0x90, 0xC0
+_META, _SYSEX, _SYSEX_ESCAPE = 0xFF, 0xF0, 0xF7
+_META_TEMPO, _META_TIME_SIGNATURE, _META_END_OF_TRACK = 0x51, 0x58, 0x2F
+
+class MidiSequence(NamedTuple):
+    """Contents of a MIDI file.
+
+    Attributes:
+        timeline: Notes of the known instruments, ordered by start time and
+            then instrument
+        bpm: Tempo at the start of the file
+        time_signature: Beats per measure
+    """
+    timeline: EventTimeline
+    bpm: float
+    time_signature: int
+
+def _vlq_lengths(values: np.ndarray) -> np.ndarray:
+    """Number of bytes of each value as a variable-length quantity."""
+    return 1 + (values >= 1 << 7) + (values >= 1 << 14) + (values >= 1 << 21)
+
+def _write_vlq(out: np.ndarray, offsets: np.ndarray, values: np.ndarray, lengths: np.ndarray) -> None:
+    """Write variable-length quantities at the given offsets of a byte buffer."""
+    for i in range(4):
+        mask = lengths > i
+        shift = 7 * (lengths[mask] - 1 - i)
+        more = np.where(i < lengths[mask] - 1, 0x80, 0)
+        out[offsets[mask] + i] = ((values[mask] >> shift) & 0x7F) | more
+
+def _track_header(bpm: float, time_signature: int) -> bytes:
+    """Meta and program change events at the start of the track."""
+    tempo = round(60_000_000 / bpm)
+    data = bytearray()
+    data += bytes([0, _META, _META_TEMPO, 3]) + tempo.to_bytes(3, 'big')
+    # Time signature in quarter notes, 24 clocks per click, 8 32nds per quarter
+    data += bytes([0, _META, _META_TIME_SIGNATURE, 4, time_signature, 2, 24, 8])
+    for channel, program in enumerate(PROGRAMS):
+        data += bytes([0, _PROGRAM_CHANGE | channel, program])
+    return bytes(data)
+
+class _Messages(NamedTuple):
+    """Note-on and note-off messages in file order."""
+    ticks: np.ndarray
+    status: np.ndarray
+    pitch: np.ndarray
+    velocity: np.ndarray
+
+def _take(messages: _Messages, index: np.ndarray) -> _Messages:
+    """Messages selected by a mask or index array."""
+    return _Messages(*(column[index] for column in messages))
+
+def _note_messages(timeline: EventTimeline, bpm: float, ppq: int) -> _Messages:
+    """Note-on and note-off messages of a timeline, in file order."""
+    seconds_per_beat = 60.0 / bpm
+    starts = np.round(timeline.time / seconds_per_beat * ppq).astype(np.int64)
+    ends = np.round((timeline.time + timeline.duration) / seconds_per_beat * ppq).astype(np.int64)
+    ends = np.maximum(ends, starts)
+
+    # One note-on and one note-off per event; at equal ticks note-offs go
+    # first so repeated notes do not overlap
+    ticks = np.concatenate([ends, starts])
+    is_on = np.concatenate([np.zeros(len(timeline), bool), np.ones(len(timeline), bool)])
+    order = np.lexsort((is_on, ticks))
+    ticks, is_on = ticks[order], is_on[order]
+    channel = np.concatenate([timeline.instrument, timeline.instrument])[order].astype(np.int64)
+    status = np.where(is_on, _NOTE_ON, _NOTE_OFF) | channel
+    pitch = np.concatenate([timeline.pitch, timeline.pitch])[order]
+    velocity = np.where(is_on, np.concatenate([timeline.velocity, timeline.velocity])[order], 0)
+    return _Messages(ticks, status, pitch, velocity)
+
+def _encode_messages(messages: _Messages, last_tick: int = 0, last_status: int = -1) -> bytes:
+    """Encode messages as track data.
+
+    Args:
+        messages: Messages in file order, none before last_tick
+        last_tick: Tick of the message written before these
+        last_status: Status byte in effect for running status, -1 for none
+
+    Returns:
+        Track data
+    """
+    ticks, status, pitch, velocity = messages
+    # Running status: the status byte is omitted when it repeats
+    with_status = np.ones(len(status), bool)
+    if len(status):
+        with_status[0] = status[0] != last_status
+        with_status[1:] = status[1:] != status[:-1]
+    deltas = np.diff(ticks, prepend=last_tick)
+    vlq_lengths = _vlq_lengths(deltas)
+    sizes = vlq_lengths + with_status + 2
+    offsets = (np.cumsum(sizes) - sizes).astype(np.int64)
+
+    out = np.empty(int(sizes.sum()), dtype=np.uint8)
+    _write_vlq(out, offsets, deltas, vlq_lengths)
+    message = offsets + vlq_lengths
+    out[message[with_status]] = status[with_status]
+    message += with_status
+    out[message] = pitch
+    out[message + 1] = velocity
+    return out.tobytes()
+
+def _file_prefix(track_length: int, ppq: int) -> bytes:
+    """File header chunk and the start of the track chunk."""
+    return b'MThd' + struct.pack('>IHHH', 6, 0, 1, ppq) + b'MTrk' + struct.pack('>I', track_length)
+
+_END_OF_TRACK = bytes([0, _META, _META_END_OF_TRACK, 0])
+
+def encode_midi(
+    timeline: EventTimeline,
+    bpm: float,
+    time_signature: int,
+    ppq: int = PPQ
+) -> bytes:
+    """Encode a timeline as a Standard MIDI File.
+
+    Args:
+        timeline: Events to write, times in seconds
+        bpm: Tempo the times were generated with
+        time_signature: Beats per measure
+        ppq: Ticks per quarter note in the file
+
+    Returns:
+        MIDI file contents
+    """
+    track = _track_header(bpm, time_signature) + _encode_messages(_note_messages(timeline, bpm, ppq))
+    return _file_prefix(len(track) + len(_END_OF_TRACK), ppq) + track + _END_OF_TRACK
+
+def write_midi_stream(
+    file: BinaryIO,
+    timelines: Iterable[EventTimeline],
+    bpm: float,
+    time_signature: int,
+    ppq: int = PPQ
+) -> None:
+    """Write a Standard MIDI File from consecutive windows of events.
+
+    Only one window is held in memory at a time, so files of any length can
+    be written. Notes still sounding at the end of a window are carried over
+    into the next one. The track length is filled in once the last window
+    is written, so the file must be seekable.
+
+    Args:
+        file: Seekable binary file, positioned where the MIDI file starts
+        timelines: Windows of events in time order; no event may start
+            before an event of an earlier window
+        bpm: Tempo the times were generated with
+        time_signature: Beats per measure
+        ppq: Ticks per quarter note in the file
+    """
+    start = file.tell()
+    header = _track_header(bpm, time_signature)
+    file.write(_file_prefix(0, ppq) + header)
+    track_length = len(header) + len(_END_OF_TRACK)
+    last_tick, last_status = 0, -1
+    carried = _Messages(*(np.empty(0, dtype=np.int64) for _ in range(4)))
+
+    def write(messages: _Messages) -> None:
+        nonlocal track_length, last_tick, last_status
+        if len(messages.ticks):
+            data = _encode_messages(messages, last_tick, last_status)
+            file.write(data)
+            track_length += len(data)
+            last_tick, last_status = int(messages.ticks[-1]), int(messages.status[-1])
+
+    for timeline in timelines:
+        new = _note_messages(timeline, bpm, ppq)
+        messages = _Messages(*(np.concatenate([old, now]) for old, now in zip(carried, new)))
+        is_on = messages.status & 0xF0 == _NOTE_ON
+        order = np.lexsort((is_on, messages.ticks))
+        messages, is_on = _take(messages, order), is_on[order]
+        # Later windows only add notes after this window's last note-on, so
+        # everything up to it is final
+        on_ticks = messages.ticks[is_on]
+        final = messages.ticks <= (on_ticks.max() if len(on_ticks) else -1)
+        write(_take(messages, final))
+        carried = _take(messages, ~final)
+    write(carried)
+
+    file.write(_END_OF_TRACK)
+    end = file.tell()
+    file.seek(start + len(_file_prefix(0, ppq)) - 4)
+    file.write(struct.pack('>I', track_length))
+    file.seek(end)
+
+def write_midi(path: str, timeline: EventTimeline, bpm: float, time_signature: int) -> None:
+    """Write a timeline to a Standard MIDI File.
+
+    Args:
+        path: Output file
+        timeline: Events in seconds at the given tempo
+        bpm: Tempo the events were generated with
+        time_signature: Beats per measure
+    """
+    with open(path, 'wb') as f:
+        f.write(encode_midi(timeline, bpm, time_signature))
+
+class _ChunkReader:
+    """Byte reader over a file that holds at most one chunk in memory."""
+
+    def __init__(self, file: BinaryIO, chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = b''
+        self.pos = 0
+
+    def _fill(self, n: int) -> None:
+        if self.pos + n > len(self.buffer):
+            self.buffer = self.buffer[self.pos:] + self.file.read(max(self.chunk_size, n))
+            self.pos = 0
+            if n > len(self.buffer):
+                raise ValueError("Unexpected end of MIDI file")
+
+    def read(self, n: int) -> bytes:
+        self._fill(n)
+        data = self.buffer[self.pos:self.pos + n]
+        self.pos += n
+        return data
+
+    def byte(self) -> int:
+        self._fill(1)
+        value = self.buffer[self.pos]
+        self.pos += 1
+        return value
+
+    def vlq(self) -> int:
+        value = 0
+        while True:
+            byte = self.byte()
+            value = (value << 7) | (byte & 0x7F)
+            if byte < 0x80:
+                return value
+
+def iter_midi_notes(
+    file: BinaryIO,
+    chunk_size: int = READ_CHUNK_SIZE,
+    batch_size: int = NOTE_BATCH_SIZE
+) -> Iterator[Tuple[EventTimeline, Dict[str, Any]]]:
+    """Stream the notes of a MIDI file in batches.
+
+    Notes on channels other than those of INSTRUMENTS are skipped. Batches
+    hold notes in the order they end.
+
+    Args:
+        file: Binary file opened for reading
+        chunk_size: Bytes read from the file at a time
+        batch_size: Notes per yielded batch
+
+    Yields:
+        Tuples of (notes as a timeline, file info so far), where the info
+        dict has 'bpm' and 'time_signature' entries; the last batch may be
+        empty
+    """
+    reader = _ChunkReader(file, chunk_size)
+    if reader.read(4) != b'MThd':
+        raise ValueError("Not a Standard MIDI File")
+    length, _, num_tracks, division = struct.unpack('>IHHH', reader.read(10))
+    reader.read(length - 6)
+    if division & 0x8000:
+        raise ValueError("SMPTE time division is not supported")
+
+    info: Dict[str, Any] = {'bpm': 120.0, 'time_signature': 4}
+    tempo_changes: List[Tuple[int, float]] = []
+    batch: Dict[str, List[int]] = {'start': [], 'end': [], 'pitch': [], 'velocity': [], 'channel': []}
+
+    def flush() -> Tuple[EventTimeline, Dict[str, Any]]:
+        first = 60.0 / info['bpm']
+        tempo = TempoMap(first, [(tick * PPQ // division, spb) for tick, spb in tempo_changes if tick > 0])
+        start = tempo.seconds(np.array(batch['start'], dtype=np.int64) * PPQ // division)
+        end = tempo.seconds(np.array(batch['end'], dtype=np.int64) * PPQ // division)
+        timeline = EventTimeline(start, end - start, batch['pitch'], batch['velocity'], batch['channel'])
+        for column in batch.values():
+            column.clear()
+        return timeline, dict(info)
+
+    for _ in range(num_tracks):
+        while True:
+            chunk_type = reader.read(4)
+            (length,) = struct.unpack('>I', reader.read(4))
+            if chunk_type == b'MTrk':
+                break
+            reader.read(length)  # Skip unknown chunks
+
+        tick = 0
+        status = 0
+        pending: Dict[Tuple[int, int], Tuple[int, int]] = {}  # (channel, pitch) -> (start, velocity)
+        while True:
+            tick += reader.vlq()
+            byte = reader.byte()
+            if byte == _META:
+                meta_type = reader.byte()
+                data = reader.read(reader.vlq())
+                if meta_type == _META_END_OF_TRACK:
+                    break
+                if meta_type == _META_TEMPO:
+                    seconds_per_beat = int.from_bytes(data, 'big') / 1_000_000
+                    if tick == 0 and not tempo_changes:
+                        info['bpm'] = 60.0 / seconds_per_beat
+                    tempo_changes.append((tick, seconds_per_beat))
+                elif meta_type == _META_TIME_SIGNATURE:
+                    info['time_signature'] = data[0]
+                continue
+            if byte in (_SYSEX, _SYSEX_ESCAPE):
+                reader.read(reader.vlq())
+                continue
+
+            if byte & 0x80:
+                status = byte
+                data1 = reader.byte()
+            else:
+                data1 = byte  # Running status
+            kind, channel = status & 0xF0, status & 0x0F
+            if kind in (_PROGRAM_CHANGE, 0xD0):
+                continue
+            data2 = reader.byte()
+            if kind not in (_NOTE_ON, _NOTE_OFF) or channel >= len(INSTRUMENTS):
+                continue
+
+            key = (channel, data1)
+            if key in pending:
+                start, velocity = pending.pop(key)
+                batch['start'].append(start)
+                batch['end'].append(tick)
+                batch['pitch'].append(data1)
+                batch['velocity'].append(velocity)
+                batch['channel'].append(channel)
+                if len(batch['start']) >= batch_size:
+                    yield flush()
+            if kind == _NOTE_ON and data2 > 0:
+                pending[key] = (tick, data2)
+
+    # The last batch is yielded even when empty, so the file info always arrives
+    yield flush()
+
+def read_midi(path: str, chunk_size: int = READ_CHUNK_SIZE) -> MidiSequence:
+    """Read a MIDI file written by encode_midi or write_midi.
+
+    Args:
+        path: MIDI file
+        chunk_size: Bytes read from the file at a time
+
+    Returns:
+        Notes ordered by start time and instrument, with the file's tempo and
+        time signature
+    """
+    timelines = []
+    with open(path, 'rb') as f:
+        for timeline, info in iter_midi_notes(f, chunk_size):
+            timelines.append(timeline)
+    merged = EventTimeline.merge(*timelines)
+    order = np.lexsort((merged.instrument, merged.time))
+    return MidiSequence(merged[order], info['bpm'], info['time_signature'])
@@ -1,63 +1,156 @@
-"""Functions for generating chord progressions."""
+"""Functions for generating chord progressions.
 
-from typing import List, Tuple
-from .theory import get_scale_degrees, CHORD_TYPES
+Progressions are written as Roman numeral templates such as
+"ii7 V7 Imaj7 Imaj7". A template is compiled once into scale degrees,
+semitone offsets and chord types, and its realisation in each key is
+memoised, so transposing a progression is a table lookup.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from .theory import (
+    SCALE_TABLE, PITCH_CLASS_FLAT, PITCH_CLASS_SHARP, NOTE_TO_PITCH_CLASS, chord_symbol
+)
+
+class Progression(NamedTuple):
+    """A registered progression template.
+
+    Attributes:
+        template: Roman numeral template, one chord per measure
+        fixed_key: Repeat in the starting key instead of picking a new key
+            for every repetition
+    """
+    template: str
+    fixed_key: bool = False
+
+# Roman numerals and the major scale degree they name
+_NUMERALS = {'I': 0, 'II': 1, 'III': 2, 'IV': 3, 'V': 4, 'VI': 5, 'VII': 6}
+_MAJOR_INTERVALS = (0, 2, 4, 5, 7, 9, 11)
+
+_TOKEN = re.compile(r'^([b#]?)(VII|VI|IV|V|III|II|I|vii|vi|iv|v|iii|ii|i)(.*)$')
+
+# Chord type for each suffix, for upper-case and lower-case numerals
+_SUFFIXES: Dict[str, Tuple[Optional[str], Optional[str]]] = {
+    '': ('Major', 'Minor'),
+    '7': ('Dominant 7', 'Minor 7'),
+    'maj7': ('Major 7', None),
+    'm7b5': (None, 'Minor 7 flat 5'),
+    'ø': (None, 'Minor 7 flat 5'),
+    'ø7': (None, 'Minor 7 flat 5'),
+    'dim': (None, 'Diminished'),
+    '°': (None, 'Diminished'),
+    'aug': ('Augmented', None),
+    '+': ('Augmented', None),
+    'sus4': ('Sus4', 'Sus4'),
+    'sus2': ('Sus2', 'Sus2'),
+}
+
+PROGRESSIONS: Dict[str, Progression] = {}
+
+# A compiled chord: (major scale degree, chromatic shift of -1/0/+1,
+# semitones above the key, chord type)
+CompiledChord = Tuple[int, int, int, str]
+
+@lru_cache(maxsize=None)
+def compile_progression(template: str) -> Tuple[CompiledChord, ...]:
+    """Compile a Roman numeral template.
+
+    Upper-case numerals are major and lower-case numerals minor; a suffix
+    such as "7", "maj7", "ø7", "°", "+", "sus4" or "sus2" sets the quality,
+    and a "b" or "#" prefix lowers or raises the root.
+
+    Args:
+        template: Whitespace-separated numerals (e.g., "ii7 V7 Imaj7 Imaj7")
+
+    Returns:
+        One (scale degree, shift, semitone offset, chord type) tuple per chord
+    """
+    compiled = []
+    for token in template.split():
+        match = _TOKEN.match(token)
+        if match is None or match.group(3) not in _SUFFIXES:
+            raise ValueError(f"Invalid chord '{token}' in progression '{template}'")
+        accidental, numeral, suffix = match.groups()
+        chord_type = _SUFFIXES[suffix][0 if numeral.isupper() else 1]
+        if chord_type is None:
+            raise ValueError(f"Invalid chord '{token}' in progression '{template}'")
+
+        degree = _NUMERALS[numeral.upper()]
+        shift = {'': 0, 'b': -1, '#': 1}[accidental]
+        compiled.append((degree, shift, (_MAJOR_INTERVALS[degree] + shift) % 12, chord_type))
+    if not compiled:
+        raise ValueError("Progression template is empty")
+    return tuple(compiled)
+
+@lru_cache(maxsize=None)
+def progression_in_key(template: str, root_note: str) -> Tuple[str, ...]:
+    """Realise a progression template in a key.
+
+    Diatonic roots are spelled as in the key's major scale; altered roots
+    use flats for "b" and sharps for "#".
+
+    Args:
+        template: Roman numeral template
+        root_note: The root note of the key
+
+    Returns:
+        Chord symbols, one per measure
+    """
+    scale = SCALE_TABLE[(root_note, 'Major')]
+    key_pc = NOTE_TO_PITCH_CLASS[root_note]
+    chords = []
+    for degree, shift, offset, chord_type in compile_progression(template):
+        if shift == 0:
+            root = scale[degree]
+        else:
+            names = PITCH_CLASS_FLAT if shift < 0 else PITCH_CLASS_SHARP
+            root = names[(key_pc + offset) % 12]
+        chords.append(chord_symbol(root, chord_type))
+    return tuple(chords)
+
+def register_progression(name: str, template: str, fixed_key: bool = False) -> None:
+    """Register a progression template under a name.
+
+    Args:
+        name: Name shown in the app and accepted by generate_chord_sequence
+        template: Roman numeral template
+        fixed_key: Repeat in the starting key instead of changing key every cycle
+
+    Raises:
+        ValueError: If the template does not compile
+    """
+    compile_progression(template)
+    PROGRESSIONS[name] = Progression(template, fixed_key)
+
+register_progression('II-V-I', 'ii7 V7 Imaj7 Imaj7')
+register_progression('Diatonic Cycle', 'Imaj7 IVmaj7 iii7 vi7 ii7 V7 Imaj7 Imaj7', fixed_key=True)
+register_progression('I-vi-ii-V', 'Imaj7 vi7 ii7 V7')
+register_progression('Minor II-V-I', 'iiø7 V7 i7 i7')
+register_progression('Rhythm Changes A', 'Imaj7 vi7 ii7 V7 iii7 vi7 ii7 V7')
+register_progression('Autumn Leaves', 'ii7 V7 Imaj7 IVmaj7 viiø7 III7 vi7 vi7')
+register_progression('Pop I-V-vi-IV', 'I V vi IV')
+register_progression('12-Bar Blues', 'I7 IV7 I7 I7 IV7 IV7 I7 I7 V7 IV7 I7 V7')
+register_progression('Backdoor II-V', 'iv7 bVII7 Imaj7 Imaj7')
 
 def generate_two_five_one(root_note: str) -> List[str]:
     """Generate a II-V-I progression in the key of the given root note.
-    
+
     Args:
         root_note: The root note of the key
-        
+
     Returns:
         List of chord symbols (e.g., ["Dm7", "G7", "Cmaj7", "Cmaj7"])
     """
-    scale = get_scale_degrees(root_note)
-    
-    # II chord (minor 7)
-    ii_chord = f"{scale[1]}{CHORD_TYPES['Minor 7']}"
-    
-    # V chord (dominant 7)
-    v_chord = f"{scale[4]}{CHORD_TYPES['Dominant 7']}"
-    
-    # I chord (major 7) repeated for two bars
-    i_chord = f"{scale[0]}{CHORD_TYPES['Major 7']}"
-    
-    return [ii_chord, v_chord, i_chord, i_chord]
+    return list(progression_in_key(PROGRESSIONS['II-V-I'].template, root_note))
 
 def generate_diatonic_cycle(root_note: str) -> List[str]:
     """Generate a I-IV-III-VI-II-V-I progression in the key of the given root note.
-    
+
     Args:
         root_note: The root note of the key
-        
+
     Returns:
         List of chord symbols
     """
-    scale = get_scale_degrees(root_note)
-    
-    progression = []
-    
-    # I chord (major 7)
-    progression.append(f"{scale[0]}{CHORD_TYPES['Major 7']}")
-    
-    # IV chord (major 7)
-    progression.append(f"{scale[3]}{CHORD_TYPES['Major 7']}")
-    
-    # III chord (minor 7)
-    progression.append(f"{scale[2]}{CHORD_TYPES['Minor 7']}")
-    
-    # VI chord (minor 7)
-    progression.append(f"{scale[5]}{CHORD_TYPES['Minor 7']}")
-    
-    # II chord (minor 7)
-    progression.append(f"{scale[1]}{CHORD_TYPES['Minor 7']}")
-    
-    # V chord (dominant 7)
-    progression.append(f"{scale[4]}{CHORD_TYPES['Dominant 7']}")
-    
-    # I chord (major 7)
-    progression.append(f"{scale[0]}{CHORD_TYPES['Major 7']}")
-    progression.append(f"{scale[0]}{CHORD_TYPES['Major 7']}")
-    
-    return progression
+    return list(progression_in_key(PROGRESSIONS['Diatonic Cycle'].template, root_note))
@@ -0,0 +1,309 @@
+"""Server-side rendering of practice sequences to audio files."""
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+import wave
+from typing import Callable, Optional
+import numpy as np
+from .theory import note_to_midi
+from .metronome import ACCENT_NOTE
+from .timeline import EventTimeline
+from ..diagnostics import span, count
+
+SAMPLE_RATE = 22050
+
+# Bump when the synthesis changes so stale cache entries are not reused
+RENDER_VERSION = 4
+
+# Size the render cache is pruned to (MEATBALL_RENDER_CACHE_MB overrides it)
+RENDER_CACHE_MAX_MB = 512
+
+CLICK_DURATION = 0.03
+CLICK_FREQUENCY = 1500.0
+ACCENT_FREQUENCY = 2000.0
+_ACCENT_PITCH = note_to_midi(ACCENT_NOTE)
+
+# Relative amplitudes and decay rates (1/s) of the bass tone's harmonics
+BASS_HARMONICS = np.array([1.0, 0.5, 0.3, 0.15, 0.08])
+BASS_DECAY = np.array([1.5, 2.5, 4.0, 6.0, 9.0])
+# The same for the softer keys tone of the chord voicings
+KEYS_HARMONICS = np.array([1.0, 0.35, 0.12, 0.05])
+KEYS_DECAY = np.array([0.8, 1.6, 3.0, 5.0])
+ATTACK_TIME = 0.005
+RELEASE_TIME = 0.03
+
+def _midi_frequency(midi_note: int) -> float:
+    """Frequency in Hz of a MIDI note number."""
+    return 440.0 * 2.0 ** ((midi_note - 69) / 12.0)
+
+def _synthesize_tone(midi_note: int, duration: float, harmonics: np.ndarray, decay: np.ndarray,
+                     sample_rate: int) -> np.ndarray:
+    """Synthesize a decaying harmonic tone with short attack and release ramps."""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    multiples = np.arange(1, len(harmonics) + 1)[:, None]
+    partials = (harmonics[:, None]
+                * np.exp(-decay[:, None] * t)
+                * np.sin(2 * np.pi * _midi_frequency(midi_note) * multiples * t))
+    tone = partials.sum(axis=0) / harmonics.sum()
+
+    # Short attack and release ramps avoid clicks at the note boundaries
+    envelope = np.minimum(1.0, np.minimum(t / ATTACK_TIME, (duration - t) / RELEASE_TIME))
+    return (tone * np.clip(envelope, 0.0, 1.0)).astype(np.float32)
+
+def synthesize_bass(midi_note: int, duration: float, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Synthesize a plucked bass tone.
+
+    Args:
+        midi_note: MIDI note number
+        duration: Length of the tone in seconds
+        sample_rate: Output sample rate in Hz
+
+    Returns:
+        Mono float32 samples, peak amplitude at most 1
+    """
+    return _synthesize_tone(midi_note, duration, BASS_HARMONICS, BASS_DECAY, sample_rate)
+
+def synthesize_keys(midi_note: int, duration: float, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Synthesize a soft keys tone, the voice of the chord voicings.
+
+    Args:
+        midi_note: MIDI note number
+        duration: Length of the tone in seconds
+        sample_rate: Output sample rate in Hz
+
+    Returns:
+        Mono float32 samples, peak amplitude at most 1
+    """
+    return _synthesize_tone(midi_note, duration, KEYS_HARMONICS, KEYS_DECAY, sample_rate)
+
+def synthesize_click(accent: bool = False, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Synthesize a metronome click.
+
+    Args:
+        accent: Use the higher, louder downbeat click
+        sample_rate: Output sample rate in Hz
+
+    Returns:
+        Mono float32 samples, peak amplitude at most 1
+    """
+    t = np.arange(int(CLICK_DURATION * sample_rate)) / sample_rate
+    frequency = ACCENT_FREQUENCY if accent else CLICK_FREQUENCY
+    click = np.sin(2 * np.pi * frequency * t) * np.exp(-t / (CLICK_DURATION / 5))
+    return click.astype(np.float32)
+
+def _mix(out: np.ndarray, starts: np.ndarray, voice: np.ndarray, gain: float) -> None:
+    """Add one pre-rendered voice to the output at each start offset."""
+    scaled = voice * gain
+    for start in starts.tolist():
+        length = min(len(scaled), len(out) - start)
+        out[start:start + length] += scaled[:length]
+
+def _mix_tones(out: np.ndarray, timeline: EventTimeline, synthesize: Callable[..., np.ndarray],
+               volume: float, sample_rate: int, scale_velocity: bool = True) -> None:
+    """Mix the notes of a timeline, synthesizing each distinct (note, length, velocity) once."""
+    starts = np.rint(timeline.time * sample_rate).astype(np.int64)
+    velocities = timeline.velocity if scale_velocity else np.full(len(timeline), 127)
+    voices = np.stack([timeline.pitch.astype(np.int64),
+                       np.rint(timeline.duration * sample_rate).astype(np.int64),
+                       velocities.astype(np.int64)], axis=1)
+    unique_voices, voice_index = np.unique(voices, axis=0, return_inverse=True)
+    for i, (midi_note, length, velocity) in enumerate(unique_voices.tolist()):
+        tone = synthesize(midi_note, length / sample_rate, sample_rate)
+        _mix(out, starts[voice_index.ravel() == i], tone, volume * velocity / 127)
+
+def render_sequence(
+    timeline: EventTimeline,
+    bass_volume: float = 1.0,
+    metronome_volume: float = 0.4,
+    chord_volume: float = 0.25,
+    sample_rate: int = SAMPLE_RATE
+) -> np.ndarray:
+    """Render the bass, chord and metronome events of a timeline to PCM samples.
+
+    As in the player, the bass plays at bass_volume whatever its velocity,
+    while chord notes and clicks are scaled by their velocity.
+
+    Args:
+        timeline: Session events, e.g. from build_chord_timeline,
+            build_voicing_timeline and build_metronome_timeline merged
+        bass_volume: Gain of the bass line
+        metronome_volume: Gain of full-velocity clicks
+        chord_volume: Gain of full-velocity chord voicing notes
+        sample_rate: Output sample rate in Hz
+
+    Returns:
+        Mono float32 samples in [-1, 1]
+    """
+    clicks = timeline.select('metronome')
+    end = max(timeline.end_time, float(clicks.time.max()) + CLICK_DURATION if len(clicks) else 0.0)
+    out = np.zeros(int(np.ceil(end * sample_rate)) + 1, dtype=np.float32)
+
+    _mix_tones(out, timeline.select('bass'), synthesize_bass, bass_volume, sample_rate, scale_velocity=False)
+    _mix_tones(out, timeline.select('chords'), synthesize_keys, chord_volume, sample_rate)
+
+    # Clicks: accents use the higher click
+    click_starts = np.rint(clicks.time * sample_rate).astype(np.int64)
+    click_voices = np.stack([clicks.pitch == _ACCENT_PITCH, clicks.velocity], axis=1).astype(np.int64)
+    unique_clicks, click_index = np.unique(click_voices, axis=0, return_inverse=True)
+    for i, (accent, velocity) in enumerate(unique_clicks.tolist()):
+        _mix(out, click_starts[click_index.ravel() == i], synthesize_click(bool(accent), sample_rate),
+             metronome_volume * velocity / 127)
+
+    return np.clip(out, -1.0, 1.0)
+
+def encode_wav(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Encode mono float samples as a 16-bit PCM WAV file.
+
+    Args:
+        samples: Mono float samples in [-1, 1]
+        sample_rate: Sample rate in Hz
+
+    Returns:
+        WAV file contents
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes((samples * 32767).astype('<i2').tobytes())
+    return buffer.getvalue()
+
+def render_key(
+    timeline: EventTimeline,
+    bass_volume: float,
+    metronome_volume: float,
+    chord_volume: float,
+    sample_rate: int = SAMPLE_RATE
+) -> str:
+    """Content hash identifying a rendering of the given settings.
+
+    Returns:
+        Hex SHA-256 digest of the packed events and the other inputs
+    """
+    digest = hashlib.sha256(json.dumps({
+        'version': RENDER_VERSION,
+        'bass_volume': bass_volume,
+        'metronome_volume': metronome_volume,
+        'chord_volume': chord_volume,
+        'sample_rate': sample_rate
+    }, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+    digest.update(timeline.to_buffer())
+    return digest.hexdigest()
+
+def default_cache_dir() -> str:
+    """Directory for cached renderings (MEATBALL_RENDER_CACHE overrides it)."""
+    return os.environ.get(
+        'MEATBALL_RENDER_CACHE',
+        os.path.join(os.path.expanduser('~'), '.cache', 'meatball', 'renders')
+    )
+
+def default_cache_max_bytes() -> int:
+    """Size limit of the render cache (MEATBALL_RENDER_CACHE_MB overrides it)."""
+    return int(float(os.environ.get('MEATBALL_RENDER_CACHE_MB', RENDER_CACHE_MAX_MB)) * 2 ** 20)
+
+def prune_cache(cache_dir: str, max_bytes: int, keep: Optional[str] = None) -> int:
+    """Delete the least recently used renderings until the cache fits.
+
+    Renderings are ordered by access time, which render_to_file refreshes
+    on every cache hit. Files removed meanwhile by another process are
+    skipped.
+
+    Args:
+        cache_dir: Cache directory
+        max_bytes: Total size the cached WAV files may take
+        keep: Path that is never deleted, e.g. the file just written
+
+    Returns:
+        Number of files deleted
+    """
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if not entry.name.endswith('.wav'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, entry.name))
+    total = sum(size for _, size, _ in entries)
+    deleted = 0
+    keep_name = keep and os.path.basename(keep)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        if name == keep_name:
+            continue
+        try:
+            os.remove(os.path.join(cache_dir, name))
+            deleted += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    return deleted
+
+def render_to_file(
+    timeline: EventTimeline,
+    bass_volume: float = 1.0,
+    metronome_volume: float = 0.4,
+    chord_volume: float = 0.25,
+    cache_dir: Optional[str] = None,
+    sample_rate: int = SAMPLE_RATE,
+    max_bytes: Optional[int] = None
+) -> str:
+    """Render a sequence to a WAV file, reusing a cached rendering if one exists.
+
+    Files are named after render_key, so identical settings always map to the
+    same file and are only rendered once per cache directory. After each new
+    rendering, the least recently used ones are deleted until the cache fits
+    in max_bytes.
+
+    Args:
+        timeline: Session events (see render_sequence)
+        bass_volume: Gain of the bass line
+        metronome_volume: Gain of full-velocity clicks
+        chord_volume: Gain of full-velocity chord voicing notes
+        cache_dir: Cache directory (defaults to default_cache_dir())
+        sample_rate: Output sample rate in Hz
+        max_bytes: Cache size limit (defaults to default_cache_max_bytes())
+
+    Returns:
+        Path to the WAV file
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    key = render_key(timeline, bass_volume, metronome_volume, chord_volume, sample_rate)
+    path = os.path.join(cache_dir, f"{key}.wav")
+    if os.path.exists(path):
+        # Mark the rendering as recently used; the modification time keeps
+        # recording when it was rendered
+        try:
+            os.utime(path, (time.time(), os.path.getmtime(path)))
+        except FileNotFoundError:
+            pass  # Pruned meanwhile: render it again
+        else:
+            count('render.cache_hits')
+            return path
+
+    count('render.cache_misses')
+    with span('render_sequence'):
+        samples = render_sequence(timeline, bass_volume, metronome_volume, chord_volume, sample_rate)
+    data = encode_wav(samples, sample_rate)
+
+    # Write to a temporary file first so concurrent readers never see a partial file
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    count('render.cache_pruned', prune_cache(
+        cache_dir, default_cache_max_bytes() if max_bytes is None else max_bytes, keep=path))
+    return path
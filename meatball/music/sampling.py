@@ -0,0 +1,154 @@
+"""Weighted sampling with Walker alias tables.
+
+An alias table draws from a discrete distribution in constant time per
+draw, whatever the number of outcomes. Tables are built once per weight
+vector and cached (see alias_table).
+
+To allow cheap updates, a table is built from an upper bound of each
+weight rather than the weight itself, and a draw of outcome i is kept with
+probability weight[i] / bound[i]. Lowering a weight, or raising it within
+its bound, is then O(1). Raising it past its bound, or lowering weights
+until too many draws would be rejected, rebuilds the table.
+"""
+
+from functools import lru_cache
+from typing import Sequence, Tuple
+import numpy as np
+
+# Weight vectors kept by alias_table
+ALIAS_CACHE_SIZE = 64
+# Tables are rebuilt when fewer than this share of draws would be kept
+MIN_ACCEPTANCE = 0.5
+# Headroom given to a weight raised past its bound
+BOUND_GROWTH = 2.0
+
+class AliasTable:
+    """Walker/Vose alias table over the outcomes 0..n-1.
+
+    Attributes:
+        weights: Current weight of each outcome (float64)
+        bounds: Weights the table was built from, bounds[i] >= weights[i]
+        prob: Probability of keeping each column's own outcome (float64)
+        alias: Outcome drawn from each column otherwise (int64)
+    """
+
+    __slots__ = ('weights', 'bounds', 'prob', 'alias', '_total', '_bound_total')
+
+    def __init__(self, weights: Sequence[float]):
+        """Build a table.
+
+        Args:
+            weights: Non-negative weights, not all zero
+        """
+        weights = np.array(weights, dtype=np.float64)
+        if weights.ndim != 1 or not len(weights) or np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError("Weights must be a non-empty vector of non-negative values with a positive sum")
+        self.weights = weights
+        self._build(weights.copy())
+
+    def _build(self, bounds: np.ndarray) -> None:
+        """Build the alias columns for the given bounds (Vose's method)."""
+        n = len(bounds)
+        self.bounds = bounds
+        self._bound_total = float(bounds.sum())
+        self._total = float(self.weights.sum())
+        scaled = bounds * (n / self._bound_total)
+        self.prob = np.ones(n, dtype=np.float64)
+        self.alias = np.arange(n, dtype=np.int64)
+
+        small = np.flatnonzero(scaled < 1.0).tolist()
+        large = np.flatnonzero(scaled >= 1.0).tolist()
+        scaled = scaled.tolist()
+        while small and large:
+            less, more = small.pop(), large[-1]
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] += scaled[less] - 1.0
+            if scaled[more] < 1.0:
+                small.append(large.pop())
+        # Anything left over is 1 up to rounding and keeps its own outcome
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def __repr__(self) -> str:
+        return f"AliasTable({len(self)} outcomes)"
+
+    @property
+    def probabilities(self) -> np.ndarray:
+        """Probability of each outcome."""
+        return self.weights / self._total
+
+    @property
+    def acceptance(self) -> float:
+        """Share of draws from the table that are kept."""
+        return self._total / self._bound_total
+
+    def copy(self) -> 'AliasTable':
+        """Independent copy, e.g. of a cached table that is about to be updated."""
+        table = AliasTable.__new__(AliasTable)
+        table.weights = self.weights.copy()
+        table.bounds = self.bounds.copy()
+        table.prob = self.prob.copy()
+        table.alias = self.alias.copy()
+        table._total = self._total
+        table._bound_total = self._bound_total
+        return table
+
+    def update(self, index: int, weight: float) -> None:
+        """Change the weight of one outcome.
+
+        Args:
+            index: Outcome to change
+            weight: New non-negative weight
+        """
+        if weight < 0:
+            raise ValueError(f"Weight must not be negative, got {weight}")
+        total = self._total - self.weights[index] + weight
+        if total <= 0:
+            raise ValueError("Weights must have a positive sum")
+        self.weights[index] = weight
+        self._total = total
+        if weight > self.bounds[index]:
+            bounds = self.weights.copy()
+            bounds[index] *= BOUND_GROWTH
+            self._build(bounds)
+        elif self.acceptance < MIN_ACCEPTANCE:
+            self._build(self.weights.copy())
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """Draw outcomes.
+
+        Args:
+            rng: NumPy random generator
+            size: Number of draws
+
+        Returns:
+            Outcomes as an int64 array of length size
+        """
+        n = len(self)
+        keep_all = np.array_equal(self.weights, self.bounds)
+        drawn = [np.empty(0, dtype=np.int64)]
+        needed = size
+        while needed > 0:
+            batch = needed if keep_all else int(needed / self.acceptance * 1.1) + 8
+            columns = rng.integers(n, size=batch)
+            outcomes = np.where(rng.random(batch) < self.prob[columns], columns, self.alias[columns])
+            if not keep_all:
+                kept = rng.random(batch) * self.bounds[outcomes] < self.weights[outcomes]
+                outcomes = outcomes[kept]
+            drawn.append(outcomes[:needed])
+            needed -= len(drawn[-1])
+        return np.concatenate(drawn)
+
+@lru_cache(maxsize=ALIAS_CACHE_SIZE)
+def alias_table(weights: Tuple[float, ...]) -> AliasTable:
+    """Alias table of a weight vector, built once per process.
+
+    Args:
+        weights: Non-negative weights, not all zero
+
+    Returns:
+        Table shared by every caller; copy() it before calling update()
+    """
+    return AliasTable(weights)
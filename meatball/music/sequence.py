@@ -1,102 +1,512 @@
 """Functions for generating playback sequences."""
 
-from typing import List, Dict, Tuple
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
 import random
-from .theory import NOTES, CHORD_TYPES
-from .progressions import generate_two_five_one, generate_diatonic_cycle
+import numpy as np
+from .theory import (
+    CHORD_TYPES, CHORD_SYMBOLS, NOTE_TO_PITCH_CLASS, chord_symbol, chord_root,
+    note_to_pitch_class, note_to_midi
+)
+from .progressions import PROGRESSIONS, progression_in_key
+from ..diagnostics import timed
+from .timeline import EventTimeline, INSTRUMENT_IDS
+from .tempo import PPQ, TempoMap
+from .metronome import (
+    MetronomePattern, DEFAULT_PATTERN, CLICK_NOTES, CLICK_VELOCITIES, CLICK_SECONDS, click_ticks
+)
+from .voicing import NUM_VOICES, voice_lead
+from .sampling import alias_table
+from .markov import MARKOV_PROGRESSION, markov_chain, walk, iter_markov_chords
 
+BASS_OCTAVE = 1  # Deep double bass register
+BASS_GATE = 0.95  # Share of the measure each bass note sounds for
+CHORD_VELOCITY = 72  # Voicings sit under the bass
+
+# Seeds are drawn from [0, SEED_LIMIT) so they stay short in replay links
+SEED_LIMIT = 2 ** 32
+# Generated sequences kept by cached_chord_sequence
+SEQUENCE_CACHE_SIZE = 256
+# Weighted chords drawn from the alias table at a time
+WEIGHTED_BATCH_SIZE = 256
+
+# Vocabularies indexed by the integer codes of PracticeSetBatch
+ROOT_NAMES = tuple(NOTE_TO_PITCH_CLASS)
+CHORD_TYPE_NAMES = tuple(CHORD_TYPES)
+_ROOT_INDEX = {name: i for i, name in enumerate(ROOT_NAMES)}
+_CHORD_TYPE_INDEX = {name: i for i, name in enumerate(CHORD_TYPE_NAMES)}
+_SYMBOL_TABLE = np.array([[CHORD_SYMBOLS[(root, chord_type)] for chord_type in CHORD_TYPE_NAMES]
+                          for root in ROOT_NAMES], dtype=object)
+_ROOT_PITCH_CLASSES = np.array([NOTE_TO_PITCH_CLASS[root] for root in ROOT_NAMES], dtype=np.uint8)
+_CHORD_TYPE_BY_SYMBOL = {symbol: chord_type for (_, chord_type), symbol in CHORD_SYMBOLS.items()}
+
+def iter_chord_symbols(
+    progression_type: str,
+    selected_notes: List[str],
+    selected_chord_types: List[str],
+    rng: Optional[random.Random] = None,
+    weights: Optional[Mapping[Tuple[str, str], float]] = None
+) -> Iterator[str]:
+    """Lazily generate an endless stream of chord symbols.
+    
+    Args:
+        progression_type: "Random", MARKOV_PROGRESSION or the name of a
+            registered progression
+        selected_notes: List of root notes to choose from
+        selected_chord_types: List of chord types to choose from
+        rng: Random number generator to draw from (defaults to the global one)
+        weights: Relative weights of (root note, chord type) pairs in Random
+            mode; pairs not listed weigh 1. Without weights every pair is
+            equally likely.
+        
+    Yields:
+        Chord symbols, one per measure
+    """
+    rng = rng or random
+    
+    if progression_type in PROGRESSIONS:
+        # Start from a selected root; change key every cycle unless the
+        # progression stays in one key
+        if len(selected_notes) == 0:
+            return
+        template, fixed_key = PROGRESSIONS[progression_type]
+        progression = progression_in_key(template, rng.choice(selected_notes))
+        while True:
+            yield from progression
+            if not fixed_key:
+                progression = progression_in_key(template, rng.choice(selected_notes))
+    
+    elif progression_type == MARKOV_PROGRESSION:
+        # Functional harmony walk through the selected keys
+        if len(selected_notes) == 0:
+            return
+        yield from iter_markov_chords(selected_notes, selected_chord_types,
+                                      np.random.default_rng(rng.getrandbits(64)))
+    
+    elif weights is not None:
+        # Weighted random chords, drawn in batches from a cached alias table
+        pairs = [(note, chord_type) for note in selected_notes for chord_type in selected_chord_types]
+        if not pairs:
+            return
+        table = alias_table(tuple(float(weights.get(pair, 1.0)) for pair in pairs))
+        symbols = [chord_symbol(note, chord_type) for note, chord_type in pairs]
+        draws = np.random.default_rng(rng.getrandbits(64))
+        while True:
+            for index in table.sample(draws, WEIGHTED_BATCH_SIZE).tolist():
+                yield symbols[index]
+    
+    else:
+        # Generate random chords
+        if len(selected_notes) == 0 or len(selected_chord_types) == 0:
+            return
+        while True:
+            note = rng.choice(selected_notes)
+            chord_type = rng.choice(selected_chord_types)
+            yield chord_symbol(note, chord_type)
+
+def make_rng(seed: Optional[int] = None) -> random.Random:
+    """Create a random number generator for sequence generation.
+
+    Args:
+        seed: Seed for a reproducible stream, or None for a random seed
+
+    Returns:
+        Independent generator, so concurrent sessions never share state
+    """
+    return random.Random(seed)
+
+def new_seed() -> int:
+    """Draw a fresh seed for a practice session."""
+    return random.SystemRandom().randrange(SEED_LIMIT)
+
+@timed('generate_chord_sequence')
 def generate_chord_sequence(
     num_chords: int,
     progression_type: str,
     selected_notes: List[str],
     selected_chord_types: List[str],
-    seconds_per_measure: float
+    seconds_per_measure: float,
+    seed: Optional[int] = None,
+    rng: Optional[random.Random] = None,
+    weights: Optional[Mapping[Tuple[str, str], float]] = None
 ) -> Tuple[List[Dict], List[str]]:
     """Generate a sequence of chords and their corresponding MIDI notes.
     
+    The same seed and settings always produce the same sequence.
+    
     Args:
         num_chords: Number of chords to generate
-        progression_type: Type of progression ("Random", "II-V-I", "Diatonic Cycle")
+        progression_type: "Random", MARKOV_PROGRESSION or the name of a
+            registered progression
         selected_notes: List of root notes to choose from
         selected_chord_types: List of chord types to choose from
         seconds_per_measure: Duration of each measure in seconds
+        seed: Seed for the sequence (ignored when rng is given)
+        rng: Random number generator to draw from; when neither seed nor rng
+            is given the global generator is used
+        weights: Relative weights of (root note, chord type) pairs in Random
+            mode (see iter_chord_symbols)
         
     Returns:
         Tuple of (MIDI sequence, display sequence)
     """
-    sequence = []
-    display_sequence = []
-    
-    if progression_type == "II-V-I":
-        while len(display_sequence) < num_chords:
-            root = random.choice(selected_notes)
-            progression = generate_two_five_one(root)
-            display_sequence.extend(progression)
-            if len(display_sequence) > num_chords:
-                display_sequence = display_sequence[:num_chords]
-                break
-    
-    elif progression_type == "Diatonic Cycle":
-        # Only generate one cycle at a time to ensure we start from a selected root
-        if len(selected_notes) == 0:
-            return [], []  # Return empty sequences if no notes are selected
-            
-        root = random.choice(selected_notes)
-        progression = generate_diatonic_cycle(root)
+    if rng is None and seed is not None:
+        rng = make_rng(seed)
+    display_sequence = list(islice(
+        iter_chord_symbols(progression_type, selected_notes, selected_chord_types, rng, weights),
+        num_chords
+    ))
+    return chord_events(display_sequence, seconds_per_measure), display_sequence
+
+@lru_cache(maxsize=SEQUENCE_CACHE_SIZE)
+def _cached_chord_sequence(
+    num_chords: int,
+    progression_type: str,
+    selected_notes: Tuple[str, ...],
+    selected_chord_types: Tuple[str, ...],
+    seconds_per_measure: float,
+    seed: int,
+    weights: Optional[Tuple[Tuple[Tuple[str, str], float], ...]]
+) -> Tuple[Tuple[Dict, ...], Tuple[str, ...]]:
+    midi_sequence, display_sequence = generate_chord_sequence(
+        num_chords, progression_type, list(selected_notes), list(selected_chord_types),
+        seconds_per_measure, seed=seed, weights=None if weights is None else dict(weights)
+    )
+    return tuple(midi_sequence), tuple(display_sequence)
+
+def cached_chord_sequence(
+    num_chords: int,
+    progression_type: str,
+    selected_notes: Sequence[str],
+    selected_chord_types: Sequence[str],
+    seconds_per_measure: float,
+    seed: int,
+    weights: Optional[Mapping[Tuple[str, str], float]] = None
+) -> Tuple[Tuple[Dict, ...], Tuple[str, ...]]:
+    """Seeded generate_chord_sequence backed by a process-wide LRU cache.
+    
+    Sessions that ask for the same exercise (same settings and seed) share
+    one result, so replaying an exercise costs a dictionary lookup. At most
+    SEQUENCE_CACHE_SIZE results are kept.
+    
+    Args:
+        num_chords: Number of chords to generate
+        progression_type: "Random", MARKOV_PROGRESSION or the name of a
+            registered progression
+        selected_notes: Root notes to choose from
+        selected_chord_types: Chord types to choose from
+        seconds_per_measure: Duration of each measure in seconds
+        seed: Seed for the sequence
+        weights: Relative weights of (root note, chord type) pairs in Random
+            mode (see iter_chord_symbols)
         
-        # Repeat the progression until we have enough chords
-        while len(display_sequence) < num_chords:
-            display_sequence.extend(progression)
+    Returns:
+        Tuple of (MIDI sequence, display sequence); both are shared between
+        callers and must not be modified
+    """
+    return _cached_chord_sequence(
+        num_chords, progression_type, tuple(selected_notes), tuple(selected_chord_types),
+        float(seconds_per_measure), seed,
+        None if weights is None else tuple(sorted(weights.items()))
+    )
+
+cached_chord_sequence.cache_info = _cached_chord_sequence.cache_info
+cached_chord_sequence.cache_clear = _cached_chord_sequence.cache_clear
+
+def chord_events(
+    display_sequence: List[str],
+    seconds_per_measure: float,
+    start_measure: int = 0
+) -> List[Dict]:
+    """Convert chord symbols to bass note events, one chord per measure.
+    
+    Args:
+        display_sequence: Chord symbols
+        seconds_per_measure: Duration of each measure in seconds
+        start_measure: Measure index of the first chord
         
-        # Trim to exact number of chords needed
-        if len(display_sequence) > num_chords:
-            display_sequence = display_sequence[:num_chords]
+    Returns:
+        List of MIDI events (see EventTimeline.to_dicts)
+    """
+    return build_chord_timeline(display_sequence, seconds_per_measure, start_measure).to_dicts()
+
+_CLICK_PITCHES = np.array([note_to_midi(note) for note in CLICK_NOTES], dtype=np.uint8)
+
+def generate_metronome_sequence(
+    num_measures: int,
+    beats_per_measure: int,
+    seconds_per_beat: float,
+    pattern: MetronomePattern = DEFAULT_PATTERN
+) -> List[Dict]:
+    """Generate metronome clicks for a run of measures.
     
-    else:
-        # Generate random chords
-        for _ in range(num_chords):
-            note = random.choice(selected_notes)
-            chord_type = random.choice(selected_chord_types)
-            display_chord = f"{note}{CHORD_TYPES[chord_type]}"
-            display_sequence.append(display_chord)
-    
-    # Convert display chords to MIDI sequence
-    for i, chord in enumerate(display_sequence):
-        # Extract the root note from the chord symbol
-        root_note = chord[0]
-        if len(chord) > 1 and chord[1] in ['b', '#']:
-            root_note += chord[1]
-            
-        # Use octave 1 for a deep double bass sound
-        midi_note = f"{root_note}1"
-        sequence.append({
-            'note': midi_note,
-            'time': i * seconds_per_measure,
-            'duration': seconds_per_measure * 0.95,
-            'instrument': 'bass'
-        })
+    Args:
+        num_measures: Number of measures
+        beats_per_measure: Beats per measure (time signature)
+        seconds_per_beat: Duration of each beat in seconds
+        pattern: Accents, subdivision and swing of the clicks
+        
+    Returns:
+        List of click events (see EventTimeline.to_dicts); accents play G5,
+        other beats E5 and subdivisions C5
+    """
+    return build_metronome_timeline(num_measures, beats_per_measure, seconds_per_beat, pattern).to_dicts()
+
+def generate_sequence_window(
+    chords: Iterator[str],
+    start_measure: int,
+    num_measures: int,
+    beats_per_measure: int,
+    pattern: MetronomePattern = DEFAULT_PATTERN
+) -> Dict[str, Any]:
+    """Pull the next window of measures from a chord stream.
+    
+    Event positions are integer ticks (PPQ per beat) from the start of the
+    session, so windows do not depend on the tempo and can be scheduled by
+    the player as they arrive. The events are built as timelines whose time
+    unit is one tick, i.e. at PPQ seconds per beat.
     
-    return sequence, display_sequence
+    Args:
+        chords: Chord stream, e.g. from iter_chord_symbols
+        start_measure: Index of the first measure in the window
+        num_measures: Maximum number of measures in the window
+        beats_per_measure: Beats per measure (time signature)
+        pattern: Metronome click pattern
+        
+    Returns:
+        Dict with 'start', 'ppq', 'chords', 'bass', 'voicings' and 'metronome'
+        entries, and 'final' set once the stream is exhausted. Bass and
+        voicing events have 'note', 'tick' and 'ticks' (length) keys, voicing
+        events and clicks also 'velocity'. 'notes' and 'voicing_notes' list
+        the distinct bass and voicing notes of the window as MIDI numbers, in
+        order of first use, so the player only loads the samples it needs.
+        Each window is voice-led on its own, starting near VOICING_CENTER.
+    """
+    display_sequence = list(islice(chords, num_measures))
+    bass = build_chord_timeline(display_sequence, beats_per_measure * PPQ, start_measure)
+    voicings = build_voicing_timeline(display_sequence, beats_per_measure * PPQ, start_measure)
+    clicks = build_metronome_timeline(len(display_sequence), beats_per_measure, PPQ, pattern, start_measure)
+    return {
+        'start': start_measure,
+        'ppq': PPQ,
+        'chords': display_sequence,
+        'bass': [
+            {'note': event['note'], 'tick': tick, 'ticks': ticks}
+            for event, tick, ticks in zip(bass.to_dicts(), _ticks(bass.time), _ticks(bass.duration))
+        ],
+        'notes': list(dict.fromkeys(bass.pitch.tolist())),
+        'voicings': [
+            {'note': event['note'], 'tick': tick, 'ticks': ticks, 'velocity': event['velocity']}
+            for event, tick, ticks in zip(voicings.to_dicts(), _ticks(voicings.time), _ticks(voicings.duration))
+        ],
+        'voicing_notes': list(dict.fromkeys(voicings.pitch.tolist())),
+        'metronome': [
+            {'note': event['note'], 'tick': tick, 'velocity': event['velocity']}
+            for event, tick in zip(clicks.to_dicts(), _ticks(clicks.time))
+        ],
+        'final': len(display_sequence) < num_measures
+    }
 
-def generate_metronome_sequence(
+def _ticks(times: np.ndarray) -> List[int]:
+    """Whole ticks of the times of a timeline kept in ticks."""
+    return np.rint(times).astype(np.int64).tolist()
+
+def build_chord_timeline(
+    display_sequence: List[str],
+    seconds_per_measure: float,
+    start_measure: int = 0
+) -> EventTimeline:
+    """Build the bass track for a chord sequence as an event timeline.
+    
+    Args:
+        display_sequence: Chord symbols, one per measure
+        seconds_per_measure: Duration of each measure in seconds
+        start_measure: Measure index of the first chord
+        
+    Returns:
+        Timeline with one bass note per chord
+    """
+    base = 12 * (BASS_OCTAVE + 1)
+    pitches = [base + note_to_pitch_class(chord_root(chord)) for chord in display_sequence]
+    times = np.arange(start_measure, start_measure + len(display_sequence), dtype=np.float64) * seconds_per_measure
+    return EventTimeline(times, seconds_per_measure * BASS_GATE, pitches,
+                         instrument=INSTRUMENT_IDS['bass'])
+
+def build_voicing_timeline(
+    display_sequence: List[str],
+    seconds_per_measure: float,
+    start_measure: int = 0
+) -> EventTimeline:
+    """Build a track of voice-led chord voicings, one chord per measure.
+    
+    Args:
+        display_sequence: Chord symbols, one per measure
+        seconds_per_measure: Duration of each measure in seconds
+        start_measure: Measure index of the first chord
+        
+    Returns:
+        Timeline with NUM_VOICES notes per chord
+    """
+    pitches = voice_lead(display_sequence).ravel()
+    measures = np.arange(start_measure, start_measure + len(display_sequence), dtype=np.float64)
+    times = np.repeat(measures, NUM_VOICES) * seconds_per_measure
+    return EventTimeline(times, seconds_per_measure * BASS_GATE, pitches, CHORD_VELOCITY,
+                         instrument=INSTRUMENT_IDS['chords'])
+
+def build_metronome_timeline(
     num_measures: int,
     beats_per_measure: int,
-    seconds_per_beat: float
-) -> List[float]:
-    """Generate metronome clicks for each beat.
+    seconds_per_beat: float,
+    pattern: MetronomePattern = DEFAULT_PATTERN,
+    start_measure: int = 0
+) -> EventTimeline:
+    """Build the metronome track as an event timeline.
     
     Args:
         num_measures: Number of measures
         beats_per_measure: Beats per measure (time signature)
         seconds_per_beat: Duration of each beat in seconds
+        pattern: Accents, subdivision and swing of the clicks
+        start_measure: Index of the first measure
         
     Returns:
-        List of metronome click times
+        Timeline with one event per click
     """
-    sequence = []
-    total_beats = num_measures * beats_per_measure
+    ticks, levels = click_ticks(pattern, num_measures, beats_per_measure, start_measure)
+    return EventTimeline(TempoMap(seconds_per_beat).seconds(ticks), CLICK_SECONDS,
+                         _CLICK_PITCHES[levels], np.asarray(CLICK_VELOCITIES)[levels],
+                         instrument=INSTRUMENT_IDS['metronome'])
+
+class PracticeSetBatch:
+    """Many practice sets of equal length stored as two small integer matrices.
+    
+    Row i holds practice set i. Roots index ROOT_NAMES and chord types index
+    CHORD_TYPE_NAMES, so a thousand 128-chord sets take 256 KB.
     
-    for i in range(total_beats):
-        sequence.append(i * seconds_per_beat)
+    Attributes:
+        roots: Root codes, shape (num_sets, num_chords), uint8
+        chord_types: Chord type codes, shape (num_sets, num_chords), uint8
+    """
+    
+    __slots__ = ('roots', 'chord_types')
+    
+    def __init__(self, roots: np.ndarray, chord_types: np.ndarray):
+        self.roots = np.asarray(roots, dtype=np.uint8)
+        self.chord_types = np.asarray(chord_types, dtype=np.uint8)
+        
+    def __len__(self) -> int:
+        return len(self.roots)
+    
+    def __repr__(self) -> str:
+        return f"PracticeSetBatch({self.roots.shape[0]} sets x {self.roots.shape[1]} chords)"
+    
+    def symbols(self) -> np.ndarray:
+        """Chord symbols of every set as an object array of shape (num_sets, num_chords)."""
+        return _SYMBOL_TABLE[self.roots, self.chord_types]
+    
+    def chords(self, index: int) -> List[str]:
+        """Chord symbols of one practice set."""
+        return _SYMBOL_TABLE[self.roots[index], self.chord_types[index]].tolist()
+    
+    def bass_pitches(self) -> np.ndarray:
+        """MIDI notes of the bass line of every set, shape (num_sets, num_chords)."""
+        return _ROOT_PITCH_CLASSES[self.roots] + 12 * (BASS_OCTAVE + 1)
+    
+    def save(self, path: str) -> None:
+        """Write all sets to a single uncompressed .npz file.
+        
+        Args:
+            path: Output file path
+        """
+        np.savez(path, roots=self.roots, chord_types=self.chord_types,
+                 root_names=np.array(ROOT_NAMES), chord_type_names=np.array(CHORD_TYPE_NAMES))
+    
+    @classmethod
+    def load(cls, path: str) -> 'PracticeSetBatch':
+        """Read sets written by save.
+        
+        Args:
+            path: File written by save
+            
+        Returns:
+            The stored batch
+        """
+        with np.load(path) as data:
+            if (tuple(data['root_names']) != ROOT_NAMES
+                    or tuple(data['chord_type_names']) != CHORD_TYPE_NAMES):
+                raise ValueError(f"{path} was written with a different vocabulary")
+            return cls(data['roots'], data['chord_types'])
+    
+    def write_text(self, path: str) -> None:
+        """Write all sets to a text file, one line of chord symbols per set.
+        
+        Args:
+            path: Output file path
+        """
+        with open(path, 'w') as f:
+            f.writelines(' '.join(row) + '\n' for row in self.symbols().tolist())
+
+def _progression_codes(template: str, root_note: str) -> Tuple[List[int], List[int]]:
+    """Root and chord type codes of a progression in one key."""
+    chords = progression_in_key(template, root_note)
+    return ([_ROOT_INDEX[chord_root(chord)] for chord in chords],
+            [_CHORD_TYPE_INDEX[_CHORD_TYPE_BY_SYMBOL[chord]] for chord in chords])
+
+def generate_practice_sets(
+    num_sets: int,
+    num_chords: int,
+    progression_type: str,
+    selected_notes: List[str],
+    selected_chord_types: List[str],
+    seed: Optional[int] = None
+) -> PracticeSetBatch:
+    """Generate many distinct practice sets at once.
+    
+    All random draws for all sets are made in a few vectorised calls to a
+    seeded NumPy generator, so the result is reproducible for a given seed.
+    
+    Args:
+        num_sets: Number of practice sets, e.g. one per student
+        num_chords: Number of chords per set
+        progression_type: "Random", MARKOV_PROGRESSION or the name of a
+            registered progression
+        selected_notes: Root notes (or keys) to choose from
+        selected_chord_types: Chord types to choose from in Random and
+            MARKOV_PROGRESSION modes
+        seed: Seed for the random generator
+        
+    Returns:
+        Batch holding every set
+    """
+    rng = np.random.default_rng(seed)
+    notes = np.array([_ROOT_INDEX[note] for note in selected_notes], dtype=np.uint8)
+    
+    if progression_type in PROGRESSIONS:
+        template, fixed_key = PROGRESSIONS[progression_type]
+        # Code table of the progression in each selectable key: (keys, length)
+        codes = [_progression_codes(template, note) for note in selected_notes]
+        root_table = np.array([roots for roots, _ in codes], dtype=np.uint8)
+        type_table = np.array([types for _, types in codes], dtype=np.uint8)
+        length = root_table.shape[1]
+        
+        cycles = -(-num_chords // length)
+        keys = rng.integers(len(notes), size=(num_sets, 1 if fixed_key else cycles))
+        if fixed_key:
+            keys = np.repeat(keys, cycles, axis=1)
+        roots = root_table[keys].reshape(num_sets, -1)[:, :num_chords]
+        chord_types = type_table[keys].reshape(num_sets, -1)[:, :num_chords]
+    elif progression_type == MARKOV_PROGRESSION:
+        # One walk per set, all advanced together
+        chain = markov_chain(tuple(selected_notes), tuple(selected_chord_types))
+        state_roots = np.array([_ROOT_INDEX[chord_root(symbol)] for symbol in chain.symbols], dtype=np.uint8)
+        state_types = np.array([_CHORD_TYPE_INDEX[_CHORD_TYPE_BY_SYMBOL[symbol]] for symbol in chain.symbols],
+                               dtype=np.uint8)
+        states = walk(chain, rng, num_chords, num_sets)
+        roots, chord_types = state_roots[states], state_types[states]
+    else:
+        types = np.array([_CHORD_TYPE_INDEX[name] for name in selected_chord_types], dtype=np.uint8)
+        roots = notes[rng.integers(len(notes), size=(num_sets, num_chords))]
+        chord_types = types[rng.integers(len(types), size=(num_sets, num_chords))]
     
-    return sequence
+    return PracticeSetBatch(roots, chord_types)
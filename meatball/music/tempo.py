@@ -0,0 +1,60 @@
+"""Integer tick time base and tempo maps.
+
+Sequences are laid out in ticks, PPQ to the beat, so event positions stay
+exact integers however long a session runs. A TempoMap turns ticks into
+seconds; changing the tempo only replaces the map, never the events.
+"""
+
+from typing import Sequence, Tuple, Union
+import numpy as np
+
+PPQ = 480  # Ticks per beat; divisible by every supported subdivision
+
+class TempoMap:
+    """Piecewise constant tempo, starting at tick 0.
+
+    Attributes:
+        ticks: Tick at which each tempo segment starts (int64, ticks[0] == 0)
+        seconds_per_beat: Beat length of each segment in seconds (float64)
+        start_seconds: Time in seconds at which each segment starts (float64)
+    """
+
+    __slots__ = ('ticks', 'seconds_per_beat', 'start_seconds')
+
+    def __init__(self, seconds_per_beat: float, changes: Sequence[Tuple[int, float]] = ()):
+        """Create a tempo map from beat lengths.
+
+        Args:
+            seconds_per_beat: Beat length at tick 0 in seconds
+            changes: (tick, seconds per beat) pairs for later tempo changes,
+                in increasing tick order
+        """
+        self.ticks = np.array([0] + [tick for tick, _ in changes], dtype=np.int64)
+        self.seconds_per_beat = np.array([seconds_per_beat] + [spb for _, spb in changes],
+                                         dtype=np.float64)
+        if np.any(np.diff(self.ticks) <= 0) or np.any(self.seconds_per_beat <= 0):
+            raise ValueError("Tempo changes must have increasing ticks and positive beat lengths")
+        segment_seconds = np.diff(self.ticks) / PPQ * self.seconds_per_beat[:-1]
+        self.start_seconds = np.concatenate([[0.0], np.cumsum(segment_seconds)])
+
+    def __repr__(self) -> str:
+        return f"TempoMap({len(self.ticks)} segments, starting at {self.bpm[0]:g} bpm)"
+
+    @property
+    def bpm(self) -> np.ndarray:
+        """Tempo of each segment in beats per minute."""
+        return 60.0 / self.seconds_per_beat
+
+    def seconds(self, ticks: Union[int, Sequence[int], np.ndarray]) -> np.ndarray:
+        """Convert tick positions to seconds.
+
+        Args:
+            ticks: Tick positions (any shape)
+
+        Returns:
+            Times in seconds (float64, same shape)
+        """
+        ticks = np.asarray(ticks, dtype=np.int64)
+        segment = np.searchsorted(self.ticks, ticks, side='right') - 1
+        return (self.start_seconds[segment]
+                + (ticks - self.ticks[segment]) / PPQ * self.seconds_per_beat[segment])
@@ -1,4 +1,10 @@
-"""Music theory utilities for chord and scale generation."""
+"""Music theory utilities for chord and scale generation.
+
+Notes are handled internally as integer pitch classes (0-11, C=0) and
+spelled on the way out. Every scale and mode is precomputed for all twelve
+roots at import time, so the string functions below are plain table
+lookups.
+"""
 
 from typing import List, Tuple, Dict
 
@@ -35,49 +41,183 @@ CHORD_TYPES = {
     'Sus2': 'sus2'  # Csus2
 }
 
-def get_scale_degrees(root_note: str) -> List[str]:
-    """Get the scale degrees for a major scale starting from the given root note.
-    
+# Scales and modes: (intervals from the root, semitones from the relative
+# major tonic down to this root). The second value picks the key signature
+# used for spelling, e.g. A Aeolian is spelled like C major.
+SCALE_MODES: Dict[str, Tuple[Tuple[int, ...], int]] = {
+    'Major': ((0, 2, 4, 5, 7, 9, 11), 0),
+    'Dorian': ((0, 2, 3, 5, 7, 9, 10), 2),
+    'Phrygian': ((0, 1, 3, 5, 7, 8, 10), 4),
+    'Lydian': ((0, 2, 4, 6, 7, 9, 11), 5),
+    'Mixolydian': ((0, 2, 4, 5, 7, 9, 10), 7),
+    'Minor': ((0, 2, 3, 5, 7, 8, 10), 9),
+    'Locrian': ((0, 1, 3, 5, 6, 8, 10), 11),
+    'Harmonic Minor': ((0, 2, 3, 5, 7, 8, 11), 9),
+    'Melodic Minor': ((0, 2, 3, 5, 7, 9, 11), 9),
+}
+
+# Integer pitch-class core (C=0)
+NOTE_TO_PITCH_CLASS: Dict[str, int] = {
+    note: (NOTES.index(flat) + 9) % 12  # NOTE_PAIRS starts at A
+    for flat, sharp in NOTE_PAIRS
+    for note in (flat, sharp)
+}
+
+PITCH_CLASS_FLAT: Tuple[str, ...] = tuple(
+    NOTES[(pc + 3) % 12] for pc in range(12)
+)
+PITCH_CLASS_SHARP: Tuple[str, ...] = tuple(
+    NOTES_SHARP[(pc + 3) % 12] for pc in range(12)
+)
+
+def _uses_sharps(tonic_pc: int) -> bool:
+    """Whether the major key on the given pitch class is spelled with sharps."""
+    return PITCH_CLASS_FLAT[tonic_pc] in SHARP_ROOTS
+
+def _spell(pitch_classes: Tuple[int, ...], sharp: bool) -> Tuple[str, ...]:
+    """Spell a tuple of pitch classes with sharps or flats."""
+    names = PITCH_CLASS_SHARP if sharp else PITCH_CLASS_FLAT
+    return tuple(names[pc] for pc in pitch_classes)
+
+def _build_scale_tables() -> Tuple[Dict[Tuple[int, str], Tuple[int, ...]],
+                                   Dict[Tuple[str, str], Tuple[str, ...]]]:
+    """Precompute every scale/mode for every root, as pitch classes and names."""
+    pitch_classes = {}
+    names = {}
+    for mode, (intervals, major_offset) in SCALE_MODES.items():
+        for root_pc in range(12):
+            pcs = tuple((root_pc + interval) % 12 for interval in intervals)
+            pitch_classes[(root_pc, mode)] = pcs
+
+            sharp = _uses_sharps((root_pc - major_offset) % 12)
+            spelled = _spell(pcs, sharp)
+            if len({name[0] for name in spelled}) < len(spelled):
+                # Altered scales (e.g. harmonic minor) may read better in
+                # the other spelling when that avoids a repeated letter
+                alternative = _spell(pcs, not sharp)
+                if len({name[0] for name in alternative}) == len(alternative):
+                    spelled = alternative
+            # Register under both spellings of the root
+            names[(PITCH_CLASS_FLAT[root_pc], mode)] = spelled
+            names[(PITCH_CLASS_SHARP[root_pc], mode)] = spelled
+    return pitch_classes, names
+
+SCALE_PITCH_CLASSES, SCALE_TABLE = _build_scale_tables()
+
+# Chord symbol lookup: (root, chord type) -> symbol, and symbol -> root
+CHORD_SYMBOLS: Dict[Tuple[str, str], str] = {
+    (note, chord_type): f"{note}{suffix}"
+    for note in NOTE_TO_PITCH_CLASS
+    for chord_type, suffix in CHORD_TYPES.items()
+}
+_CHORD_ROOTS: Dict[str, str] = {
+    symbol: root for (root, _), symbol in CHORD_SYMBOLS.items()
+}
+
+_NOTE_DISPLAY: Dict[str, str] = {
+    note: f"{sharp}/{flat}" if flat != sharp else flat
+    for flat, sharp in NOTE_PAIRS
+    for note in (flat, sharp)
+}
+
+def note_to_pitch_class(note: str) -> int:
+    """Get the pitch class (0-11, C=0) of a note name.
+
+    Args:
+        note: Note name in flat or sharp spelling (e.g., "Bb", "A#")
+
+    Returns:
+        Integer pitch class
+    """
+    return NOTE_TO_PITCH_CLASS[note]
+
+def pitch_class_to_note(pitch_class: int, sharp: bool = False) -> str:
+    """Spell a pitch class as a note name.
+
+    Args:
+        pitch_class: Integer pitch class (taken modulo 12)
+        sharp: Use sharp spelling instead of flat spelling
+
+    Returns:
+        Note name (e.g., "Bb" or "A#")
+    """
+    names = PITCH_CLASS_SHARP if sharp else PITCH_CLASS_FLAT
+    return names[pitch_class % 12]
+
+def note_to_midi(note: str) -> int:
+    """Get the MIDI note number of a note name with octave.
+
+    Args:
+        note: Note name with octave (e.g., "C4", "F#1"); C4 is MIDI note 60
+
+    Returns:
+        MIDI note number
+    """
+    name, octave = note[:-1], note[-1]
+    if name.endswith('-'):  # Negative octave, e.g. "C-1"
+        name, octave = name[:-1], f"-{octave}"
+    return 12 * (int(octave) + 1) + NOTE_TO_PITCH_CLASS[name]
+
+def midi_to_note(midi_note: int, sharp: bool = False) -> str:
+    """Spell a MIDI note number as a note name with octave.
+
+    Args:
+        midi_note: MIDI note number
+        sharp: Use sharp spelling instead of flat spelling
+
+    Returns:
+        Note name with octave (e.g., "Bb1")
+    """
+    return f"{pitch_class_to_note(midi_note, sharp)}{midi_note // 12 - 1}"
+
+def get_scale_degrees(root_note: str, mode: str = 'Major') -> List[str]:
+    """Get the scale degrees for a scale or mode starting from the given root note.
+
     Args:
         root_note: The root note of the scale
-        
+        mode: Name of the scale or mode (a key of SCALE_MODES)
+
     Returns:
-        List of notes in the major scale
+        List of notes in the scale
     """
-    # Choose between sharp and flat notes based on the root
-    notes = NOTES_SHARP if root_note in SHARP_ROOTS else NOTES
-    
-    # Major scale intervals in semitones from the root
-    intervals = [0, 2, 4, 5, 7, 9, 11]
-    note_index = notes.index(root_note)
-    scale_notes = []
-    
-    for interval in intervals:
-        scale_index = (note_index + interval) % len(notes)
-        scale_notes.append(notes[scale_index])
-    
-    return scale_notes
+    try:
+        return list(SCALE_TABLE[(root_note, mode)])
+    except KeyError:
+        raise ValueError(f"Unknown scale: {root_note} {mode}") from None
+
+def chord_symbol(root_note: str, chord_type: str) -> str:
+    """Get the chord symbol for a root note and chord type.
+
+    Args:
+        root_note: The root note of the chord
+        chord_type: Chord type name (a key of CHORD_TYPES)
+
+    Returns:
+        Chord symbol (e.g., "Dm7")
+    """
+    return CHORD_SYMBOLS[(root_note, chord_type)]
+
+def chord_root(chord: str) -> str:
+    """Get the root note of a chord symbol.
+
+    Args:
+        chord: Chord symbol (e.g., "F#m7")
+
+    Returns:
+        Root note of the chord (e.g., "F#")
+    """
+    root = _CHORD_ROOTS.get(chord)
+    if root is None:
+        root = chord[:2] if len(chord) > 1 and chord[1] in ('b', '#') else chord[:1]
+    return root
 
 def get_note_display(note: str) -> str:
     """Get the display version of a note (showing both representations if applicable).
-    
+
     Args:
         note: The note to get display version for
-        
+
     Returns:
         Display version of the note (e.g., "F#/Gb")
     """
-    # Try to find the note in both lists
-    try:
-        idx = NOTES.index(note)
-    except ValueError:
-        try:
-            idx = NOTES_SHARP.index(note)
-        except ValueError:
-            return note  # If not found in either list, return as is
-    
-    flat_note = NOTES[idx]
-    sharp_note = NOTES_SHARP[idx]
-    if flat_note != sharp_note:
-        return f"{sharp_note}/{flat_note}"
-    return note
+    return _NOTE_DISPLAY.get(note, note)
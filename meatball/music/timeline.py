@@ -0,0 +1,222 @@
+"""Compact array-backed event timelines."""
+
+from typing import Any, Dict, Iterable, List, Sequence, Union
+import numpy as np
+from .theory import midi_to_note, note_to_midi
+
+INSTRUMENTS = ('bass', 'metronome', 'chords')
+INSTRUMENT_IDS = {name: i for i, name in enumerate(INSTRUMENTS)}
+DEFAULT_VELOCITY = 100
+
+# Column layout of the packed buffer, widest first so every column stays aligned
+_COLUMNS = (
+    ('time', np.float64),
+    ('duration', np.float64),
+    ('pitch', np.uint8),
+    ('velocity', np.uint8),
+    ('instrument', np.uint8),
+)
+EVENT_BYTES = sum(np.dtype(dtype).itemsize for _, dtype in _COLUMNS)
+
+class EventTimeline:
+    """Note events stored as parallel arrays (struct-of-arrays).
+
+    All columns of a timeline built by this class live in one contiguous
+    buffer, laid out column after column, so the whole timeline can be
+    exported to bytes without copying. Slices are views that share memory
+    with their parent.
+
+    Attributes:
+        time: Event start times in seconds (float64)
+        duration: Event durations in seconds (float64)
+        pitch: MIDI note numbers (uint8)
+        velocity: MIDI velocities (uint8)
+        instrument: Instrument ids, indexes into INSTRUMENTS (uint8)
+    """
+
+    __slots__ = ('time', 'duration', 'pitch', 'velocity', 'instrument', '_buffer')
+
+    def __init__(
+        self,
+        time: Sequence[float],
+        duration: Union[float, Sequence[float]],
+        pitch: Union[int, Sequence[int]],
+        velocity: Union[int, Sequence[int]] = DEFAULT_VELOCITY,
+        instrument: Union[int, str, Sequence[int]] = 0
+    ):
+        """Create a timeline from column values (scalars are broadcast).
+
+        Args:
+            time: Event start times in seconds
+            duration: Event durations in seconds
+            pitch: MIDI note numbers
+            velocity: MIDI velocities
+            instrument: Instrument ids or a single instrument name
+        """
+        time = np.asarray(time, dtype=np.float64)
+        if isinstance(instrument, str):
+            instrument = INSTRUMENT_IDS[instrument]
+        self._bind(np.empty(len(time) * EVENT_BYTES, dtype=np.uint8), len(time))
+        self.time[:] = time
+        self.duration[:] = duration
+        self.pitch[:] = pitch
+        self.velocity[:] = velocity
+        self.instrument[:] = instrument
+
+    def _bind(self, buffer: np.ndarray, length: int) -> None:
+        """Point the column attributes at their regions of a packed buffer."""
+        self._buffer = buffer
+        offset = 0
+        for name, dtype in _COLUMNS:
+            size = length * np.dtype(dtype).itemsize
+            setattr(self, name, buffer[offset:offset + size].view(dtype))
+            offset += size
+
+    @classmethod
+    def _from_columns(cls, columns: Dict[str, np.ndarray]) -> 'EventTimeline':
+        """Wrap existing column arrays without copying them."""
+        timeline = cls.__new__(cls)
+        timeline._buffer = None
+        for name, _ in _COLUMNS:
+            setattr(timeline, name, columns[name])
+        return timeline
+
+    @classmethod
+    def empty(cls) -> 'EventTimeline':
+        """Create a timeline with no events."""
+        return cls([], 0.0, 0)
+
+    @classmethod
+    def from_events(cls, events: Iterable[Dict[str, Any]]) -> 'EventTimeline':
+        """Build a timeline from event dicts as produced by generate_chord_sequence.
+
+        Args:
+            events: Dicts with 'note', 'time' and 'duration' keys, and optionally
+                'velocity' and 'instrument'
+
+        Returns:
+            New timeline holding the events
+        """
+        events = list(events)
+        return cls(
+            [event['time'] for event in events],
+            [event['duration'] for event in events],
+            [note_to_midi(event['note']) for event in events],
+            [event.get('velocity', DEFAULT_VELOCITY) for event in events],
+            [INSTRUMENT_IDS[event.get('instrument', 'bass')] for event in events]
+        )
+
+    @classmethod
+    def from_buffer(cls, buffer: Union[bytes, bytearray, memoryview]) -> 'EventTimeline':
+        """Rebuild a timeline from the output of to_buffer without copying.
+
+        Args:
+            buffer: Packed timeline bytes
+
+        Returns:
+            Timeline whose columns are views of the buffer (read-only for bytes)
+        """
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        if len(data) % EVENT_BYTES:
+            raise ValueError(f"Buffer size {len(data)} is not a multiple of {EVENT_BYTES}")
+        timeline = cls.__new__(cls)
+        timeline._bind(data, len(data) // EVENT_BYTES)
+        return timeline
+
+    @classmethod
+    def merge(cls, *timelines: 'EventTimeline') -> 'EventTimeline':
+        """Merge timelines (e.g. bass and metronome tracks) into one, ordered by time.
+
+        Events with equal times keep the order of the timelines passed in.
+        """
+        if not timelines:
+            return cls.empty()
+        time = np.concatenate([t.time for t in timelines])
+        order = np.argsort(time, kind='stable')
+        return cls(
+            time[order],
+            np.concatenate([t.duration for t in timelines])[order],
+            np.concatenate([t.pitch for t in timelines])[order],
+            np.concatenate([t.velocity for t in timelines])[order],
+            np.concatenate([t.instrument for t in timelines])[order]
+        )
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def __getitem__(self, key: Union[slice, np.ndarray, List[int]]) -> 'EventTimeline':
+        """Select events; slices are views, index arrays and masks are copies."""
+        if isinstance(key, (int, np.integer)):
+            raise TypeError("Use to_dicts() to access individual events")
+        return self._from_columns({name: getattr(self, name)[key] for name, _ in _COLUMNS})
+
+    def __repr__(self) -> str:
+        return f"EventTimeline({len(self)} events)"
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the event data in bytes."""
+        return len(self) * EVENT_BYTES
+
+    @property
+    def end_time(self) -> float:
+        """Time in seconds at which the last event finishes."""
+        if not len(self):
+            return 0.0
+        return float(np.max(self.time + self.duration))
+
+    def between(self, start: float, end: float) -> 'EventTimeline':
+        """View of the events starting in [start, end), for a time-sorted timeline."""
+        lo, hi = np.searchsorted(self.time, [start, end], side='left')
+        return self[lo:hi]
+
+    def select(self, instrument: str) -> 'EventTimeline':
+        """Copy of the events played by one instrument."""
+        return self[self.instrument == INSTRUMENT_IDS[instrument]]
+
+    def shifted(self, offset: float) -> 'EventTimeline':
+        """Copy of the timeline with every event moved by offset seconds."""
+        return EventTimeline(self.time + offset, self.duration, self.pitch,
+                             self.velocity, self.instrument)
+
+    def copy(self) -> 'EventTimeline':
+        """Packed copy of the timeline."""
+        return EventTimeline(self.time, self.duration, self.pitch,
+                             self.velocity, self.instrument)
+
+    def to_buffer(self) -> memoryview:
+        """Export the events as packed bytes.
+
+        Timelines that own a packed buffer are exported without copying; views
+        produced by slicing are packed first.
+
+        Returns:
+            Read-only memoryview over the packed columns
+        """
+        packed = self if self._buffer is not None else self.copy()
+        return memoryview(packed._buffer).toreadonly()
+
+    def to_dicts(self, sharp: bool = False) -> List[Dict[str, Any]]:
+        """Export to the list-of-dicts format used by the player.
+
+        Args:
+            sharp: Spell notes with sharps instead of flats
+
+        Returns:
+            List of dicts with 'note', 'time', 'duration', 'velocity' and
+            'instrument' keys
+        """
+        notes = [midi_to_note(pitch, sharp) for pitch in range(128)]
+        return [
+            {
+                'note': notes[pitch],
+                'time': time,
+                'duration': duration,
+                'velocity': velocity,
+                'instrument': INSTRUMENTS[instrument]
+            }
+            for time, duration, pitch, velocity, instrument in zip(
+                self.time.tolist(), self.duration.tolist(), self.pitch.tolist(),
+                self.velocity.tolist(), self.instrument.tolist()
+            )
+        ]
@@ -0,0 +1,162 @@
+"""Chord voicings with smooth voice leading.
+
+Every chord is voiced with four notes in a mid register above the bass
+line. The candidate voicings of a chord are built from interval tables:
+close position and drop-2/drop-3 spreads of every inversion, in every
+octave that fits the register. Candidates are cached per chord type
+(shapes) and per root (placed notes).
+
+For a whole sequence, voice_lead picks one candidate per chord so that the
+voices move as little as possible, with a dynamic program over the
+candidates: all transition costs are computed in one array operation and
+each chord then takes a single vectorised minimum over its predecessors.
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from .theory import CHORD_SYMBOLS, chord_root, note_to_pitch_class
+
+NUM_VOICES = 4
+# MIDI range of the voicings: C3 to C6, above the bass line
+VOICING_LOW = 48
+VOICING_HIGH = 84
+# The first chord of a sequence is voiced closest to this pitch (E4)
+VOICING_CENTER = 64
+
+# Chord tones as semitones above the root, four voices per voicing. Triads
+# double the root; the seventh chords can also be played rootless with the
+# ninth in place of the root, since the bass already plays it.
+CHORD_INTERVALS: Dict[str, Tuple[Tuple[int, ...], ...]] = {
+    'Major': ((0, 4, 7, 12),),
+    'Minor': ((0, 3, 7, 12),),
+    'Major 7': ((0, 4, 7, 11), (14, 4, 7, 11)),
+    'Minor 7': ((0, 3, 7, 10), (14, 3, 7, 10)),
+    'Dominant 7': ((0, 4, 7, 10), (14, 4, 7, 10)),
+    'Minor 7 flat 5': ((0, 3, 6, 10),),
+    'Diminished': ((0, 3, 6, 12),),
+    'Augmented': ((0, 4, 8, 12),),
+    'Sus4': ((0, 5, 7, 12),),
+    'Sus2': ((0, 2, 7, 12),)
+}
+
+_CHORD_TYPE_BY_SYMBOL = {symbol: chord_type for (_, chord_type), symbol in CHORD_SYMBOLS.items()}
+
+def _stack(pitch_classes: Sequence[int]) -> List[int]:
+    """Stack pitch classes upwards in the given order, each above the last."""
+    notes = [pitch_classes[0]]
+    for pitch_class in pitch_classes[1:]:
+        notes.append(notes[-1] + ((pitch_class - notes[-1]) % 12 or 12))
+    return notes
+
+@lru_cache(maxsize=None)
+def voicing_shapes(chord_type: str) -> np.ndarray:
+    """Voicing shapes of a chord type, as semitone offsets from the root.
+
+    Args:
+        chord_type: Chord type name (a key of CHORD_TYPES)
+
+    Returns:
+        Read-only int array of shape (num_shapes, NUM_VOICES), each row in
+        ascending order; octave placement is left to voicing_candidates
+    """
+    if chord_type not in CHORD_INTERVALS:
+        raise ValueError(f"Unknown chord type: {chord_type}")
+    shapes = set()
+    for intervals in CHORD_INTERVALS[chord_type]:
+        pitch_classes = [interval % 12 for interval in intervals]
+        for inversion in range(NUM_VOICES):
+            close = _stack(pitch_classes[inversion:] + pitch_classes[:inversion])
+            shapes.add(tuple(close))
+            # Drop-2 and drop-3: the second and third highest voices an octave down
+            for drop in (2, 3):
+                spread = list(close)
+                spread[-drop] -= 12
+                # A dropped doubled tone can land on its double; skip those
+                if len(set(spread)) == NUM_VOICES:
+                    shapes.add(tuple(sorted(spread)))
+    table = np.array(sorted(shapes), dtype=np.int64)
+    table.flags.writeable = False
+    return table
+
+@lru_cache(maxsize=None)
+def voicing_candidates(root_note: str, chord_type: str) -> np.ndarray:
+    """Every voicing of a chord that fits between VOICING_LOW and VOICING_HIGH.
+
+    Args:
+        root_note: Root note of the chord
+        chord_type: Chord type name (a key of CHORD_TYPES)
+
+    Returns:
+        Read-only int array of MIDI notes, shape (num_candidates, NUM_VOICES),
+        each row in ascending order
+    """
+    shapes = voicing_shapes(chord_type)
+    root = note_to_pitch_class(root_note)
+    octaves = 12 * np.arange(VOICING_LOW // 12 - 2, VOICING_HIGH // 12 + 2)
+    placed = (root + shapes[:, None, :] + octaves[None, :, None]).reshape(-1, NUM_VOICES)
+    fits = (placed[:, 0] >= VOICING_LOW) & (placed[:, -1] <= VOICING_HIGH)
+    candidates = np.unique(placed[fits], axis=0)
+    candidates.flags.writeable = False
+    return candidates
+
+def chord_voicings(chord: str) -> np.ndarray:
+    """Candidate voicings of a chord symbol.
+
+    Args:
+        chord: Chord symbol (e.g., "Dm7")
+
+    Returns:
+        Read-only int array of MIDI notes, shape (num_candidates, NUM_VOICES)
+    """
+    try:
+        chord_type = _CHORD_TYPE_BY_SYMBOL[chord]
+    except KeyError:
+        raise ValueError(f"Unknown chord symbol: {chord}") from None
+    return voicing_candidates(chord_root(chord), chord_type)
+
+def voice_lead(display_sequence: Sequence[str]) -> np.ndarray:
+    """Voice a chord sequence with the least total voice movement.
+
+    The cost of moving between two voicings is the sum of the distances,
+    in semitones, between their voices taken from low to high. The first
+    chord is placed closest to VOICING_CENTER.
+
+    Args:
+        display_sequence: Chord symbols
+
+    Returns:
+        Int array of MIDI notes, shape (len(display_sequence), NUM_VOICES)
+    """
+    num_chords = len(display_sequence)
+    if num_chords == 0:
+        return np.empty((0, NUM_VOICES), dtype=np.int64)
+
+    # Pad every chord's candidates to a common count; padding rows cost infinity
+    candidates = [chord_voicings(chord) for chord in display_sequence]
+    counts = np.array([len(c) for c in candidates])
+    width = int(counts.max())
+    table = np.zeros((num_chords, width, NUM_VOICES), dtype=np.int16)
+    valid = np.arange(width)[None, :] < counts[:, None]
+    table[valid] = np.concatenate(candidates)
+
+    # Transition costs of every pair of neighbouring chords at once:
+    # (num_chords - 1, width, width)
+    moves = np.zeros((num_chords - 1, width, width), dtype=np.int16)
+    for voice in range(NUM_VOICES):
+        moves += np.abs(table[1:, None, :, voice] - table[:-1, :, None, voice])
+    moves = np.where(valid[1:, None, :], moves, np.inf)
+
+    cost = np.abs(table[0].mean(axis=-1) - VOICING_CENTER)
+    cost[~valid[0]] = np.inf
+    back = np.zeros((num_chords, width), dtype=np.int64)
+    for i in range(1, num_chords):
+        total = cost[:, None] + moves[i - 1]
+        back[i] = total.argmin(axis=0)
+        cost = total[back[i], np.arange(width)]
+
+    choice = np.empty(num_chords, dtype=np.int64)
+    choice[-1] = cost.argmin()
+    for i in range(num_chords - 1, 0, -1):
+        choice[i - 1] = back[i, choice[i]]
+    return table[np.arange(num_chords), choice].astype(np.int64)
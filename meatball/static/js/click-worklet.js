@@ -0,0 +1,146 @@
+// Metronome synthesised on the audio rendering thread (see the click track
+// in player.js). Clicks arrive as (beat, gain, accent) triples, through a
+// shared ring buffer where the page is cross-origin isolated and in batched
+// messages otherwise. They are placed on the audio clock from the session's
+// tempo anchor, so every click starts on its exact sample frame whatever the
+// main thread is busy with.
+
+// Same voice as meatball.music.render.synthesize_click
+const CLICK_DURATION = 0.03;
+const CLICK_FREQUENCY = 1500.0;
+const ACCENT_FREQUENCY = 2000.0;
+const CLICK_DECAY = CLICK_DURATION / 5;
+
+// Values per click in the event list: beat, gain, accent (0 or 1)
+const CLICK_FIELDS = 3;
+
+// Clicks that reach the thread later than this are dropped rather than
+// played out of time
+const MAX_LATENESS = 0.05;
+
+class ClickProcessor extends AudioWorkletProcessor {
+    static get parameterDescriptors() {
+        return [{ name: 'volume', defaultValue: 1, minValue: 0, maxValue: 1, automationRate: 'k-rate' }];
+    }
+
+    constructor(options) {
+        super();
+        this.clicks = [];       // Pending clicks as [beat, gain, accent], sorted by beat
+        this.voices = [];       // Sounding clicks as [start frame, gain, frequency]
+        this.anchorTime = 0;    // Audio time at which anchorBeat sounds
+        this.anchorBeat = 0;
+        this.secondsPerBeat = 0.5;
+        this.playing = false;
+
+        // Ring of CLICK_FIELDS values per click; counts holds the number of
+        // clicks written by the page and read here, in that order
+        const ring = options.processorOptions.ring;
+        this.ring = ring && { data: new Float64Array(ring.data), counts: new Int32Array(ring.counts) };
+        this.port.onmessage = event => this.onMessage(event.data);
+    }
+
+    onMessage(message) {
+        if (message.type === 'clicks') {
+            this.addClicks(message.clicks, 0, message.clicks.length / CLICK_FIELDS);
+        } else if (message.type === 'timing') {
+            this.anchorTime = message.anchorTime;
+            this.anchorBeat = message.anchorBeat;
+            this.secondsPerBeat = message.secondsPerBeat;
+            this.playing = message.playing;
+            if (!this.playing) {
+                this.voices.length = 0;
+            }
+            // Clicks before the anchor were played or skipped on purpose
+            let done = 0;
+            while (done < this.clicks.length && this.clicks[done][0] < this.anchorBeat) {
+                done++;
+            }
+            this.clicks.splice(0, done);
+        } else if (message.type === 'clear') {
+            this.clicks.length = 0;
+            this.voices.length = 0;
+            this.playing = false;
+            if (this.ring) {
+                // Drop what the stopped session left in the ring
+                const read = Atomics.load(this.ring.counts, 1);
+                if (message.written - read > 0) {
+                    Atomics.store(this.ring.counts, 1, message.written);
+                }
+            }
+        }
+    }
+
+    // Append count clicks starting at click offset in data
+    addClicks(data, offset, count) {
+        const last = this.clicks.length ? this.clicks[this.clicks.length - 1][0] : -Infinity;
+        for (let i = 0; i < count; i++) {
+            const at = ((offset + i) % (data.length / CLICK_FIELDS)) * CLICK_FIELDS;
+            this.clicks.push([data[at], data[at + 1], data[at + 2]]);
+        }
+        // Windows arrive in order; only the count-in is added out of order
+        if (count && this.clicks[this.clicks.length - count][0] < last) {
+            this.clicks.sort((a, b) => a[0] - b[0]);
+        }
+    }
+
+    // Move clicks written to the shared ring into the pending list
+    drainRing() {
+        const counts = this.ring.counts;
+        const written = Atomics.load(counts, 0);
+        const read = Atomics.load(counts, 1);
+        if (written !== read) {
+            this.addClicks(this.ring.data, read, written - read);
+            Atomics.store(counts, 1, written);
+        }
+    }
+
+    process(inputs, outputs, parameters) {
+        if (this.ring) {
+            this.drainRing();
+        }
+        const output = outputs[0][0];
+        if (!this.playing) {
+            return true;
+        }
+
+        // Start the clicks that fall in this render quantum
+        const start = currentFrame;
+        const end = start + output.length;
+        let next = 0;
+        while (next < this.clicks.length) {
+            const [beat, gain, accent] = this.clicks[next];
+            const time = this.anchorTime + (beat - this.anchorBeat) * this.secondsPerBeat;
+            const frame = Math.round(time * sampleRate);
+            if (frame >= end) {
+                break;
+            }
+            if (frame >= start - MAX_LATENESS * sampleRate) {
+                this.voices.push([Math.max(frame, start), gain, accent ? ACCENT_FREQUENCY : CLICK_FREQUENCY]);
+            }
+            next++;
+        }
+        this.clicks.splice(0, next);
+
+        const volume = parameters.volume[0];
+        const length = Math.round(CLICK_DURATION * sampleRate);
+        for (const [first, gain, frequency] of this.voices) {
+            const from = Math.max(first - start, 0);
+            const to = Math.min(first + length - start, output.length);
+            for (let i = from; i < to; i++) {
+                const t = (start + i - first) / sampleRate;
+                output[i] += volume * gain * Math.sin(2 * Math.PI * frequency * t) * Math.exp(-t / CLICK_DECAY);
+            }
+        }
+        // Keep the clicks that ring on into the next quantum
+        let kept = 0;
+        for (const voice of this.voices) {
+            if (voice[0] + length > end) {
+                this.voices[kept++] = voice;
+            }
+        }
+        this.voices.length = kept;
+        return true;
+    }
+}
+
+registerProcessor('click-processor', ClickProcessor);
@@ -0,0 +1,81 @@
+// Minimal implementation of the Streamlit custom component protocol
+const Streamlit = {
+    send(type, data) {
+        window.parent.postMessage(Object.assign({ isStreamlitMessage: true, type: type }, data), '*');
+    },
+    setComponentReady() {
+        this.send('streamlit:componentReady', { apiVersion: 1 });
+    },
+    setFrameHeight(height) {
+        this.send('streamlit:setFrameHeight', { height: height });
+    },
+    setComponentValue(value) {
+        this.send('streamlit:setComponentValue', { value: value, dataType: 'json' });
+    }
+};
+
+// Tell the server the first measure not received yet and, when more are
+// wanted, the measure starting the window needed (null otherwise). Every
+// report is numbered, so a retried request is a new value and reaches the
+// server even when nothing else changed.
+let reportCount = 0;
+function reportMeasures(sessionId, received, need) {
+    reportCount++;
+    Streamlit.setComponentValue({ session: sessionId, received: received, need: need, report: reportCount });
+}
+
+// Frame height while a session is shown; the player collapses when idle
+const PLAYER_HEIGHT = 200;
+let frameHeight = null;
+
+function setFrameHeight(height) {
+    if (height !== frameHeight) {
+        frameHeight = height;
+        Streamlit.setFrameHeight(height);
+    }
+}
+
+// Handle new arguments from the server. This runs on every Streamlit rerun,
+// so it only acts on what changed.
+function onRender(args) {
+    const root = document.documentElement;
+    root.style.setProperty('--text-color', args.theme.text);
+    root.style.setProperty('--background-color', args.theme.background);
+    root.style.setProperty('--border-color', args.theme.border);
+    
+    if (args.session === null) {
+        // Not practicing: stop, but keep the audio context and samples loaded
+        setFrameHeight(0);
+        if (currentSession) {
+            stopPlayback();
+            currentSession = null;
+        }
+        preloadAudio();
+        return;
+    }
+    
+    setFrameHeight(PLAYER_HEIGHT);
+    if (!currentSession || currentSession.id !== args.session.id) {
+        startSession(args.session, args.settings, reportMeasures);
+    } else {
+        applySettings(args.settings);
+    }
+    if (args.chunk) {
+        receiveChunk(args.chunk);
+    }
+}
+
+window.addEventListener('message', function(event) {
+    if (event.data.type === 'streamlit:render') {
+        // The server sends all arguments as one JSON string
+        onRender(JSON.parse(event.data.args.state));
+    }
+});
+
+// Keep the player's files cached across visits (see sw.js). Service workers
+// need a secure context, so this is skipped on plain http hosts.
+if ('serviceWorker' in navigator && window.isSecureContext) {
+    navigator.serviceWorker.register('sw.js').catch(() => {});
+}
+
+Streamlit.setComponentReady();
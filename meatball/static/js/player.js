@@ -1,104 +1,768 @@
 // Global variables for audio
 let audioContext = null;
-let snarePlayer = null;
-let bassPlayer = null;
 let masterGain = null;
 let isIOS = /iPad|iPhone|iPod/.test(navigator.userAgent) && !window.MSStream;
 
-// Listen for mute updates
-window.addEventListener('message', function(event) {
-    if (event.data.type === 'volume_update' && masterGain) {
-        masterGain.gain.setValueAtTime(event.data.volume, audioContext.currentTime);
-    }
-});
+// Instrument samples served next to the player (see scripts/build_samples.py)
+const SAMPLES_URL = 'samples';
+const INSTRUMENTS = { snare: 'synth_click', bass: 'synth_bass', chords: 'synth_keys' };
+
+// Decoded samples: instrument -> Map(MIDI note -> AudioBuffer)
+const sampleBuffers = { snare: new Map(), bass: new Map(), chords: new Map() };
+
+// Pending or finished sample loads: instrument -> Map(MIDI note -> Promise)
+const sampleLoads = { snare: new Map(), bass: new Map(), chords: new Map() };
+
+// Sample manifest and cache, once audio is initialized
+let sampleManifest = null;
+let sampleCache = null;
+
+// Voices handed to the audio clock that have not finished yet
+const activeVoices = new Set();
+
+// Release time in seconds when a note is cut off
+const RELEASE_TIME = 0.03;
+
+const NOTE_OFFSETS = { C: 0, D: 2, E: 4, F: 5, G: 7, A: 9, B: 11 };
+
+// Convert a note name such as 'F#1' or 'Bb1' to a MIDI note number
+function noteToMidi(noteName) {
+    const match = /^([A-G])([b#]?)(-?\d+)$/.exec(noteName);
+    const accidental = match[2] === '#' ? 1 : (match[2] === 'b' ? -1 : 0);
+    return 12 * (parseInt(match[3]) + 1) + NOTE_OFFSETS[match[1]] + accidental;
+}
 
 // Create audio context
-async function createAudioContext() {
+function createAudioContext() {
     const AudioContext = window.AudioContext || window.webkitAudioContext;
     const ctx = new AudioContext({ sampleRate: 44100 });
     const gain = ctx.createGain();
     gain.connect(ctx.destination);
     
+    // Contexts created without a user gesture start suspended; the scheduler
+    // resumes them once playback starts
     if (ctx.state === 'suspended') {
-        await ctx.resume();
+        ctx.resume().catch(() => {});
     }
     
     return { ctx, gain };
 }
 
-// Initialize audio context and players
-async function initAudio() {
+// Sample files are kept in the browser's Cache Storage across visits, one
+// entry per instrument, note, format and manifest version
+const SAMPLE_CACHE = 'meatball-samples';
+
+// Open the sample cache, or null where Cache Storage is unavailable (e.g.
+// insecure origins)
+async function openSampleCache() {
+    if (!window.caches) {
+        return null;
+    }
     try {
-        if (!audioContext) {
-            const { ctx, gain } = await createAudioContext();
-            audioContext = ctx;
-            masterGain = gain;
+        return await caches.open(SAMPLE_CACHE);
+    } catch (error) {
+        return null;
+    }
+}
+
+// Drop cached samples of other manifest versions
+async function pruneSampleCache(cache, version) {
+    for (const request of await cache.keys()) {
+        if (new URL(request.url).searchParams.get('v') !== String(version)) {
+            cache.delete(request);
         }
-        
-        if (snarePlayer && bassPlayer) {
-            return { audioContext, snarePlayer, bassPlayer };
+    }
+}
+
+// Fetch one sample file, from the cache when it holds it
+async function fetchSample(url, cache) {
+    const cached = cache && await cache.match(url);
+    if (cached) {
+        return cached.arrayBuffer();
+    }
+    const response = await fetch(url);
+    if (!response.ok) {
+        throw new Error(`Failed to load sample ${url}`);
+    }
+    if (cache) {
+        cache.put(url, response.clone()).catch(() => {});
+    }
+    return response.arrayBuffer();
+}
+
+// Fetch and decode one sample file. Decoded buffers belong to an audio
+// context and cannot be stored, but decoding PCM WAV is cheap next to the
+// download.
+async function loadSample(instrument, midiNote, manifest, cache) {
+    const url = `${SAMPLES_URL}/${INSTRUMENTS[instrument]}/${midiNote}.${manifest.format}?v=${manifest.version}`;
+    const data = await fetchSample(url, cache);
+    
+    // Older Safari only supports the callback form of decodeAudioData
+    return new Promise((resolve, reject) => audioContext.decodeAudioData(data, resolve, reject));
+}
+
+// Nearest note of a list to a MIDI note
+function nearestNote(notes, midiNote) {
+    return notes.reduce((best, note) => Math.abs(note - midiNote) < Math.abs(best - midiNote) ? note : best);
+}
+
+// Fetch and decode the samples of an instrument that the given notes play
+// from and that are not loaded yet, in parallel and in the given order.
+// Resolves once all of them can be played; notes the manifest does not list
+// load the nearest sample, which playSample repitches. An instrument missing
+// from an outdated manifest stays silent.
+function loadNotes(instrument, notes) {
+    const available = sampleManifest.instruments[INSTRUMENTS[instrument]] || [];
+    if (available.length === 0) {
+        return Promise.resolve([]);
+    }
+    const loads = sampleLoads[instrument];
+    const samples = [...new Set(notes.map(note => nearestNote(available, note)))];
+    return Promise.all(samples.map(note => {
+        if (!loads.has(note)) {
+            loads.set(note, loadSample(instrument, note, sampleManifest, sampleCache).then(buffer => {
+                sampleBuffers[instrument].set(note, buffer);
+            }, error => {
+                loads.delete(note);
+                throw error;
+            }));
         }
-        
-        // Initialize soundfont
-        const soundfontOptions = {
-            destination: masterGain,
-            format: isIOS ? 'mp3' : 'ogg',
-            soundfont: 'FluidR3_GM',
-            nameToUrl: (name, soundfont, format) => {
-                return `https://gleitz.github.io/midi-js-soundfonts/${soundfont}/${name}-${format}.js`;
-            }
-        };
-        
-        // Load both instruments in parallel
-        const [snare, bass] = await Promise.all([
-            Soundfont.instrument(audioContext, 'synth_drum', soundfontOptions),
-            Soundfont.instrument(audioContext, 'acoustic_bass', soundfontOptions)
-        ]);
-        
-        snarePlayer = snare;
-        bassPlayer = bass;
-        
-        return { audioContext, snarePlayer, bassPlayer };
+        return loads.get(note);
+    }));
+}
+
+// Metronome synthesised by an AudioWorklet (js/click-worklet.js), or null
+// where AudioWorklet is unavailable and clicks are played from samples
+let clickTrack = null;
+
+// Clicks the shared ring between the page and the worklet can hold
+const CLICK_RING_SIZE = 4096;
+// Values per click in the ring and in messages: beat, gain, accent
+const CLICK_FIELDS = 3;
+// Note of the accented click (see meatball.music.metronome)
+const ACCENT_NOTE = 'G5';
+
+// Load the click worklet and connect it to the master gain
+async function createClickTrack() {
+    if (!audioContext.audioWorklet) {
+        return null;  // Older browsers and insecure origins
+    }
+    try {
+        await audioContext.audioWorklet.addModule('js/click-worklet.js');
     } catch (error) {
-        console.error('Error initializing audio:', error);
-        throw error;
+        console.warn('Falling back to sampled clicks:', error);
+        return null;
     }
+    // SharedArrayBuffer needs a cross-origin isolated page; otherwise clicks
+    // are posted to the worklet a window at a time
+    let ring = null;
+    if (window.crossOriginIsolated && typeof SharedArrayBuffer !== 'undefined') {
+        ring = {
+            data: new SharedArrayBuffer(CLICK_RING_SIZE * CLICK_FIELDS * Float64Array.BYTES_PER_ELEMENT),
+            counts: new SharedArrayBuffer(2 * Int32Array.BYTES_PER_ELEMENT)
+        };
+    }
+    const node = new AudioWorkletNode(audioContext, 'click-processor', {
+        numberOfInputs: 0,
+        outputChannelCount: [1],
+        processorOptions: { ring: ring }
+    });
+    node.connect(masterGain);
+    return {
+        node: node,
+        data: ring && new Float64Array(ring.data),
+        counts: ring && new Int32Array(ring.counts)  // Clicks written, clicks read
+    };
 }
 
-// Schedule a note to play at a specific time
-async function scheduleNote(noteName, time, duration, baseGain = 1, instrument = 'snare') {
-    const player = instrument === 'snare' ? snarePlayer : bassPlayer;
-    if (player) {
-        try {
-            if (audioContext.state === 'suspended') {
-                await audioContext.resume();
+// Hand clicks to the worklet; returns how many fit in the shared ring
+function sendClicks(events) {
+    let count = events.length;
+    let data = null;
+    let written = 0;
+    if (clickTrack.data) {
+        written = Atomics.load(clickTrack.counts, 0);
+        count = Math.min(count, CLICK_RING_SIZE - (written - Atomics.load(clickTrack.counts, 1)));
+        data = clickTrack.data;
+    } else {
+        data = new Float64Array(count * CLICK_FIELDS);
+    }
+    for (let i = 0; i < count; i++) {
+        const at = ((written + i) % CLICK_RING_SIZE) * CLICK_FIELDS;
+        data[at] = events[i].beat;
+        data[at + 1] = events[i].velocity / 127;
+        data[at + 2] = events[i].note === ACCENT_NOTE ? 1 : 0;
+    }
+    if (clickTrack.data) {
+        Atomics.store(clickTrack.counts, 0, written + count);
+    } else if (count) {
+        clickTrack.node.port.postMessage({ type: 'clicks', clicks: data }, [data.buffer]);
+    }
+    return count;
+}
+
+// Pending or finished load of the audio context and samples
+let audioReady = null;
+
+// Initialize audio context and samples (once per page)
+function initAudio() {
+    if (!audioReady) {
+        audioReady = loadAudio().catch(error => {
+            audioReady = null;
+            console.error('Error initializing audio:', error);
+            throw error;
+        });
+    }
+    return audioReady;
+}
+
+async function loadAudio() {
+    if (!audioContext) {
+        const { ctx, gain } = createAudioContext();
+        audioContext = ctx;
+        masterGain = gain;
+    }
+    
+    const [manifest, cache, track] = await Promise.all([
+        fetch(`${SAMPLES_URL}/manifest.json`).then(response => response.json()),
+        openSampleCache(),
+        clickTrack || createClickTrack()
+    ]);
+    clickTrack = track;
+    sampleManifest = manifest;
+    sampleCache = cache;
+    if (cache) {
+        pruneSampleCache(cache, manifest.version).catch(() => {});
+    }
+    
+    // Bass and chord samples are loaded per session, as its windows name the
+    // notes they use (see receiveChunk). Click samples are only needed without
+    // the worklet.
+    if (!clickTrack) {
+        await loadNotes('snare', manifest.instruments[INSTRUMENTS.snare]);
+    }
+    
+    return { audioContext, sampleBuffers };
+}
+
+// Start a sample at an audio time, repitching the nearest available sample if
+// the exact note was not shipped
+function playSample(instrument, noteName, time, duration, gain) {
+    const buffers = sampleBuffers[instrument];
+    if (!buffers || buffers.size === 0) {
+        return;
+    }
+    const midiNote = noteToMidi(noteName);
+    let sampleNote = midiNote;
+    if (!buffers.has(midiNote)) {
+        for (const note of buffers.keys()) {
+            if (!buffers.has(sampleNote) || Math.abs(note - midiNote) < Math.abs(sampleNote - midiNote)) {
+                sampleNote = note;
             }
-            await player.play(noteName, time, {
-                duration: duration,
-                gain: baseGain
-            });
-        } catch (error) {
-            console.error('Error playing note:', error);
         }
     }
+    
+    const source = audioContext.createBufferSource();
+    source.buffer = buffers.get(sampleNote);
+    source.playbackRate.value = Math.pow(2, (midiNote - sampleNote) / 12);
+    
+    const envelope = audioContext.createGain();
+    envelope.gain.setValueAtTime(gain, time);
+    envelope.gain.setValueAtTime(gain, time + duration);
+    envelope.gain.linearRampToValueAtTime(0, time + duration + RELEASE_TIME);
+    
+    source.connect(envelope);
+    envelope.connect(masterGain);
+    source.start(time);
+    source.stop(time + duration + RELEASE_TIME);
+    
+    activeVoices.add(source);
+    source.onended = () => {
+        activeVoices.delete(source);
+        envelope.disconnect();
+    };
 }
 
-// Initialize player with sequence data
-async function initPlayer(chordSequence, metronomeSequence, displaySequence, timeSignature, bpm, masterVolume, bassVolume, metronomeVolume) {
+// Schedule a note to play at a specific time
+function scheduleNote(noteName, time, duration, baseGain = 1, instrument = 'snare') {
     try {
-        // Get current BPM from slider
-        const bpmSlider = window.parent.document.querySelector('div[data-testid="stSlider"] input');
-        if (bpmSlider) {
-            bpm = parseInt(bpmSlider.value);
+        if (audioContext.state === 'suspended') {
+            audioContext.resume();
         }
-        
+        playSample(instrument, noteName, time, duration, baseGain);
+    } catch (error) {
+        console.error('Error playing note:', error);
+    }
+}
+
+// Request the next window when this many received measures are left to play
+const REQUEST_AHEAD_MEASURES = 8;
+// Ask again for a window that has not arrived after this many seconds
+const REQUEST_RETRY_SECONDS = 2;
+
+// Lookahead scheduling: every SCHEDULER_INTERVAL ms, hand the audio clock all
+// events that start within the next SCHEDULE_AHEAD_TIME seconds
+const SCHEDULER_INTERVAL = 25;
+const SCHEDULE_AHEAD_TIME = 0.1;
+
+// Playback starts once the bass samples of this many measures are loaded
+const START_MEASURES = 2;
+
+// Delay between starting the count-in and its first click
+const START_DELAY = 0.1;
+
+// Current practice session, filled in window by window
+let currentSession = null;
+
+// Load samples ahead of the first session where browsers allow it. iOS only
+// allows creating the audio context after a tap, so it loads on start.
+function preloadAudio() {
+    if (!isIOS) {
+        initAudio().catch(() => {});
+    }
+}
+
+// Start a new practice session
+function startSession(info, settings, reportMeasures) {
+    if (currentSession) {
+        stopPlayback();
+    }
+    currentSession = {
+        id: info.id,
+        settings: Object.assign({ timeSignature: info.timeSignature }, settings),
+        reportMeasures: reportMeasures,
+        displaySequence: [],
+        bass: newQueue(),       // Bass notes
+        chords: newQueue(),     // Chord voicing notes
+        clicks: newQueue(),     // Metronome clicks, including the count-in
+        nextMeasure: 0,         // First measure not received yet
+        requestedMeasure: -1,   // Last measure asked for
+        requestedAt: null,      // Audio time of the last request
+        finalMeasure: null,     // Total number of measures, once known
+        notes: [],              // Distinct bass notes received, in order of first use
+        voicingNotes: [],       // The same for the chord voicings
+        secondsPerBeat: 60.0 / settings.bpm,
+        anchorTime: null,       // Audio time at which anchorBeat sounds, once playing
+        anchorBeat: 0,
+        pausedBeat: null,       // Beat at which playback was paused
+        timer: null,
+        display: null,          // Display elements and what they show, once playing
+        displayTimer: null,
+        stopped: false
+    };
+    initPlayer(currentSession);
+}
+
+// Events sorted by beat; next is the index of the first one not yet handed
+// to the audio clock
+function newQueue() {
+    return { events: [], next: 0 };
+}
+
+// Add a window of measures to the current session
+function receiveChunk(chunk) {
+    const session = currentSession;
+    if (!session || chunk.session !== session.id) {
+        return;  // Stale
+    }
+    if (chunk.start !== session.nextMeasure) {
+        // Already received: the server resends a window until it hears so
+        if (chunk.start < session.nextMeasure) {
+            session.reportMeasures(session.id, session.nextMeasure, null);
+        }
+        return;
+    }
+    session.displaySequence.push(...chunk.chords);
+    session.nextMeasure += chunk.chords.length;
+    if (chunk.final) {
+        session.finalMeasure = session.nextMeasure;
+    }
+    const newNotes = chunk.notes.filter(note => !session.notes.includes(note));
+    session.notes.push(...newNotes);
+    const newVoicingNotes = chunk.voicing_notes.filter(note => !session.voicingNotes.includes(note));
+    session.voicingNotes.push(...newVoicingNotes);
+    queueChunk(session, chunk);
+    session.reportMeasures(session.id, session.nextMeasure, null);
+    
+    // Windows arrive well ahead of playback, so their new samples load in
+    // the background; before audio is up, initPlayer loads them instead
+    if (sampleManifest) {
+        Promise.all([loadNotes('bass', newNotes), loadNotes('chords', newVoicingNotes)])
+            .catch(error => console.error('Error loading samples:', error));
+    }
+}
+
+// Length of a metronome click in seconds
+const CLICK_SECONDS = 0.1;
+
+// Convert a window's events to beats and append them to the event queues.
+// The server places events on integer ticks (ppq per beat), so beats are
+// exact and tempo changes only rescale what has not been scheduled yet.
+function queueChunk(session, chunk) {
+    const ppq = chunk.ppq;
+    
+    for (const chord of chunk.bass) {
+        session.bass.events.push({
+            beat: chord.tick / ppq,
+            beats: chord.ticks / ppq,
+            note: chord.note,
+            instrument: 'bass',
+            velocity: 127
+        });
+    }
+    
+    for (const note of chunk.voicings) {
+        session.chords.events.push({
+            beat: note.tick / ppq,
+            beats: note.ticks / ppq,
+            note: note.note,
+            instrument: 'chords',
+            velocity: note.velocity
+        });
+    }
+    
+    for (const click of chunk.metronome) {
+        session.clicks.events.push({
+            beat: click.tick / ppq,
+            beats: null,  // Fixed length in seconds
+            note: click.note,
+            instrument: 'snare',
+            velocity: click.velocity
+        });
+    }
+    
+    flushClicks(session);
+}
+
+// Length of an event in beats at the session's current tempo
+function eventBeats(session, event) {
+    return event.beats === null ? CLICK_SECONDS / session.secondsPerBeat : event.beats;
+}
+
+// Beat position of the session at an audio time
+function beatAt(session, time) {
+    return session.anchorBeat + (time - session.anchorTime) / session.secondsPerBeat;
+}
+
+// Audio time at which a beat position sounds
+function timeOfBeat(session, beat) {
+    return session.anchorTime + (beat - session.anchorBeat) * session.secondsPerBeat;
+}
+
+// Hand the audio clock every event of a queue that starts before the horizon
+function scheduleQueue(session, queue, volume, now, horizon) {
+    const events = queue.events;
+    while (queue.next < events.length) {
+        const event = events[queue.next];
+        const time = timeOfBeat(session, event.beat);
+        if (time >= horizon) {
+            break;
+        }
+        const duration = eventBeats(session, event) * session.secondsPerBeat;
+        scheduleNote(event.note, Math.max(time, now), duration, volume * event.velocity / 127, event.instrument);
+        queue.next++;
+    }
+    
+    // Drop events that have finished so long sessions keep a flat footprint
+    if (queue.next > 256) {
+        const currentBeat = beatAt(session, now);
+        let done = 0;
+        while (done < queue.next && events[done].beat + eventBeats(session, events[done]) < currentBeat) {
+            done++;
+        }
+        events.splice(0, done);
+        queue.next -= done;
+    }
+}
+
+// Schedule everything that starts before the lookahead horizon
+function schedulerTick(session) {
+    if (session.stopped || session.pausedBeat !== null) {
+        return;
+    }
+    const { bassVolume, chordVolume, metronomeVolume } = session.settings;
+    const now = audioContext.currentTime;
+    const horizon = now + SCHEDULE_AHEAD_TIME;
+    scheduleQueue(session, session.bass, bassVolume, now, horizon);
+    scheduleQueue(session, session.chords, chordVolume, now, horizon);
+    if (clickTrack) {
+        flushClicks(session);  // Only has work left when the shared ring was full
+    } else {
+        scheduleQueue(session, session.clicks, metronomeVolume, now, horizon);
+    }
+    
+    // The scheduler keeps running while the display sleeps in a hidden tab,
+    // so it also keeps the windows coming and ends the session
+    const position = beatAt(session, now);
+    const currentMeasure = Math.floor(position / session.settings.timeSignature);
+    // A request whose window never arrives is repeated after a while
+    if (session.finalMeasure === null
+            && session.nextMeasure - currentMeasure <= REQUEST_AHEAD_MEASURES
+            && (session.requestedMeasure < session.nextMeasure
+                || now - session.requestedAt >= REQUEST_RETRY_SECONDS)) {
+        session.requestedMeasure = session.nextMeasure;
+        session.requestedAt = now;
+        session.reportMeasures(session.id, session.nextMeasure, session.nextMeasure);
+    }
+    if (session.finalMeasure !== null && position >= session.finalMeasure * session.settings.timeSignature) {
+        stopPlayback();
+        showPosition(session, -1, 0);
+        return;
+    }
+    
+    // iOS suspends the audio context on interruptions; keep it running
+    if (isIOS && audioContext.state === 'suspended') {
+        audioContext.resume();
+    }
+}
+
+// Hand every click received so far to the click worklet, which plays them
+// from the tempo anchor on its own
+function flushClicks(session) {
+    const queue = session.clicks;
+    if (!clickTrack || session.anchorTime === null || session.stopped || queue.events.length === 0) {
+        return;
+    }
+    queue.events.splice(0, sendClicks(queue.events));
+}
+
+// Tell the click worklet where the session stands on the audio clock
+function syncClickTrack(session) {
+    if (!clickTrack) {
+        return;
+    }
+    clickTrack.node.port.postMessage({
+        type: 'timing',
+        anchorTime: session.anchorTime,
+        anchorBeat: session.pausedBeat !== null ? session.pausedBeat : session.anchorBeat,
+        secondsPerBeat: session.secondsPerBeat,
+        playing: session.pausedBeat === null && !session.stopped
+    });
+}
+
+// Set the click worklet's volume
+function setClickVolume(volume) {
+    if (clickTrack) {
+        clickTrack.node.parameters.get('volume').setTargetAtTime(volume, audioContext.currentTime, 0.01);
+    }
+}
+
+// Start the scheduler timer for a session
+function startScheduler(session) {
+    clearInterval(session.timer);
+    syncClickTrack(session);
+    flushClicks(session);
+    schedulerTick(session);
+    session.timer = setInterval(() => schedulerTick(session), SCHEDULER_INTERVAL);
+}
+
+// Silence everything that was handed to the audio clock but has not finished
+function silenceScheduledNotes() {
+    for (const source of activeVoices) {
+        source.stop();
+    }
+    activeVoices.clear();
+}
+
+// Stop the current session
+function stopPlayback() {
+    const session = currentSession;
+    if (!session) {
+        return;
+    }
+    session.stopped = true;
+    clearInterval(session.timer);
+    clearTimeout(session.displayTimer);
+    silenceScheduledNotes();
+    if (clickTrack) {
+        clickTrack.node.port.postMessage({
+            type: 'clear',
+            written: clickTrack.counts ? Atomics.load(clickTrack.counts, 0) : 0
+        });
+    }
+}
+
+// Pause the current session at its current position
+function pausePlayback() {
+    const session = currentSession;
+    if (!session || session.anchorTime === null || session.pausedBeat !== null) {
+        return;
+    }
+    session.pausedBeat = beatAt(session, audioContext.currentTime);
+    clearInterval(session.timer);
+    silenceScheduledNotes();
+    syncClickTrack(session);
+    scheduleDisplay(session);
+}
+
+// Mark the events of a queue from a beat on as not yet scheduled
+function rewindQueue(queue, beat) {
+    let index = 0;
+    while (index < queue.events.length && queue.events[index].beat < beat) {
+        index++;
+    }
+    queue.next = index;
+}
+
+// Resume the current session from where it was paused
+function resumePlayback() {
+    const session = currentSession;
+    if (!session || session.pausedBeat === null) {
+        return;
+    }
+    session.anchorBeat = session.pausedBeat;
+    session.anchorTime = audioContext.currentTime + START_DELAY;
+    session.pausedBeat = null;
+    
+    // Re-schedule events that were silenced before they started; the click
+    // worklet keeps its own clicks until they have played
+    rewindQueue(session.bass, session.anchorBeat);
+    rewindQueue(session.chords, session.anchorBeat);
+    if (!clickTrack) {
+        rewindQueue(session.clicks, session.anchorBeat);
+    }
+    startScheduler(session);
+    scheduleDisplay(session);
+}
+
+// Change the tempo of the current session from the current position on
+function setTempo(bpm) {
+    const session = currentSession;
+    if (!session) {
+        return;
+    }
+    const secondsPerBeat = 60.0 / bpm;
+    if (session.anchorTime !== null && session.pausedBeat === null) {
+        const now = audioContext.currentTime;
+        session.anchorBeat = beatAt(session, now);
+        session.anchorTime = now;
+    }
+    session.secondsPerBeat = secondsPerBeat;
+    if (session.anchorTime !== null) {
+        syncClickTrack(session);
+        scheduleDisplay(session);
+    }
+}
+
+// Apply changed settings to the running session
+function applySettings(settings) {
+    const session = currentSession;
+    const previous = session.settings;
+    if (settings.masterVolume !== previous.masterVolume && masterGain) {
+        masterGain.gain.setTargetAtTime(settings.masterVolume, audioContext.currentTime, 0.01);
+    }
+    if (settings.bpm !== previous.bpm) {
+        setTempo(settings.bpm);
+    }
+    if (settings.metronomeVolume !== previous.metronomeVolume) {
+        setClickVolume(settings.metronomeVolume);
+    }
+    if (settings.paused && !previous.paused) {
+        pausePlayback();
+    } else if (!settings.paused && previous.paused) {
+        resumePlayback();
+    }
+    // Bass, chord and metronome volumes are read by the scheduler as it goes
+    Object.assign(session.settings, settings);
+}
+
+// The display only changes on beat boundaries. It renders once per beat,
+// woken by a timer set for the next boundary, writes to the DOM only what
+// changed, and sleeps while the tab is hidden.
+
+// Create the display of a session
+function newDisplay(timeSignature) {
+    // Beat display text for every beat of a measure, -1 before the first
+    const beats = [];
+    for (let beat = -1; beat < timeSignature; beat++) {
+        const marks = [];
+        for (let i = 0; i < timeSignature; i++) {
+            marks.push(i <= beat ? '●' : '○');
+        }
+        beats.push(marks.join(' '));
+    }
+    return {
+        beats: beats,
+        beatDisplay: document.getElementById('beat-display'),
+        chords: ['current-chord', 'next-chord1', 'next-chord2', 'next-chord3']
+            .map(id => document.getElementById(id)),
+        countdown: document.getElementById('countdown'),
+        counting: false,  // Whether the countdown is visible
+        shown: new Map()  // Element -> text it shows
+    };
+}
+
+// Set the text of a display element if it changed
+function setDisplayText(display, element, text) {
+    if (display.shown.get(element) !== text) {
+        display.shown.set(element, text);
+        element.textContent = text;
+    }
+}
+
+// Show a beat of a measure (-1 for none) and the chords from a measure on,
+// or the count-in while the beat is negative
+function showPosition(session, beat, measure, countIn = 0) {
+    const display = session.display;
+    if ((countIn > 0) !== display.counting) {
+        display.counting = countIn > 0;
+        display.countdown.style.display = display.counting ? 'block' : 'none';
+    }
+    if (display.counting) {
+        setDisplayText(display, display.countdown, String(countIn));
+        return;
+    }
+    setDisplayText(display, display.beatDisplay, display.beats[beat + 1]);
+    display.chords.forEach((element, i) => {
+        setDisplayText(display, element, session.displaySequence[measure + i] || '');
+    });
+}
+
+// Render the current position, then sleep until the next beat
+function displayTick(session) {
+    const timeSignature = session.settings.timeSignature;
+    const position = session.pausedBeat !== null
+        ? session.pausedBeat
+        : beatAt(session, audioContext.currentTime);
+    const beat = Math.floor(position);
+    if (beat < 0) {
+        showPosition(session, -1, 0, -beat);
+    } else {
+        showPosition(session, beat % timeSignature, Math.floor(beat / timeSignature));
+    }
+    if (session.pausedBeat === null) {
+        // A timer that fires a little early renders the same beat again and
+        // sleeps until the boundary
+        const delay = (timeOfBeat(session, beat + 1) - audioContext.currentTime) * 1000;
+        session.displayTimer = setTimeout(() => displayTick(session), Math.max(delay, 0));
+    }
+}
+
+// (Re)start the display after the timing of the session changed
+function scheduleDisplay(session) {
+    clearTimeout(session.displayTimer);
+    session.displayTimer = null;
+    if (session.display && !session.stopped && !document.hidden) {
+        displayTick(session);
+    }
+}
+
+document.addEventListener('visibilitychange', () => {
+    if (currentSession) {
+        scheduleDisplay(currentSession);
+    }
+});
+
+// Initialize player for a practice session
+async function initPlayer(session) {
+    const { timeSignature, masterVolume, metronomeVolume } = session.settings;
+    try {
         const loadingOverlay = document.getElementById('loading-overlay');
         const loadingText = document.querySelector('.loading-text');
         const displayContent = document.getElementById('display-content');
-        const countdown = document.getElementById('countdown');
         
-        // For iOS, we need user interaction before playing audio
-        if (isIOS) {
+        // For iOS, we need user interaction before creating the audio context
+        if (isIOS && !audioContext) {
             loadingText.textContent = 'Tap here to start...';
             loadingText.style.cursor = 'pointer';
             
@@ -130,35 +794,35 @@ async function initPlayer(chordSequence, metronomeSequence, displaySequence, tim
         // Initialize audio after user interaction
         loadingText.textContent = 'Loading sounds...';
         await initAudio();
-        
-        // Set initial volume
-        if (masterGain) {
-            masterGain.gain.setValueAtTime(masterVolume, audioContext.currentTime);
+        if (audioContext.state === 'suspended') {
+            await audioContext.resume();
+        }
+        if (session.stopped) {
+            return;
         }
         
-        // Clear previously scheduled notes
-        const scheduledNotes = [];
-        
-        // Initialize display functions
-        function updateBeatDisplay(currentBeat) {
-            const beats = Array(timeSignature).fill('○');
-            for (let i = 0; i <= currentBeat; i++) {
-                beats[i] = '●';
-            }
-            document.getElementById('beat-display').textContent = beats.join(' ');
+        // Load every bass and chord note received so far, first used first,
+        // but only wait for those of the first measures
+        const firstBeat = START_MEASURES * timeSignature;
+        const firstNotes = queue => queue.events
+            .filter(event => event.beat < firstBeat)
+            .map(event => noteToMidi(event.note));
+        Promise.all([loadNotes('bass', session.notes), loadNotes('chords', session.voicingNotes)])
+            .catch(error => console.error('Error loading samples:', error));
+        await Promise.all([loadNotes('bass', firstNotes(session.bass)), loadNotes('chords', firstNotes(session.chords))]);
+        if (session.stopped) {
+            return;
         }
         
-        function updateChordDisplay(currentMeasure) {
-            const startIdx = currentMeasure;
-            document.getElementById('current-chord').textContent = displaySequence[startIdx] || '';
-            document.getElementById('next-chord1').textContent = displaySequence[startIdx + 1] || '';
-            document.getElementById('next-chord2').textContent = displaySequence[startIdx + 2] || '';
-            document.getElementById('next-chord3').textContent = displaySequence[startIdx + 3] || '';
+        // Set initial volume
+        if (masterGain) {
+            masterGain.gain.setValueAtTime(masterVolume, audioContext.currentTime);
         }
+        setClickVolume(metronomeVolume);
         
         // Show initial display
-        updateBeatDisplay(-1);
-        updateChordDisplay(0);
+        session.display = newDisplay(timeSignature);
+        showPosition(session, -1, 0);
         
         // Hide loading overlay
         loadingOverlay.style.opacity = '0';
@@ -166,104 +830,34 @@ async function initPlayer(chordSequence, metronomeSequence, displaySequence, tim
         await new Promise(resolve => setTimeout(resolve, 300));
         loadingOverlay.style.display = 'none';
         
-        // Calculate timing
-        const secondsPerBeat = 60.0 / bpm;
-        const secondsPerMeasure = secondsPerBeat * timeSignature;
-        const totalMeasures = displaySequence.length;
-        const totalDuration = totalMeasures * secondsPerMeasure;
-        
         // For iOS, ensure we're still running
         if (isIOS) {
             await audioContext.resume();
         }
         
-        // Schedule all notes starting one measure in the future
-        const startTime = audioContext.currentTime + secondsPerMeasure;
-        
-        // Do countdown
-        countdown.style.display = 'block';
-        for (let i = timeSignature; i > 0; i--) {
-            const countdownTime = startTime - (i * secondsPerBeat);
-            countdown.textContent = i;
-            scheduleNote('C3', countdownTime, 0.1, metronomeVolume, 'snare');
-            await new Promise(resolve => setTimeout(resolve, secondsPerBeat * 1000));
-        }
-        countdown.style.display = 'none';
-        
-        // Schedule chord sequence
-        for (const chord of chordSequence) {
-            scheduledNotes.push(
-                scheduleNote(
-                    chord.note,
-                    startTime + chord.time,
-                    chord.duration,
-                    bassVolume,
-                    'bass'
-                )
-            );
-        }
-        
-        // Schedule metronome sequence
-        for (const time of metronomeSequence) {
-            const isDownbeat = (Math.floor(time / secondsPerMeasure) * secondsPerMeasure) === time;
-            scheduledNotes.push(
-                scheduleNote(
-                    'C3',
-                    startTime + time,
-                    0.1,
-                    isDownbeat ? metronomeVolume : metronomeVolume * 0.5,
-                    'snare'
-                )
-            );
+        // The count-in is one measure of clicks at negative beats, played by
+        // the same scheduler as the session itself
+        const countIn = [];
+        for (let beat = -timeSignature; beat < 0; beat++) {
+            const accent = beat === -timeSignature;
+            countIn.push({
+                beat: beat,
+                beats: null,
+                note: accent ? 'G5' : 'E5',
+                instrument: 'snare',
+                velocity: accent ? 127 : 64
+            });
         }
-        
-        // For iOS, we need a more precise timing mechanism
-        let lastUpdateTime = performance.now();
-        const frameInterval = 1000 / 60; // 60fps
-        
-        function updateDisplay(timestamp) {
-            // Throttle updates on iOS
-            if (isIOS) {
-                const elapsed = timestamp - lastUpdateTime;
-                if (elapsed < frameInterval) {
-                    requestAnimationFrame(updateDisplay);
-                    return;
-                }
-                lastUpdateTime = timestamp;
-                
-                // Keep audio context running
-                if (audioContext.state === 'suspended') {
-                    audioContext.resume();
-                }
-            }
-            
-            const elapsedTime = audioContext.currentTime - startTime;
-            const currentBeat = Math.floor(elapsedTime / secondsPerBeat) % timeSignature;
-            const currentMeasure = Math.floor(elapsedTime / secondsPerMeasure);
-            
-            updateBeatDisplay(currentBeat);
-            updateChordDisplay(currentMeasure);
-            
-            // Continue animation until all measures are complete
-            if (elapsedTime < totalDuration) {
-                requestAnimationFrame(updateDisplay);
-            } else {
-                // Clear all scheduled notes
-                scheduledNotes.forEach(note => {
-                    if (note.timeout) {
-                        clearTimeout(note.timeout);
-                    }
-                });
-                scheduledNotes.length = 0;
-                
-                // Reset display
-                updateBeatDisplay(-1);
-                updateChordDisplay(0);
-            }
+        session.clicks.events.unshift(...countIn);
+        session.anchorBeat = -timeSignature;
+        session.anchorTime = audioContext.currentTime + START_DELAY;
+        startScheduler(session);
+        scheduleDisplay(session);
+        // Pause pressed while the samples were loading
+        if (session.settings.paused) {
+            pausePlayback();
         }
         
-        requestAnimationFrame(updateDisplay);
-        
     } catch (error) {
         console.error('Error initializing player:', error);
         const loadingText = document.querySelector('.loading-text');
@@ -271,21 +865,3 @@ async function initPlayer(chordSequence, metronomeSequence, displaySequence, tim
         loadingText.style.color = '#ff6b6b';
     }
 }
-
-// Play a note immediately
-async function playNote(noteName, duration, baseGain = 1, instrument = 'snare') {
-    const player = instrument === 'snare' ? snarePlayer : bassPlayer;
-    if (player) {
-        try {
-            if (audioContext.state === 'suspended') {
-                await audioContext.resume();
-            }
-            await player.play(noteName, 0, {
-                duration: duration,
-                gain: baseGain
-            });
-        } catch (error) {
-            console.error('Error playing note:', error);
-        }
-    }
-}
@@ -0,0 +1,70 @@
+// Service worker of the player. It keeps the player's own files in Cache
+// Storage so that returning visits load the player without waiting for the
+// network. Every file is served from the cache and revalidated in the
+// background, so a changed player or manifest is picked up on the next
+// visit without any version to bump. Sample files are cached by the player
+// itself (see loadSample in js/player.js), under the manifest's version.
+//
+// The worker's scope is the directory it is served from, i.e. the
+// component's static files; the Streamlit page itself is never intercepted.
+
+const SHELL_CACHE = 'meatball-player-shell';
+const SHELL_FILES = ['index.html', 'css/styles.css', 'js/player.js', 'js/component.js', 'js/click-worklet.js',
+                     'samples/manifest.json'];
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.addAll(SHELL_FILES))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    // Drop the caches of older player versions, which were versioned by hand
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(names
+                .filter(name => name.startsWith('meatball-player-') && name !== SHELL_CACHE)
+                .map(name => caches.delete(name))))
+            .then(() => self.clients.claim())
+    );
+});
+
+// Path of a request relative to the worker's scope, or null outside it
+function scopePath(url) {
+    const scope = new URL(self.registration.scope);
+    if (url.origin !== scope.origin || !url.pathname.startsWith(scope.pathname)) {
+        return null;
+    }
+    return url.pathname.slice(scope.pathname.length) || 'index.html';
+}
+
+// Serve a file from the cache and refresh the cached copy in the background.
+// Files are cached by path: Streamlit loads index.html with query parameters.
+async function staleWhileRevalidate(event, path) {
+    const cache = await caches.open(SHELL_CACHE);
+    const cached = await cache.match(path);
+    // Revalidate with the server rather than the browser's HTTP cache
+    const update = fetch(event.request.url, { cache: 'no-cache' }).then(response => {
+        if (response.ok) {
+            cache.put(path, response.clone());
+        }
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(update.catch(() => {}));
+        return cached;
+    }
+    return update;
+}
+
+self.addEventListener('fetch', event => {
+    if (event.request.method !== 'GET') {
+        return;
+    }
+    const path = scopePath(new URL(event.request.url));
+    if (SHELL_FILES.includes(path)) {
+        event.respondWith(staleWhileRevalidate(event, path));
+    }
+});
@@ -1,112 +1,73 @@
 """Streamlit UI components."""
 
-import os
 import json
+import os
+from functools import lru_cache
 import streamlit as st
 import streamlit.components.v1 as components
-from typing import Dict, List, Any
-from pkg_resources import resource_string
+from typing import Any, Dict, Optional
+from .. import diagnostics
 
-def read_file(path: str) -> str:
-    """Read a file and return its contents.
-    
-    Args:
-        path: Path to the file
-        
-    Returns:
-        File contents as string
-    """
-    return resource_string('meatball', path).decode('utf-8')
+_player_component = components.declare_component(
+    'meatball_player',
+    path=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static')
+)
+
+@lru_cache(maxsize=None)
+def theme_colors(dark: bool) -> Dict[str, str]:
+    """Player colours for the light or dark Streamlit theme."""
+    return {
+        'text': '#FFFFFF' if dark else '#000000',
+        'background': '#0E1117' if dark else '#FFFFFF',
+        'border': '#31333F' if dark else '#CCCCCC'
+    }
 
 def play_sequence(
-    chord_sequence: List[Dict[str, Any]],
-    metronome_sequence: List[Dict[str, Any]],
-    display_sequence: List[str]
-) -> None:
+    session: Optional[Dict[str, Any]],
+    chunk: Optional[Dict[str, Any]],
+    key: str = 'player'
+) -> Optional[Dict[str, Any]]:
     """Create and display the audio player component.
     
+    The player is a persistent custom component: as long as it is rendered
+    with the same key, its iframe, audio context and samples survive reruns.
+    Each rerun only passes the current settings, and a window of measures
+    when a new one is due; the player applies whatever changed.
+    
     Args:
-        chord_sequence: List of chord events
-        metronome_sequence: List of metronome events
-        display_sequence: List of chord symbols to display
+        session: Current practice session (see player_session), or None to idle
+        chunk: New window of measures (see generate_sequence_window), or
+            None if the player already has it
+        key: Widget key under which the player's requests are stored
+        
+    Returns:
+        The player's latest report, e.g.
+            {'session': 1, 'received': 16, 'need': 16, 'report': 3}
     """
-    # Read external files
-    js_code = read_file('static/js/player.js')
-    css_code = read_file('static/css/styles.css')
-    
-    # Get Streamlit theme
-    is_dark_theme = st.get_option("theme.base") == "dark"
-    theme_colors = {
-        'text': '#FFFFFF' if is_dark_theme else '#000000',
-        'background': '#0E1117' if is_dark_theme else '#FFFFFF',
-        'border': '#31333F' if is_dark_theme else '#CCCCCC'
+    settings = {
+        'bpm': st.session_state.bpm,
+        'masterVolume': st.session_state.volume,
+        'bassVolume': st.session_state.bass_volume,
+        'metronomeVolume': st.session_state.metronome_volume,
+        'chordVolume': st.session_state.chord_volume,
+        'paused': st.session_state.paused
     }
     
-    # Convert sequences to JSON
-    chord_json = json.dumps(chord_sequence)
-    metronome_json = json.dumps(metronome_sequence)
-    display_json = json.dumps(display_sequence)
-    
-    html_code = f"""
-        <style>
-        {css_code}
-        :root {{
-            --text-color: {theme_colors['text']};
-            --background-color: {theme_colors['background']};
-            --border-color: {theme_colors['border']};
-        }}
-        </style>
-        
-        <div class="app-container">
-            <div id="loading-overlay">
-                <div class="loading-text">Loading piano sounds...</div>
-            </div>
-            <div id="countdown"></div>
-            
-            <div id="display-content">
-                <div id="beat-display"></div>
-                <div id="chord-display">
-                    <span id="current-chord" class="chord current-chord"></span>
-                    <span class="separator">|</span>
-                    <span id="next-chord1" class="chord next-chord"></span>
-                    <span class="separator">|</span>
-                    <span id="next-chord2" class="chord next-chord"></span>
-                    <span class="separator">|</span>
-                    <span id="next-chord3" class="chord next-chord"></span>
-                </div>
-            </div>
-        </div>
-        
-        <script src="https://cdn.jsdelivr.net/npm/soundfont-player@0.12.0/dist/soundfont-player.min.js"></script>
-        <script>
-        {js_code}
-        
-        // Initialize player with sequences
-        initPlayer(
-            {chord_json},
-            {metronome_json},
-            {display_json},
-            {st.session_state.time_signature},
-            {st.session_state.bpm},
-            {st.session_state.volume},
-            {st.session_state.bass_volume},
-            {st.session_state.metronome_volume}
-        );
-        
-        // Listen for mute toggle changes
-        const checkbox = window.parent.document.querySelector('input[data-testid="stCheckbox"]');
-        if (checkbox) {{
-            checkbox.addEventListener('change', function() {{
-                const volume = this.checked ? 1.0 : 0;
-                window.postMessage({{
-                    type: 'volume_update',
-                    volume: volume
-                }}, '*');
-            }});
-        }}
-        </script>
-    """
-    components.html(html_code, height=200)
+    args = {
+        'session': session,
+        'chunk': chunk if session is not None else None,
+        'settings': settings,
+        'theme': theme_colors(st.get_option("theme.base") == "dark")
+    }
+    # Sent as one compact JSON string: Streamlit probes every non-string
+    # component argument for dataframes, which imports pandas and pyarrow on
+    # the first rerun and costs milliseconds on every rerun after that
+    state = json.dumps(args, separators=(',', ':'))
+    if diagnostics.is_enabled():
+        diagnostics.count('player.payload_bytes', len(state))
+        diagnostics.count('player.renders')
+    with diagnostics.span('play_sequence'):
+        return _player_component(state=state, key=key, default=None)
 
 def create_sound_controls() -> None:
     """Create sound control UI elements in the sidebar.
@@ -114,6 +75,7 @@ def create_sound_controls() -> None:
     Creates:
         - Bass volume slider: Controls the volume of the bass instrument
         - Metronome volume slider: Controls the volume of the metronome clicks
+        - Chord volume slider: Controls the volume of the chord voicings
     """
     st.sidebar.subheader('Sound Controls')
     
@@ -129,6 +91,12 @@ def create_sound_controls() -> None:
     else:
         metro_vol = 0.4
         st.session_state.metronome_volume = metro_vol
+        
+    if 'chord_volume' in st.session_state:
+        chord_vol = st.session_state.chord_volume
+    else:
+        chord_vol = 0.25
+        st.session_state.chord_volume = chord_vol
     
     # Use on_change callback to update values without triggering rerun
     def update_bass_volume():
@@ -136,8 +104,35 @@ def create_sound_controls() -> None:
         
     def update_metro_volume():
         st.session_state.metronome_volume = st.session_state.metro_volume_slider
+        
+    def update_chord_volume():
+        st.session_state.chord_volume = st.session_state.chord_volume_slider
     
     st.sidebar.slider('Bass Volume', 0.0, 5.0, value=bass_vol, key='bass_volume_slider', 
                      on_change=update_bass_volume, help='Adjust bass volume')
     st.sidebar.slider('Metronome Volume', 0.0, 1.0, value=metro_vol, key='metro_volume_slider',
                      on_change=update_metro_volume, help='Adjust metronome volume')
+    st.sidebar.slider('Chord Volume', 0.0, 1.0, value=chord_vol, key='chord_volume_slider',
+                     on_change=update_chord_volume, help='Adjust chord voicing volume')
+
+def show_diagnostics() -> None:
+    """Show per-stage timing percentiles and counters in the sidebar.
+    
+    Only shown while instrumentation is enabled (see meatball.diagnostics).
+    Figures cover all sessions served by this process.
+    """
+    if not diagnostics.is_enabled():
+        return
+    with st.sidebar.expander('Diagnostics'):
+        stats = diagnostics.summary()
+        if stats:
+            st.caption('Stage timings (ms)')
+            st.dataframe([{'stage': name, **values} for name, values in stats.items()],
+                         hide_index=True)
+        totals = diagnostics.counters()
+        if totals:
+            st.caption('Counters')
+            st.dataframe([{'counter': name, 'total': value} for name, value in totals.items()],
+                         hide_index=True)
+        if st.button('Reset diagnostics'):
+            diagnostics.reset()
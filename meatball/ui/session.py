@@ -1,22 +1,187 @@
-"""Session state management for the Streamlit app."""
+"""Session state management for the Streamlit app.
 
-from collections import deque
+Each user's session keeps only a compact descriptor of the exercise (its
+settings and seed) and the index of the window last sent to the player.
+Chords and events are rebuilt from the descriptor when needed, through
+process-wide caches shared by every session playing the same exercise.
+"""
+
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
 import streamlit as st
 from ..music.theory import NOTES, CHORD_TYPES
+from ..music.progressions import PROGRESSIONS
+from ..music.markov import MARKOV_PROGRESSION
+from ..music.sequence import (
+    iter_chord_symbols, generate_sequence_window, cached_chord_sequence, make_rng, new_seed, SEED_LIMIT,
+    build_chord_timeline, build_voicing_timeline, build_metronome_timeline
+)
+from ..music.timeline import EventTimeline
+from ..music.midi import encode_midi
+from ..music.metronome import MetronomePattern, SUBDIVISIONS
+from ..music.render import render_to_file
+from ..diagnostics import span, timed
+
+# Measures sent to the player per window
+MEASURES_PER_WINDOW = 16
+# Windows kept by practice_window, for all tempos together
+WINDOW_CACHE_SIZE = 1024
+# MIDI files kept by practice_midi
+MIDI_CACHE_SIZE = 64
+
+# Choices offered by the rhythm settings
+TIME_SIGNATURES = [2, 3, 4, 5, 6]
+MIN_BPM, MAX_BPM = 40, 200
+MIN_CHORDS, MAX_CHORDS = 4, 128
+MIN_SWING, MAX_SWING = 0.5, 0.75
+MIN_FOCUS_WEIGHT, MAX_FOCUS_WEIGHT = 1.0, 8.0
+
+class PracticeSettings(NamedTuple):
+    """Everything needed to rebuild a practice session.
+
+    Attributes:
+        progression_type: "Random", MARKOV_PROGRESSION or the name of a
+            registered progression
+        selected_notes: Root notes to choose from
+        selected_chord_types: Chord types to choose from
+        time_signature: Beats per measure
+        bpm: Tempo of the session; chords and windows are laid out in
+            measures and ticks and do not depend on it
+        num_chords: Number of chords, or None for an endless session
+        seed: Seed of the chord stream
+        subdivision: Metronome clicks per beat
+        swing: Metronome swing (0.5 is straight)
+        focus_notes: Root notes drawn more often in Random mode
+        focus_chord_types: Chord types drawn more often in Random mode
+        focus_weight: How many times more often each focused root or chord
+            type is drawn
+    """
+    progression_type: str
+    selected_notes: Tuple[str, ...]
+    selected_chord_types: Tuple[str, ...]
+    time_signature: int
+    bpm: int
+    num_chords: Optional[int]
+    seed: int
+    subdivision: int = 1
+    swing: float = 0.5
+    focus_notes: Tuple[str, ...] = ()
+    focus_chord_types: Tuple[str, ...] = ()
+    focus_weight: float = 1.0
+
+    @property
+    def metronome_pattern(self) -> MetronomePattern:
+        """Click pattern of the session, accenting the first beat of each measure."""
+        return MetronomePattern(subdivision=self.subdivision, swing=self.swing)
+
+    @property
+    def chord_weights(self) -> Optional[Dict[Tuple[str, str], float]]:
+        """Weights of the (root note, chord type) pairs, or None when unweighted.
+
+        A pair's weight is focus_weight for each of its root and chord type
+        that is focused, so a focused chord type on a focused root weighs
+        focus_weight squared.
+        """
+        if (self.progression_type != 'Random' or self.focus_weight == 1.0
+                or not (self.focus_notes or self.focus_chord_types)):
+            return None
+        return {
+            (note, chord_type): self.focus_weight ** ((note in self.focus_notes)
+                                                      + (chord_type in self.focus_chord_types))
+            for note in self.selected_notes
+            for chord_type in self.selected_chord_types
+        }
+
+def practice_chords(settings: PracticeSettings) -> Optional[Tuple[str, ...]]:
+    """All chords of a finite practice session.
+
+    Args:
+        settings: Session descriptor
+
+    Returns:
+        Chord symbols shared with other sessions, or None for endless sessions
+    """
+    if settings.num_chords is None:
+        return None
+    # Only the chord symbols are kept, so every tempo shares one cache entry
+    _, chords = cached_chord_sequence(
+        settings.num_chords,
+        settings.progression_type,
+        settings.selected_notes,
+        settings.selected_chord_types,
+        1.0,
+        settings.seed,
+        settings.chord_weights
+    )
+    return chords
+
+def _chord_stream(settings: PracticeSettings, start_measure: int) -> Iterator[str]:
+    """Chords of a practice session from the given measure on."""
+    chords = practice_chords(settings)
+    if chords is not None:
+        return iter(chords[start_measure:])
+    # Endless streams are replayed from their seed up to the requested measure
+    stream = iter_chord_symbols(
+        settings.progression_type,
+        settings.selected_notes,
+        settings.selected_chord_types,
+        make_rng(settings.seed),
+        settings.chord_weights
+    )
+    return islice(stream, start_measure, None)
 
+@lru_cache(maxsize=WINDOW_CACHE_SIZE)
+def _cached_practice_window(settings: PracticeSettings, start_measure: int) -> Dict[str, Any]:
+    with span('practice_window'):
+        chunk = generate_sequence_window(
+            _chord_stream(settings, start_measure),
+            start_measure,
+            MEASURES_PER_WINDOW,
+            settings.time_signature,
+            settings.metronome_pattern
+        )
+    if settings.num_chords is not None and start_measure + len(chunk['chords']) >= settings.num_chords:
+        chunk['final'] = True
+    return chunk
+
+def practice_window(settings: PracticeSettings, start_measure: int) -> Dict[str, Any]:
+    """Window of measures of a practice session, as sent to the player.
+
+    Windows are laid out in ticks, so sessions that differ only in tempo
+    share the cached windows.
+
+    Args:
+        settings: Session descriptor
+        start_measure: Index of the first measure in the window
+
+    Returns:
+        Window as produced by generate_sequence_window, shared with other
+        sessions and not to be modified
+    """
+    return _cached_practice_window(settings._replace(bpm=0), start_measure)
+
+practice_window.cache_info = _cached_practice_window.cache_info
+practice_window.cache_clear = _cached_practice_window.cache_clear
+
+@timed('init_session_state')
 def init_session_state() -> None:
     """Initialize all session state variables if they don't exist."""
     if 'is_practicing' not in st.session_state:
         st.session_state.is_practicing = False
         
-    if 'chord_sequence' not in st.session_state:
-        st.session_state.chord_sequence = deque(maxlen=4)
+    # Whether the player holds the current session at its position
+    if 'paused' not in st.session_state:
+        st.session_state.paused = False
         
-    if 'selected_notes' not in st.session_state:
-        st.session_state.selected_notes = NOTES.copy()
-        
-    if 'selected_chord_types' not in st.session_state:
-        st.session_state.selected_chord_types = ['Major', 'Minor']
+    # Root note and chord type checkboxes start out selected
+    for note in NOTES:
+        if f'note_{note}' not in st.session_state:
+            st.session_state[f'note_{note}'] = True
+    for chord_type in CHORD_TYPES:
+        if f'chord_{chord_type}' not in st.session_state:
+            st.session_state[f'chord_{chord_type}'] = True
         
     if 'volume' not in st.session_state:
         st.session_state.volume = 1.0
@@ -27,6 +192,9 @@ def init_session_state() -> None:
     if 'metronome_volume' not in st.session_state:
         st.session_state.metronome_volume = 0.4
         
+    if 'chord_volume' not in st.session_state:
+        st.session_state.chord_volume = 0.25
+        
     if 'progression_type' not in st.session_state:
         st.session_state.progression_type = "Random"
         
@@ -39,15 +207,339 @@ def init_session_state() -> None:
     if 'num_chords' not in st.session_state:
         st.session_state.num_chords = 16
         
-    if 'current_progression' not in st.session_state:
-        st.session_state.current_progression = None
+    if 'endless' not in st.session_state:
+        st.session_state.endless = False
+        
+    if 'subdivision' not in st.session_state:
+        st.session_state.subdivision = 1
+        
+    if 'swing' not in st.session_state:
+        st.session_state.swing = 0.5
+        
+    # Roots and chord types that Random mode draws more often
+    if 'focus_notes' not in st.session_state:
+        st.session_state.focus_notes = []
+        
+    if 'focus_chord_types' not in st.session_state:
+        st.session_state.focus_chord_types = []
         
-    # Initialize sequence storage
-    if 'midi_sequence' not in st.session_state:
-        st.session_state.midi_sequence = []
+    if 'focus_weight' not in st.session_state:
+        st.session_state.focus_weight = 3.0
         
-    if 'display_sequence' not in st.session_state:
-        st.session_state.display_sequence = []
+    # Initialize sequence streaming state
+    if 'practice_id' not in st.session_state:
+        st.session_state.practice_id = 0
         
-    if 'metronome_sequence' not in st.session_state:
-        st.session_state.metronome_sequence = []
+    if 'practice_settings' not in st.session_state:
+        st.session_state.practice_settings = None
+        
+    # First measure of the window the player is working through
+    if 'window_start' not in st.session_state:
+        st.session_state.window_start = None
+        
+    # Measures of the current session the player reports having received
+    if 'received_measure' not in st.session_state:
+        st.session_state.received_measure = 0
+        
+    if 'backing_track' not in st.session_state:
+        st.session_state.backing_track = None
+        
+    # Seed requested by a replay link, used by the next session started
+    if 'replay_seed' not in st.session_state:
+        st.session_state.replay_seed = None
+        
+    if 'replay_loaded' not in st.session_state:
+        st.session_state.replay_loaded = False
+
+def start_practice(
+    selected_notes: List[str],
+    selected_chord_types: List[str],
+    seed: Optional[int] = None
+) -> bool:
+    """Start a new practice session.
+    
+    The session only stores its settings and seed; chords are generated
+    lazily, window by window, and in endless mode never run out. The same
+    settings and seed always give the same exercise, so it can be replayed.
+    
+    Args:
+        selected_notes: Root notes to choose from
+        selected_chord_types: Chord types to choose from
+        seed: Seed for the chord stream; defaults to a pending replay seed,
+            or a fresh one
+        
+    Returns:
+        False, with a warning shown, if the selection has no chords to
+        practice; True once the session has started
+    """
+    # Progressions only need roots; Random mode needs roots and chord types
+    if not selected_notes or (st.session_state.progression_type == 'Random' and not selected_chord_types):
+        st.session_state.is_practicing = False
+        st.warning("Select at least one root note and one chord type to practice.")
+        return False
+    
+    if seed is None:
+        seed = st.session_state.replay_seed
+    if seed is None:
+        seed = new_seed()
+    st.session_state.replay_seed = None
+    
+    settings = PracticeSettings(
+        st.session_state.progression_type,
+        tuple(selected_notes),
+        tuple(selected_chord_types),
+        st.session_state.time_signature,
+        st.session_state.bpm,
+        None if st.session_state.endless else st.session_state.num_chords,
+        seed,
+        st.session_state.subdivision,
+        st.session_state.swing,
+        tuple(st.session_state.focus_notes),
+        tuple(st.session_state.focus_chord_types),
+        st.session_state.focus_weight
+    )
+    st.session_state.practice_id += 1
+    st.session_state.practice_settings = settings
+    st.session_state.backing_track = None
+    st.session_state.window_start = 0
+    st.session_state.received_measure = 0
+    st.session_state.paused = False
+    return True
+
+def player_chunk() -> Optional[Dict[str, Any]]:
+    """The window of measures to send to the player.
+    
+    The window is sent on every rerun until the player reports having
+    received it, so a window lost on the way (e.g. to a rerun interrupting
+    the render) is sent again; after that, reruns send nothing.
+    
+    Returns:
+        Window tagged with the session id, or None when not practicing or
+        when the player already has the window
+    """
+    settings = st.session_state.practice_settings
+    if settings is None or st.session_state.window_start is None:
+        return None
+    if st.session_state.received_measure > st.session_state.window_start:
+        return None
+    chunk = dict(practice_window(settings, st.session_state.window_start))
+    chunk['session'] = st.session_state.practice_id
+    return chunk
+
+def handle_player_request(request: Optional[Dict[str, Any]]) -> None:
+    """Take in the player's latest report on the measures it has and needs.
+    
+    The player reports the first measure it has not received and, when it
+    wants more, the measure it needs. Whichever window starts at that
+    measure is served, up to the one after the current window, so repeated
+    or retried reports are harmless. Reports for other sessions are ignored.
+    
+    Args:
+        request: Latest value reported by the player component, e.g.
+            {'session': 1, 'received': 16, 'need': 16}
+    """
+    settings = st.session_state.practice_settings
+    if (request is None
+            or settings is None
+            or st.session_state.window_start is None
+            or request.get('session') != st.session_state.practice_id):
+        return
+    st.session_state.received_measure = request.get('received', 0)
+    
+    need = request.get('need')
+    window_start = st.session_state.window_start
+    if (need is None
+            or need % MEASURES_PER_WINDOW != 0
+            or not 0 <= need <= window_start + MEASURES_PER_WINDOW):
+        return
+    if need > window_start and practice_window(settings, window_start)['final']:
+        return
+    st.session_state.window_start = need
+
+def player_session() -> Optional[Dict[str, Any]]:
+    """Describe the current practice session for the player.
+    
+    Returns:
+        Dict with the session 'id' and 'timeSignature', or None when not
+        practicing
+    """
+    if not st.session_state.is_practicing or st.session_state.practice_settings is None:
+        return None
+    settings = st.session_state.practice_settings
+    return {
+        'id': st.session_state.practice_id,
+        'timeSignature': settings.time_signature
+    }
+
+def session_timeline(settings: PracticeSettings) -> Optional[EventTimeline]:
+    """Events of a finite practice session: bass, chord voicings and clicks.
+
+    Args:
+        settings: Session descriptor
+
+    Returns:
+        Timeline in seconds at the session's tempo, or None for endless
+        sessions
+    """
+    chords = practice_chords(settings)
+    if chords is None:
+        return None
+    seconds_per_beat = 60.0 / settings.bpm
+    seconds_per_measure = seconds_per_beat * settings.time_signature
+    return EventTimeline.merge(
+        build_chord_timeline(chords, seconds_per_measure),
+        build_voicing_timeline(chords, seconds_per_measure),
+        build_metronome_timeline(len(chords), settings.time_signature, seconds_per_beat,
+                                 settings.metronome_pattern)
+    )
+
+def render_backing_track() -> Optional[str]:
+    """Render the current finite practice session to an audio file on the server.
+    
+    Returns:
+        Path to a cached WAV file, or None for endless sessions
+    """
+    settings = st.session_state.practice_settings
+    timeline = session_timeline(settings) if settings is not None else None
+    if timeline is None:
+        return None
+    return render_to_file(timeline, st.session_state.bass_volume, st.session_state.metronome_volume,
+                          st.session_state.chord_volume)
+
+@lru_cache(maxsize=MIDI_CACHE_SIZE)
+def session_midi(settings: PracticeSettings) -> Optional[bytes]:
+    """Standard MIDI File of a finite practice session.
+
+    The file holds the bass line, voice-led chord voicings and the metronome.
+    Results are cached, since the download button needs the file on every
+    rerun.
+
+    Args:
+        settings: Session descriptor
+
+    Returns:
+        MIDI file contents, or None for endless sessions
+    """
+    timeline = session_timeline(settings)
+    if timeline is None:
+        return None
+    return encode_midi(timeline, settings.bpm, settings.time_signature)
+
+def practice_midi() -> Optional[bytes]:
+    """Export the current finite practice session as a Standard MIDI File.
+    
+    Returns:
+        MIDI file contents, or None for endless sessions
+    """
+    settings = st.session_state.practice_settings
+    return session_midi(settings) if settings is not None else None
+
+def replay_query() -> Optional[str]:
+    """Query string of a link that replays the current practice session.
+    
+    Returns:
+        URL query string (e.g. "?seed=42&progression=II-V-I&..."), or None
+        when not practicing
+    """
+    settings = st.session_state.practice_settings
+    if not st.session_state.is_practicing or settings is None:
+        return None
+    params = {
+        'seed': settings.seed,
+        'progression': settings.progression_type,
+        'notes': ','.join(settings.selected_notes),
+        'types': ','.join(settings.selected_chord_types),
+        'beats': settings.time_signature,
+        'bpm': settings.bpm,
+        'chords': 'endless' if settings.num_chords is None else settings.num_chords,
+        'sub': settings.subdivision,
+        'swing': settings.swing
+    }
+    if settings.chord_weights is not None:
+        params['focus'] = ','.join(settings.focus_notes)
+        params['focus_types'] = ','.join(settings.focus_chord_types)
+        params['focus_weight'] = settings.focus_weight
+    return '?' + urlencode(params)
+
+def load_replay_query() -> None:
+    """Apply the settings and seed of a replay link, once per browser session.
+    
+    Missing or invalid parameters are ignored, so a damaged link still loads
+    the app with its default settings.
+    """
+    if st.session_state.replay_loaded:
+        return
+    st.session_state.replay_loaded = True
+    params = st.query_params
+    
+    try:
+        seed = int(params.get('seed', ''))
+    except ValueError:
+        return
+    if not 0 <= seed < SEED_LIMIT:
+        return
+    st.session_state.replay_seed = seed
+    
+    progression_type = params.get('progression')
+    if progression_type in ('Random', MARKOV_PROGRESSION) or progression_type in PROGRESSIONS:
+        st.session_state.progression_type = progression_type
+    
+    notes = params.get('notes', '').split(',')
+    if notes and all(note in NOTES for note in notes):
+        for note in NOTES:
+            st.session_state[f'note_{note}'] = note in notes
+    chord_types = params.get('types', '').split(',')
+    if chord_types and all(chord_type in CHORD_TYPES for chord_type in chord_types):
+        for chord_type in CHORD_TYPES:
+            st.session_state[f'chord_{chord_type}'] = chord_type in chord_types
+    
+    try:
+        beats = int(params.get('beats', ''))
+        if beats in TIME_SIGNATURES:
+            st.session_state.time_signature = beats
+    except ValueError:
+        pass
+    try:
+        bpm = int(params.get('bpm', ''))
+        if MIN_BPM <= bpm <= MAX_BPM:
+            st.session_state.bpm = bpm
+    except ValueError:
+        pass
+    chords = params.get('chords', '')
+    if chords == 'endless':
+        st.session_state.endless = True
+    elif chords.isdigit() and MIN_CHORDS <= int(chords) <= MAX_CHORDS and int(chords) % 4 == 0:
+        st.session_state.endless = False
+        st.session_state.num_chords = int(chords)
+    try:
+        subdivision = int(params.get('sub', ''))
+        if subdivision in SUBDIVISIONS:
+            st.session_state.subdivision = subdivision
+    except ValueError:
+        pass
+    try:
+        swing = float(params.get('swing', ''))
+        if MIN_SWING <= swing <= MAX_SWING:
+            st.session_state.swing = swing
+    except ValueError:
+        pass
+    
+    focus_notes = [note for note in params.get('focus', '').split(',') if note]
+    if all(note in NOTES for note in focus_notes):
+        st.session_state.focus_notes = focus_notes
+    focus_chord_types = [chord_type for chord_type in params.get('focus_types', '').split(',') if chord_type]
+    if all(chord_type in CHORD_TYPES for chord_type in focus_chord_types):
+        st.session_state.focus_chord_types = focus_chord_types
+    try:
+        focus_weight = float(params.get('focus_weight', ''))
+        if MIN_FOCUS_WEIGHT <= focus_weight <= MAX_FOCUS_WEIGHT:
+            st.session_state.focus_weight = focus_weight
+    except ValueError:
+        pass
+
+def stop_practice() -> None:
+    """Stop the current practice session and drop its stream."""
+    st.session_state.practice_settings = None
+    st.session_state.backing_track = None
+    st.session_state.window_start = None
+    st.session_state.paused = False
@@ -0,0 +1,72 @@
+"""Build the instrument samples served with the player.
+
+The player loads one WAV file per note from meatball/static/samples, listed
+in samples/manifest.json. The samples are synthesised with the voices of
+meatball.music.render, so the browser and server renderings sound alike.
+
+Usage:
+    pip install -e . && python scripts/build_samples.py
+"""
+
+import json
+import os
+from meatball.music.render import synthesize_bass, synthesize_keys, synthesize_click, encode_wav
+from meatball.music.voicing import VOICING_LOW, VOICING_HIGH
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'meatball', 'static', 'samples')
+
+# Bump when the samples change so browser caches pick up the new files
+SAMPLES_VERSION = 3
+
+# Bass notes are low, so a low sample rate keeps the files small
+BASS_SAMPLE_RATE = 11025
+BASS_SAMPLE_SECONDS = 3.0
+BASS_NOTES = range(24, 36)  # C1 to B1, every root the bass line plays
+
+# Chord voicings span three octaves; one sample every minor third keeps the
+# set small, and the player repitches the nearest sample by at most a semitone
+KEYS_SAMPLE_RATE = 11025
+KEYS_SAMPLE_SECONDS = 3.0
+KEYS_NOTES = range(VOICING_LOW, VOICING_HIGH + 1, 3)  # C3 to C6
+
+CLICK_SAMPLE_RATE = 22050
+# Metronome clicks (see meatball.music.metronome): C5 subdivisions, E5 beats
+# and G5 accents, the last with the higher accent click
+CLICK_NOTES = {72: False, 76: False, 79: True}
+
+def write_sample(instrument: str, midi_note: int, data: bytes) -> None:
+    """Write one sample file."""
+    directory = os.path.join(SAMPLES_DIR, instrument)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{midi_note}.wav"), 'wb') as f:
+        f.write(data)
+
+def main() -> None:
+    for midi_note in BASS_NOTES:
+        tone = synthesize_bass(midi_note, BASS_SAMPLE_SECONDS, BASS_SAMPLE_RATE)
+        write_sample('synth_bass', midi_note, encode_wav(tone, BASS_SAMPLE_RATE))
+        
+    for midi_note in KEYS_NOTES:
+        tone = synthesize_keys(midi_note, KEYS_SAMPLE_SECONDS, KEYS_SAMPLE_RATE)
+        write_sample('synth_keys', midi_note, encode_wav(tone, KEYS_SAMPLE_RATE))
+        
+    for midi_note, accent in CLICK_NOTES.items():
+        click = synthesize_click(accent, CLICK_SAMPLE_RATE)
+        write_sample('synth_click', midi_note, encode_wav(click, CLICK_SAMPLE_RATE))
+        
+    manifest = {
+        'version': SAMPLES_VERSION,
+        'format': 'wav',
+        'instruments': {
+            'synth_bass': list(BASS_NOTES),
+            'synth_keys': list(KEYS_NOTES),
+            'synth_click': sorted(CLICK_NOTES)
+        }
+    }
+    with open(os.path.join(SAMPLES_DIR, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,26 @@
 """Main Streamlit application for chord practice."""
 
 import streamlit as st
-import streamlit.components.v1 as components
-import json
-import random
-import os
-
-from meatball.ui.session import init_session_state
-from meatball.ui.components import play_sequence, create_sound_controls
-from meatball.music.sequence import generate_chord_sequence, generate_metronome_sequence
+
+from meatball.diagnostics import span, flush as flush_diagnostics
+from meatball.ui.session import (
+    init_session_state, start_practice, stop_practice, handle_player_request,
+    player_session, player_chunk, practice_chords, practice_midi, render_backing_track,
+    replay_query, load_replay_query,
+    TIME_SIGNATURES, MIN_BPM, MAX_BPM, MIN_CHORDS, MAX_CHORDS, MIN_SWING, MAX_SWING,
+    MIN_FOCUS_WEIGHT, MAX_FOCUS_WEIGHT
+)
+from meatball.ui.components import play_sequence, create_sound_controls, show_diagnostics
 from meatball.music.theory import NOTES, CHORD_TYPES, get_note_display
+from meatball.music.progressions import PROGRESSIONS
+from meatball.music.markov import MARKOV_PROGRESSION
+from meatball.music.metronome import SUBDIVISIONS
+
+rerun_span = span('rerun').start()
 
 # Initialize session state
 init_session_state()
+load_replay_query()
 
 st.set_page_config(
     page_title="Meatball Training",
@@ -24,16 +32,11 @@ st.set_page_config(
 # Main content
 st.title('Meatball Training')
 
-# Display chord progression
-if st.session_state.current_progression:
-    st.write('Current progression:')
-    st.write(st.session_state.current_progression)
-
+progression_types = ['Random', MARKOV_PROGRESSION] + list(PROGRESSIONS)
 st.session_state.progression_type = st.selectbox(
     'Progression Type',
-    ['Random', 'II-V-I', 'Diatonic Cycle'],
-    index=0 if st.session_state.progression_type == "Random" else 
-          1 if st.session_state.progression_type == "II-V-I" else 2
+    progression_types,
+    index=progression_types.index(st.session_state.progression_type)
 )
 
 col1, col2 = st.columns(2)
@@ -54,46 +57,26 @@ with col1:
                 if st.session_state[f'chord_{chord_type}']:  # Check actual checkbox state
                     selected_chord_types.append(chord_type)
             
-            # Generate new sequences when starting practice
-            seconds_per_beat = 60.0 / st.session_state.bpm
-            seconds_per_measure = seconds_per_beat * st.session_state.time_signature
-            
-            midi_sequence, display_sequence = generate_chord_sequence(
-                st.session_state.num_chords,
-                st.session_state.progression_type,
-                selected_notes,
-                selected_chord_types,
-                seconds_per_measure
-            )
-            
-            metronome_sequence = generate_metronome_sequence(
-                st.session_state.num_chords,
-                st.session_state.time_signature,
-                seconds_per_beat
-            )
-            
-            # Store sequences in session state
-            st.session_state.midi_sequence = midi_sequence
-            st.session_state.display_sequence = display_sequence
-            st.session_state.metronome_sequence = metronome_sequence
+            # An empty selection is refused with a warning, kept on screen
+            # by not rerunning
+            if start_practice(selected_notes, selected_chord_types):
+                st.rerun()
         else:
-            # Clear sequences when stopping practice
-            st.session_state.midi_sequence = []
-            st.session_state.display_sequence = []
-            st.session_state.metronome_sequence = []
-            st.session_state.chord_sequence.clear()
-        st.rerun()
-
-if st.session_state.is_practicing:
-    # Use stored sequences
-    play_sequence(
-        st.session_state.midi_sequence,
-        st.session_state.metronome_sequence,
-        st.session_state.display_sequence
-    )
+            stop_practice()
+            st.rerun()
+
+with col2:
+    if st.session_state.is_practicing:
+        if st.button('▶ Resume' if st.session_state.paused else '⏸ Pause', key='pause_button'):
+            st.session_state.paused = not st.session_state.paused
+            st.rerun()
+
+# The player is filled in at the end of the script, once the sidebar has
+# updated the settings it receives
+player_area = st.container()
 
 # Sidebar
-with st.sidebar:
+with st.sidebar, span('sidebar'):
     st.header('Settings')
     
     st.subheader('Select Root Notes')
@@ -105,29 +88,90 @@ with st.sidebar:
         for j in range(3):
             if i + j < len(note_pairs):
                 note, display = note_pairs[i + j]
-                if cols[j].checkbox(display, value=True, key=f'note_{note}'):
+                if cols[j].checkbox(display, key=f'note_{note}'):
                     selected_notes.append(note)
 
     st.subheader('Select Chord Types')
     selected_chord_types = []
     for chord_type in CHORD_TYPES:
-        if st.checkbox(chord_type, value=True, key=f'chord_{chord_type}'):
+        if st.checkbox(chord_type, key=f'chord_{chord_type}'):
             selected_chord_types.append(chord_type)
-
-    # Update session state with selections
-    st.session_state.selected_notes = selected_notes
-    st.session_state.selected_chord_types = selected_chord_types
+    
+    # Weighted practice of hard keys and qualities; only Random mode draws
+    # roots and chord types freely
+    st.subheader('Focus')
+    random_mode = st.session_state.progression_type == 'Random'
+    st.multiselect('Focus on roots', NOTES, key='focus_notes', format_func=get_note_display,
+                   disabled=not random_mode)
+    st.multiselect('Focus on chord types', list(CHORD_TYPES), key='focus_chord_types',
+                   disabled=not random_mode)
+    st.slider('Focus strength', min_value=MIN_FOCUS_WEIGHT, max_value=MAX_FOCUS_WEIGHT,
+              step=0.5, key='focus_weight', disabled=not random_mode,
+              help='How many times more often focused roots and chord types come up in Random mode')
     
     st.subheader('Rhythm Settings')
-    st.session_state.time_signature = st.selectbox('Beats per measure', [2, 3, 4, 5, 6], index=2)
-    st.session_state.bpm = st.slider('Tempo (BPM)', min_value=40, max_value=200, value=st.session_state.bpm, step=1)
+    st.session_state.time_signature = st.selectbox(
+        'Beats per measure', TIME_SIGNATURES,
+        index=TIME_SIGNATURES.index(st.session_state.time_signature)
+    )
+    st.session_state.bpm = st.slider('Tempo (BPM)', min_value=MIN_BPM, max_value=MAX_BPM, value=st.session_state.bpm, step=1)
     
     # Initialize num_chords if not in session state
     if 'num_chords' not in st.session_state:
         st.session_state.num_chords = 16
         
+    st.session_state.endless = st.checkbox('Endless practice', value=st.session_state.endless,
+                                           help='Keep generating chords until you stop')
+    
     # Use the current session state value as the slider's default
-    st.session_state.num_chords = st.slider('Number of Chords', min_value=4, max_value=128, value=st.session_state.num_chords, step=4)
+    st.session_state.num_chords = st.slider('Number of Chords', min_value=MIN_CHORDS, max_value=MAX_CHORDS, value=st.session_state.num_chords, step=4,
+                                            disabled=st.session_state.endless)
+
+    subdivisions = list(SUBDIVISIONS)
+    st.session_state.subdivision = st.selectbox(
+        'Metronome clicks', subdivisions,
+        index=subdivisions.index(st.session_state.subdivision),
+        format_func=SUBDIVISIONS.get
+    )
+    # Swing only moves the off-beats of even subdivisions
+    st.session_state.swing = st.slider('Swing', min_value=MIN_SWING, max_value=MAX_SWING,
+                                       value=st.session_state.swing, step=0.01,
+                                       disabled=st.session_state.subdivision % 2 == 1,
+                                       help='Share of each pair of clicks taken by the first; 0.5 is straight')
 
 # Add sound controls to sidebar
-create_sound_controls()
+with span('sound_controls'):
+    create_sound_controls()
+
+with player_area:
+    if st.session_state.is_practicing:
+        # Serve the next window if the player asked for it
+        handle_player_request(st.session_state.get('player'))
+    
+    # The player stays mounted across reruns, so its audio context and samples
+    # survive; settings changes reach it as small updates
+    play_sequence(
+        player_session(),
+        player_chunk(),
+        key='player'
+    )
+    
+    # Link that brings back this exact exercise
+    query = replay_query()
+    if query is not None:
+        st.markdown(f"[🔁 Replay this exercise]({query})")
+    
+    # Finite sessions can also be played as a track rendered on the server
+    settings = st.session_state.practice_settings
+    if st.session_state.is_practicing and practice_chords(settings) is not None:
+        if st.session_state.backing_track is None:
+            if st.button('Render backing track', help='Render this session to an audio file on the server'):
+                st.session_state.backing_track = render_backing_track()
+        if st.session_state.backing_track is not None:
+            st.audio(st.session_state.backing_track, format='audio/wav')
+        st.download_button('Download MIDI', practice_midi(), file_name='meatball-practice.mid',
+                           mime='audio/midi', help='Bass line, chords and clicks for your DAW')
+
+show_diagnostics()
+rerun_span.stop()
+flush_diagnostics()
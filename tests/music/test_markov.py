@@ -0,0 +1,58 @@
+"""Tests for Markov chord generation."""
+
+import pytest
+from collections import Counter
+import numpy as np
+from meatball.music.theory import CHORD_TYPES, get_scale_degrees, chord_root
+from meatball.music.markov import MARKOV_PROGRESSION, MARKOV_CACHE_SIZE, markov_chain, walk
+from meatball.music.sequence import generate_chord_sequence, generate_practice_sets
+
+def test_markov_chain():
+    """Test the precomputed transition rows and the chain's chords."""
+    chain = markov_chain(('C', 'G'), ('Major', 'Minor', 'Dominant 7'))
+    assert np.all(np.diff(chain.cumulative, axis=1) >= 0)
+    assert np.all(chain.cumulative[:, -1] == 1.0)
+    assert chain.symbols[:7] == ('C', 'Dm', 'Em', 'F', 'G', 'G7', 'Am')
+    assert [chain.symbols[state] for state in chain.starts] == ['C', 'G']
+    assert markov_chain(('C', 'G'), ('Major', 'Minor', 'Dominant 7')) is chain
+    assert markov_chain.cache_info().maxsize == MARKOV_CACHE_SIZE
+    
+    # Chord types that fit no function fall back to every diatonic chord
+    assert len(markov_chain(('C',), ('Augmented',)).symbols) == 15
+    with pytest.raises(ValueError):
+        markov_chain((), ('Major',))
+
+def test_markov_walks():
+    """Test that walks follow functional harmony and only visit selected keys."""
+    chain = markov_chain(('C',), ('Major', 'Minor', 'Dominant 7'))
+    states = walk(chain, np.random.default_rng(0), 2000, num_walks=4)
+    assert states.shape == (4, 2000)
+    chords = [chain.symbols[state] for state in states.ravel().tolist()]
+    # Only one key, so only its diatonic chords
+    assert {chord_root(chord) for chord in chords} <= set(get_scale_degrees('C'))
+    
+    # Dominants resolve mostly to the tonic
+    after_dominant = Counter(b for a, b in zip(chords, chords[1:]) if a in ('G', 'G7'))
+    assert after_dominant.most_common(1)[0][0] == 'C'
+    
+    # Every step takes a transition of nonzero probability
+    transitions = np.diff(chain.cumulative, axis=1, prepend=0.0)
+    assert np.all(transitions[states[:, :-1], states[:, 1:]] > 0)
+    assert np.all(np.diff(chain.search) >= 0)
+
+def test_markov_chord_sequence():
+    """Test long seeded Markov sessions and batches of sets."""
+    notes = ['C', 'F', 'G', 'D']
+    _, chords = generate_chord_sequence(1000, MARKOV_PROGRESSION, notes, list(CHORD_TYPES), 2.0, seed=8)
+    _, again = generate_chord_sequence(1000, MARKOV_PROGRESSION, notes, list(CHORD_TYPES), 2.0, seed=8)
+    assert len(chords) == 1000
+    assert chords == again
+    # The walk modulates between the selected keys
+    tonics = {chord for chord in chords if chord in ('Cmaj7', 'Fmaj7', 'Gmaj7', 'Dmaj7')}
+    assert len(tonics) >= 3
+    
+    batch = generate_practice_sets(50, 64, MARKOV_PROGRESSION, notes, ['Major', 'Minor'], seed=2)
+    assert batch.roots.shape == (50, 64)
+    assert set(batch.symbols().ravel().tolist()) <= {
+        chord for note in notes for chord in markov_chain((note,), ('Major', 'Minor')).symbols
+    }
@@ -0,0 +1,72 @@
+"""Tests for MIDI file export and import."""
+
+import pytest
+import io
+import numpy as np
+from meatball.music.sequence import generate_chord_sequence, generate_metronome_sequence
+from meatball.music.timeline import EventTimeline
+from meatball.music.midi import encode_midi, write_midi, write_midi_stream, read_midi, iter_midi_notes
+
+def _session(num_chords=8):
+    midi_sequence, _ = generate_chord_sequence(num_chords, "II-V-I", ['C', 'Eb'], ['Major'], 2.0, seed=1)
+    return midi_sequence, generate_metronome_sequence(num_chords, 4, 0.5)
+
+def test_midi_round_trip(tmp_path):
+    """Test that written files read back to the same events."""
+    midi_sequence, metronome_sequence = _session()
+    expected = EventTimeline.merge(EventTimeline.from_events(midi_sequence),
+                                   EventTimeline.from_events(metronome_sequence))
+    path = str(tmp_path / 'session.mid')
+    write_midi(path, expected, 120, 4)
+    
+    with open(path, 'rb') as f:
+        assert f.read(4) == b'MThd'
+    
+    sequence = read_midi(path, chunk_size=64)
+    assert sequence.bpm == 120
+    assert sequence.time_signature == 4
+    
+    timeline = sequence.timeline
+    assert len(timeline) == len(expected)
+    assert np.allclose(timeline.time, expected.time)
+    assert np.allclose(timeline.duration, expected.duration)
+    assert timeline.pitch.tolist() == expected.pitch.tolist()
+    assert timeline.velocity.tolist() == expected.velocity.tolist()
+    assert timeline.instrument.tolist() == expected.instrument.tolist()
+    
+    bass = timeline.select('bass').to_dicts()
+    assert [event['note'] for event in bass] == [event['note'] for event in midi_sequence]
+
+def test_midi_encoding():
+    """Test running status, long delta times and streaming in batches."""
+    # Two notes on one channel, the second starting after a long gap
+    timeline = EventTimeline([0.0, 1000.0], 0.5, [36, 38], 90, 'bass')
+    data = encode_midi(timeline, 60, 3)
+    sequence = list(iter_midi_notes(io.BytesIO(data), chunk_size=16, batch_size=1))
+    notes = [batch for batch, _ in sequence if len(batch)]
+    assert len(notes) == 2
+    assert notes[1].time.tolist() == [1000.0]
+    assert sequence[-1][1] == {'bpm': 60.0, 'time_signature': 3}
+    
+    # Repeated note-on status bytes are written once
+    single = encode_midi(EventTimeline([0.0], 0.5, 36), 60, 3)
+    assert len(data) - len(single) < 2 * 4 + 4
+    
+    with pytest.raises(ValueError):
+        list(iter_midi_notes(io.BytesIO(b'RIFF' + data[4:])))
+
+def test_midi_stream():
+    """Test that writing in windows gives the same file as encoding at once."""
+    midi_sequence, metronome_sequence = _session(12)
+    # Clicks longer than a beat ring on into the next window
+    for click in metronome_sequence:
+        click['duration'] = 0.8
+    timeline = EventTimeline.merge(EventTimeline.from_events(midi_sequence),
+                                   EventTimeline.from_events(metronome_sequence))
+    windows = [timeline.between(start, start + 5.0) for start in np.arange(0.0, 24.0, 5.0)]
+    assert sum(len(window) for window in windows) == len(timeline)
+    
+    out = io.BytesIO(b'xx')
+    out.seek(2)
+    write_midi_stream(out, windows, 120, 4)
+    assert out.getvalue()[2:] == encode_midi(timeline, 120, 4)
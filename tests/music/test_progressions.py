@@ -1,7 +1,10 @@
 """Tests for chord progression generation."""
 
 import pytest
-from meatball.music.progressions import generate_two_five_one, generate_diatonic_cycle
+from meatball.music.progressions import (
+    generate_two_five_one, generate_diatonic_cycle, compile_progression,
+    progression_in_key, register_progression, PROGRESSIONS
+)
 
 def test_two_five_one():
     """Test II-V-I progression generation."""
@@ -34,3 +37,47 @@ def test_diatonic_cycle():
     assert progression[5] == 'G7'     # V chord
     assert progression[6] == 'Cmaj7'  # I chord
     assert progression[7] == 'Cmaj7'  # I chord repeated
+
+def test_compile_progression():
+    """Test Roman numeral templates compile to offsets and chord types."""
+    compiled = compile_progression('ii7 V7 Imaj7 bVII7 viiø7 I+ ivsus4')
+    assert [(offset, chord_type) for _, _, offset, chord_type in compiled] == [
+        (2, 'Minor 7'),
+        (7, 'Dominant 7'),
+        (0, 'Major 7'),
+        (10, 'Dominant 7'),
+        (11, 'Minor 7 flat 5'),
+        (0, 'Augmented'),
+        (5, 'Sus4'),
+    ]
+    
+    for template in ['', 'ii7 X7', 'Vm7b5', 'imaj7']:
+        with pytest.raises(ValueError):
+            compile_progression(template)
+
+def test_progression_in_key():
+    """Test templates are realised and spelled in any key."""
+    assert progression_in_key('I V vi IV', 'G') == ('G', 'D', 'Em', 'C')
+    assert progression_in_key('iv7 bVII7 Imaj7', 'C') == ('Fm7', 'Bb7', 'Cmaj7')
+    assert progression_in_key('ii7 V7 Imaj7', 'E') == ('F#m7', 'B7', 'Emaj7')
+    
+    # Realisations are memoised per (template, key)
+    progression_in_key.cache_clear()
+    progression_in_key('ii7 V7 Imaj7', 'Db')
+    progression_in_key('ii7 V7 Imaj7', 'Db')
+    assert progression_in_key.cache_info().hits == 1
+
+def test_register_progression():
+    """Test registered templates are usable by name."""
+    from meatball.music.sequence import generate_chord_sequence
+    
+    register_progression('Test Turnaround', 'Imaj7 VI7 ii7 V7')
+    try:
+        _, display_sequence = generate_chord_sequence(8, 'Test Turnaround', ['C'], ['Major'], 2.0)
+        assert display_sequence == ['Cmaj7', 'A7', 'Dm7', 'G7'] * 2
+    finally:
+        del PROGRESSIONS['Test Turnaround']
+    
+    with pytest.raises(ValueError):
+        register_progression('Broken', 'ii7 H7')
+    assert 'Broken' not in PROGRESSIONS
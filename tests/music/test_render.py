@@ -0,0 +1,130 @@
+"""Tests for server-side audio rendering."""
+
+import io
+import os
+import wave
+import pytest
+import numpy as np
+from meatball.music.render import (
+    render_sequence, render_to_file, render_key, encode_wav, prune_cache,
+    synthesize_bass, synthesize_keys, SAMPLE_RATE
+)
+from meatball.music.timeline import EventTimeline
+from meatball.music.sequence import (
+    generate_chord_sequence, build_chord_timeline, build_voicing_timeline, build_metronome_timeline
+)
+
+def _session(bpm=120):
+    seconds_per_beat = 60.0 / bpm
+    _, display_sequence = generate_chord_sequence(4, "II-V-I", ['C'], ['Major'], 4 * seconds_per_beat)
+    return EventTimeline.merge(build_chord_timeline(display_sequence, 4 * seconds_per_beat),
+                               build_metronome_timeline(4, 4, seconds_per_beat))
+
+def test_render_sequence():
+    """Test rendered audio covers the sequence and stays in range."""
+    samples = render_sequence(_session())
+    
+    assert samples.dtype == np.float32
+    assert len(samples) >= 8.0 * SAMPLE_RATE * 0.95
+    assert np.max(np.abs(samples)) <= 1.0
+    assert np.max(np.abs(samples)) > 0.1
+    
+    # Silence when nothing is scheduled
+    assert not np.any(render_sequence(EventTimeline.empty()))
+
+def test_render_sequence_chords():
+    """Test chord voicings are mixed in at the chord volume."""
+    chords = ['C', 'Am7', 'Dm7', 'G7']
+    voicings = build_voicing_timeline(chords, 2.0)
+    with_chords = EventTimeline.merge(build_chord_timeline(chords, 2.0), voicings)
+    
+    without = render_sequence(with_chords, chord_volume=0.0)
+    assert np.array_equal(without, render_sequence(build_chord_timeline(chords, 2.0)))
+    assert not np.array_equal(render_sequence(with_chords), without)
+    
+    # Chords alone stay in range at the default volume
+    samples = render_sequence(voicings)
+    assert 0.1 < np.max(np.abs(samples)) <= 1.0
+    
+    tone = synthesize_keys(60, 1.0)
+    assert tone[0] == 0.0
+    assert np.max(np.abs(tone)) <= 1.0
+
+def test_synthesize_bass_envelope():
+    """Test bass tones start and end at zero."""
+    tone = synthesize_bass(24, 1.0)
+    assert len(tone) == SAMPLE_RATE
+    assert tone[0] == 0.0
+    assert abs(tone[-1]) < 1e-3
+
+def test_encode_wav():
+    """Test WAV encoding."""
+    data = encode_wav(np.zeros(100, dtype=np.float32))
+    with wave.open(io.BytesIO(data)) as wav:
+        assert wav.getnframes() == 100
+        assert wav.getframerate() == SAMPLE_RATE
+        assert wav.getsampwidth() == 2
+
+def test_render_cache(tmp_path):
+    """Test identical settings reuse the cached file."""
+    timeline = _session()
+    path = render_to_file(timeline, cache_dir=str(tmp_path))
+    assert os.path.exists(path)
+    mtime = os.path.getmtime(path)
+    
+    assert render_to_file(_session(), cache_dir=str(tmp_path)) == path
+    assert os.path.getmtime(path) == mtime
+    assert len(os.listdir(tmp_path)) == 1
+    
+    # Any change to the inputs changes the key
+    key = render_key(timeline, 1.0, 0.4, 0.25)
+    assert render_key(timeline, 1.0, 0.5, 0.25) != key
+    assert render_key(_session(121), 1.0, 0.4, 0.25) != key
+    assert render_key(timeline, 1.0, 0.4, 0.3) != key
+
+def test_render_cache_pruning(tmp_path):
+    """Test the least recently used renderings are deleted past the size limit."""
+    for index, name in enumerate(['a', 'b', 'c', 'd']):
+        with open(tmp_path / f"{name}.wav", 'wb') as f:
+            f.write(bytes(1000))
+        os.utime(tmp_path / f"{name}.wav", (1000 + index, 1000 + index))
+    (tmp_path / 'other.tmp').write_bytes(bytes(5000))
+    
+    # Oldest first, never the kept file, and other files are left alone
+    assert prune_cache(str(tmp_path), 2500, keep=str(tmp_path / 'a.wav')) == 2
+    assert sorted(os.listdir(tmp_path)) == ['a.wav', 'd.wav', 'other.tmp']
+    assert prune_cache(str(tmp_path), 2500) == 0
+    
+    # Each new rendering prunes the cache; hits count as recent use
+    cache_dir = str(tmp_path / 'renders')
+    first = render_to_file(_session(120), cache_dir=cache_dir)
+    render_to_file(_session(121), cache_dir=cache_dir)
+    assert render_to_file(_session(120), cache_dir=cache_dir) == first
+    third = render_to_file(_session(122), cache_dir=cache_dir, max_bytes=int(2.5 * os.path.getsize(first)))
+    assert sorted(os.listdir(cache_dir)) == sorted(os.path.basename(path) for path in (first, third))
+
+def test_vendored_samples_cover_bass_notes():
+    """Test the shipped samples include every note the bass line can play."""
+    import json
+    from meatball.music.theory import note_to_midi, NOTES
+    from meatball.music.sequence import BASS_OCTAVE
+    
+    samples_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'meatball', 'static', 'samples')
+    with open(os.path.join(samples_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    
+    bass_notes = manifest['instruments']['synth_bass']
+    for note in NOTES:
+        assert note_to_midi(f"{note}{BASS_OCTAVE}") in bass_notes
+    
+    # Every voicing note is at most a semitone from a chord sample
+    from meatball.music.voicing import VOICING_LOW, VOICING_HIGH
+    keys_notes = np.array(manifest['instruments']['synth_keys'])
+    for note in range(VOICING_LOW, VOICING_HIGH + 1):
+        assert np.min(np.abs(keys_notes - note)) <= 1
+    
+    for instrument, notes in manifest['instruments'].items():
+        for note in notes:
+            path = os.path.join(samples_dir, instrument, f"{note}.{manifest['format']}")
+            with wave.open(path) as wav:
+                assert wav.getnframes() > 0
@@ -0,0 +1,52 @@
+"""Tests for alias table sampling."""
+
+import pytest
+import numpy as np
+from meatball.music.sampling import AliasTable, alias_table
+
+def _frequencies(table, size=200_000, seed=0):
+    draws = table.sample(np.random.default_rng(seed), size)
+    assert len(draws) == size
+    return np.bincount(draws, minlength=len(table)) / size
+
+def test_alias_table_distribution():
+    """Test that draws follow the weights."""
+    weights = [1.0, 0.0, 3.0, 0.5, 10.0]
+    table = AliasTable(weights)
+    assert np.allclose(table.probabilities, np.array(weights) / sum(weights))
+    frequencies = _frequencies(table)
+    assert frequencies[1] == 0
+    assert np.abs(frequencies - table.probabilities).max() < 0.01
+    assert len(table.sample(np.random.default_rng(0), 0)) == 0
+    
+    for bad in ([], [-1.0, 2.0], [0.0, 0.0]):
+        with pytest.raises(ValueError):
+            AliasTable(bad)
+    
+    # Cached per weight vector
+    assert alias_table((1.0, 2.0)) is alias_table((1.0, 2.0))
+
+def test_alias_table_updates():
+    """Test that updated tables draw from the new weights."""
+    table = AliasTable([4.0, 4.0, 4.0, 4.0])
+    prob = table.prob
+    
+    # Lowering a weight keeps the table and rejects part of its draws
+    table.update(0, 1.0)
+    assert table.prob is prob
+    assert table.acceptance == pytest.approx(13 / 16)
+    assert np.abs(_frequencies(table) - table.probabilities).max() < 0.01
+    
+    # Raising it past its bound rebuilds the table with headroom
+    table.update(1, 20.0)
+    assert table.prob is not prob
+    assert table.bounds[1] > 20.0
+    table.update(1, 30.0)
+    assert np.abs(_frequencies(table, seed=1) - table.probabilities).max() < 0.01
+    
+    # Copies are independent
+    copy = table.copy()
+    copy.update(2, 0.0)
+    assert table.weights[2] == 4.0
+    with pytest.raises(ValueError):
+        copy.update(3, -1.0)
@@ -1,7 +1,16 @@
 """Tests for sequence generation."""
 
 import pytest
-from meatball.music.sequence import generate_chord_sequence, generate_metronome_sequence
+import numpy as np
+from meatball.music.sequence import (
+    generate_chord_sequence, generate_metronome_sequence,
+    iter_chord_symbols, generate_sequence_window,
+    generate_practice_sets, PracticeSetBatch,
+    cached_chord_sequence, make_rng, CHORD_VELOCITY
+)
+from meatball.music.tempo import PPQ
+from meatball.music.theory import note_to_midi
+from meatball.music.voicing import NUM_VOICES
 
 def test_random_chord_sequence():
     """Test random chord sequence generation."""
@@ -61,3 +70,132 @@ def test_metronome_sequence():
             assert event['note'] == 'G5'  # Accented beat
         else:
             assert event['note'] == 'E5'  # Normal beat
+
+def test_chord_stream_is_endless():
+    """Test the lazy chord stream for every progression type."""
+    from itertools import islice
+    import random
+    
+    for progression_type in ["Random", "II-V-I", "Diatonic Cycle"]:
+        stream = iter_chord_symbols(progression_type, ['C', 'F'], ['Major'], random.Random(1))
+        chords = list(islice(stream, 1000))
+        assert len(chords) == 1000
+    
+    # Same seed, same stream
+    first = list(islice(iter_chord_symbols("Random", ['C', 'F'], ['Major'], random.Random(5)), 32))
+    second = list(islice(iter_chord_symbols("Random", ['C', 'F'], ['Major'], random.Random(5)), 32))
+    assert first == second
+    
+    # Diatonic cycle without roots produces nothing
+    assert list(iter_chord_symbols("Diatonic Cycle", [], ['Major'])) == []
+
+def test_sequence_windows():
+    """Test windows pulled from a stream line up with a full sequence."""
+    chords = iter(['C', 'F', 'G', 'C', 'Am', 'Dm'])
+    first = generate_sequence_window(chords, 0, 4, 4)
+    second = generate_sequence_window(chords, 4, 4, 4)
+    
+    assert first['chords'] == ['C', 'F', 'G', 'C']
+    assert not first['final']
+    assert second['chords'] == ['Am', 'Dm']
+    assert second['final']
+    
+    # Event positions are ticks from the start of the session
+    assert second['bass'][0]['tick'] == 16 * PPQ
+    assert second['bass'][0]['note'] == 'A1'
+    # Distinct bass notes in order of first use
+    assert first['notes'] == [24, 29, 31]
+    assert second['notes'] == [33, 26]
+    assert second['metronome'][0] == {'note': 'G5', 'tick': 16 * PPQ, 'velocity': 127}
+    assert second['metronome'][1]['note'] == 'E5'
+    assert len(second['metronome']) == 2 * 4
+    
+    # Four voiced chord notes per measure, under the bass in velocity
+    assert len(second['voicings']) == 2 * NUM_VOICES
+    assert {event['tick'] for event in second['voicings']} == {16 * PPQ, 20 * PPQ}
+    assert all(event['velocity'] == CHORD_VELOCITY for event in second['voicings'])
+    assert sorted(second['voicing_notes']) == sorted({note_to_midi(event['note']) for event in second['voicings']})
+
+def test_generate_practice_sets(tmp_path):
+    """Test vectorised batch generation of practice sets."""
+    batch = generate_practice_sets(50, 16, "Random", ['C', 'F#'], ['Major', 'Minor 7'], seed=3)
+    assert batch.roots.shape == (50, 16)
+    assert batch.roots.dtype == np.uint8
+    for chord in batch.symbols().ravel():
+        assert chord in ('C', 'Cm7', 'F#', 'F#m7')
+    
+    # Seeded batches are reproducible, and sets differ from each other
+    again = generate_practice_sets(50, 16, "Random", ['C', 'F#'], ['Major', 'Minor 7'], seed=3)
+    assert np.array_equal(batch.roots, again.roots)
+    assert np.array_equal(batch.chord_types, again.chord_types)
+    assert len({tuple(batch.chords(i)) for i in range(len(batch))}) > 1
+    
+    # Bass pitches follow the roots
+    assert set(batch.bass_pitches().ravel().tolist()) <= {24, 30}
+    
+    # Single-file export
+    path = str(tmp_path / 'sets.npz')
+    batch.save(path)
+    loaded = PracticeSetBatch.load(path)
+    assert loaded.chords(7) == batch.chords(7)
+    
+    text_path = tmp_path / 'sets.txt'
+    batch.write_text(str(text_path))
+    lines = text_path.read_text().splitlines()
+    assert len(lines) == 50
+    assert lines[0].split() == batch.chords(0)
+
+def test_generate_practice_sets_progressions():
+    """Test batches of templated progressions."""
+    batch = generate_practice_sets(20, 10, "II-V-I", ['C', 'F'], [], seed=1)
+    for i in range(len(batch)):
+        chords = batch.chords(i)
+        assert len(chords) == 10
+        assert chords[:4] in (['Dm7', 'G7', 'Cmaj7', 'Cmaj7'], ['Gm7', 'C7', 'Fmaj7', 'Fmaj7'])
+    
+    # Diatonic cycles stay in one key
+    batch = generate_practice_sets(20, 16, "Diatonic Cycle", ['C', 'F'], [], seed=1)
+    for i in range(len(batch)):
+        chords = batch.chords(i)
+        assert chords[:8] == chords[8:]
+
+def test_seeded_chord_sequence():
+    """Test that a seed makes generation reproducible."""
+    args = (32, "Random", ['C', 'F', 'G', 'Bb'], ['Major', 'Minor', 'Dominant 7'], 2.0)
+    first = generate_chord_sequence(*args, seed=7)
+    assert generate_chord_sequence(*args, seed=7) == first
+    assert generate_chord_sequence(*args, rng=make_rng(7)) == first
+    assert generate_chord_sequence(*args, seed=8)[1] != first[1]
+
+def test_cached_chord_sequence():
+    """Test that identical exercises share one cached result."""
+    cached_chord_sequence.cache_clear()
+    args = (16, "II-V-I", ['C', 'F'], ['Major'], 2.0, 3)
+    midi_sequence, display_sequence = cached_chord_sequence(*args)
+    assert cached_chord_sequence(*args)[1] is display_sequence
+    assert cached_chord_sequence(16, "II-V-I", ('C', 'F'), ('Major',), 2, 3)[1] is display_sequence
+    assert cached_chord_sequence.cache_info().hits == 2
+    
+    # Cached results match uncached generation with the same seed
+    assert list(display_sequence) == generate_chord_sequence(*args[:5], seed=3)[1]
+    assert list(midi_sequence) == generate_chord_sequence(*args[:5], seed=3)[0]
+
+def test_weighted_chord_sequence():
+    """Test that weighted Random mode favours heavy pairs and stays seeded."""
+    weights = {('C', 'Minor'): 20.0, ('F', 'Major'): 0.0}
+    _, display_sequence = generate_chord_sequence(
+        400, "Random", ['C', 'F', 'G'], ['Major', 'Minor'], 2.0, seed=3, weights=weights
+    )
+    assert 'F' not in display_sequence
+    assert display_sequence.count('Cm') > 200
+    assert set(display_sequence) <= {'C', 'Cm', 'Fm', 'G', 'Gm'}
+    
+    _, again = cached_chord_sequence(400, "Random", ['C', 'F', 'G'], ['Major', 'Minor'], 2.0, 3, weights)
+    assert list(again) == display_sequence
+
+def test_empty_selection():
+    """Test that an empty selection gives an empty chord stream in every mode."""
+    for progression_type in ("Random", "II-V-I"):
+        assert list(iter_chord_symbols(progression_type, [], ['Major'], make_rng(1))) == []
+    assert list(iter_chord_symbols("Random", ['C'], [], make_rng(1))) == []
+    assert list(iter_chord_symbols("Random", ['C'], [], make_rng(1), weights={})) == []
@@ -0,0 +1,41 @@
+"""Tests for ticks, tempo maps and metronome patterns."""
+
+import pytest
+import numpy as np
+from meatball.music.tempo import PPQ, TempoMap
+from meatball.music.metronome import (
+    MetronomePattern, click_ticks, ACCENT, BEAT, SUBDIVISION
+)
+
+def test_tempo_map_conversion():
+    """Test tick/second conversion across tempo changes."""
+    tempo = TempoMap(0.5, [(4 * PPQ, 1.0)])
+    assert tempo.seconds([0, PPQ, 4 * PPQ, 5 * PPQ]).tolist() == [0.0, 0.5, 2.0, 3.0]
+    assert tempo.bpm.tolist() == [120.0, 60.0]
+    
+    with pytest.raises(ValueError):
+        TempoMap(0.5, [(0, 0.25)])
+
+def test_long_session_timing_is_exact():
+    """Test that beat times do not drift over a long session."""
+    seconds_per_beat = 60.0 / 97
+    beats = np.arange(100_000)
+    times = TempoMap(seconds_per_beat).seconds(beats * PPQ)
+    assert np.array_equal(times, beats * seconds_per_beat)
+
+def test_click_patterns():
+    """Test accents, subdivisions and swing of metronome patterns."""
+    ticks, levels = click_ticks(MetronomePattern(), 2, 3)
+    assert ticks.tolist() == [0, PPQ, 2 * PPQ, 3 * PPQ, 4 * PPQ, 5 * PPQ]
+    assert levels.tolist() == [ACCENT, BEAT, BEAT] * 2
+    
+    ticks, levels = click_ticks(MetronomePattern(accents=(0, 2), subdivision=2, swing=2 / 3), 1, 4, start_measure=1)
+    assert ticks[:4].tolist() == [4 * PPQ, 4 * PPQ + 320, 5 * PPQ, 5 * PPQ + 320]
+    assert levels.tolist() == [ACCENT, SUBDIVISION, BEAT, SUBDIVISION, ACCENT, SUBDIVISION, BEAT, SUBDIVISION]
+    
+    # Swing leaves odd subdivisions alone
+    ticks, _ = click_ticks(MetronomePattern(subdivision=3, swing=0.6), 1, 1)
+    assert ticks.tolist() == [0, PPQ // 3, 2 * PPQ // 3]
+    
+    with pytest.raises(ValueError):
+        click_ticks(MetronomePattern(subdivision=7), 1, 4)
@@ -1,7 +1,10 @@
 """Tests for music theory module."""
 
 import pytest
-from meatball.music.theory import get_scale_degrees, get_note_display, NOTES, NOTES_SHARP
+from meatball.music.theory import (
+    get_scale_degrees, get_note_display, chord_symbol, chord_root,
+    note_to_pitch_class, pitch_class_to_note, NOTES, NOTES_SHARP, SCALE_MODES
+)
 
 def test_get_scale_degrees():
     """Test major scale generation from different roots."""
@@ -13,6 +16,42 @@ def test_get_scale_degrees():
     
     # Test F major scale (one flat)
     assert get_scale_degrees('F') == ['F', 'G', 'A', 'Bb', 'C', 'D', 'E']
+    
+    # Sharp spelling of a root resolves to the same scale
+    assert get_scale_degrees('F#') == get_scale_degrees('Gb')
+    
+    with pytest.raises(ValueError):
+        get_scale_degrees('H')
+
+def test_get_scale_degrees_modes():
+    """Test modes and minor scales use their parent key signature."""
+    assert get_scale_degrees('A', 'Minor') == ['A', 'B', 'C', 'D', 'E', 'F', 'G']
+    assert get_scale_degrees('E', 'Minor') == ['E', 'F#', 'G', 'A', 'B', 'C', 'D']
+    assert get_scale_degrees('D', 'Dorian') == ['D', 'E', 'F', 'G', 'A', 'B', 'C']
+    assert get_scale_degrees('C', 'Minor') == ['C', 'D', 'Eb', 'F', 'G', 'Ab', 'Bb']
+    assert get_scale_degrees('A', 'Harmonic Minor')[-1] == 'G#'
+    
+    # Every mode is available for every root
+    for mode in SCALE_MODES:
+        for note in NOTES + NOTES_SHARP:
+            assert len(get_scale_degrees(note, mode)) == 7
+
+def test_pitch_classes():
+    """Test conversion between note names and pitch classes."""
+    assert note_to_pitch_class('C') == 0
+    assert note_to_pitch_class('A') == 9
+    assert note_to_pitch_class('Bb') == note_to_pitch_class('A#') == 10
+    assert pitch_class_to_note(1) == 'Db'
+    assert pitch_class_to_note(1, sharp=True) == 'C#'
+    assert pitch_class_to_note(13) == 'Db'
+
+def test_chord_symbols():
+    """Test chord symbol construction and root extraction."""
+    assert chord_symbol('D', 'Minor 7') == 'Dm7'
+    assert chord_symbol('F#', 'Minor 7 flat 5') == 'F#m7b5'
+    assert chord_root('F#m7b5') == 'F#'
+    assert chord_root('Bbmaj7') == 'Bb'
+    assert chord_root('C') == 'C'
 
 def test_get_note_display():
     """Test note display formatting."""
@@ -0,0 +1,76 @@
+"""Tests for array-backed event timelines."""
+
+import pytest
+import numpy as np
+from meatball.music.timeline import EventTimeline, EVENT_BYTES
+from meatball.music.sequence import (
+    generate_chord_sequence, build_chord_timeline, build_metronome_timeline
+)
+
+def test_from_events_round_trip():
+    """Test conversion from and to the dict event format."""
+    midi_sequence, display_sequence = generate_chord_sequence(
+        8, "Random", ['C', 'F', 'Bb'], ['Major', 'Minor'], 2.0
+    )
+    timeline = EventTimeline.from_events(midi_sequence)
+    assert len(timeline) == 8
+    
+    events = timeline.to_dicts()
+    for original, event in zip(midi_sequence, events):
+        assert event['note'] == original['note']
+        assert event['time'] == original['time']
+        assert event['duration'] == original['duration']
+        assert event['instrument'] == 'bass'
+
+def test_build_timelines():
+    """Test the vectorised bass and metronome builders."""
+    bass = build_chord_timeline(['Dm7', 'G7', 'Cmaj7', 'F#m7b5'], 2.0)
+    assert bass.pitch.tolist() == [26, 31, 24, 30]
+    assert bass.time.tolist() == [0.0, 2.0, 4.0, 6.0]
+    assert [event['note'] for event in bass.to_dicts(sharp=True)] == ['D1', 'G1', 'C1', 'F#1']
+    
+    clicks = build_metronome_timeline(2, 3, 0.5)
+    assert clicks.time.tolist() == [0.0, 0.5, 1.0, 1.5, 2.0, 2.5]
+    
+    # Windows of a session start at their first measure
+    assert build_chord_timeline(['C', 'F'], 2.0, 3).time.tolist() == [6.0, 8.0]
+    assert build_metronome_timeline(1, 3, 0.5, start_measure=2).time.tolist() == [3.0, 3.5, 4.0]
+    assert clicks.velocity[0] > clicks.velocity[1]
+    assert clicks.velocity[3] == clicks.velocity[0]
+
+def test_merge_and_slice():
+    """Test merging tracks, slicing views and time windows."""
+    bass = build_chord_timeline(['C', 'F', 'G', 'C'], 2.0)
+    clicks = build_metronome_timeline(4, 4, 0.5)
+    merged = EventTimeline.merge(bass, clicks)
+    
+    assert len(merged) == len(bass) + len(clicks)
+    assert np.all(np.diff(merged.time) >= 0)
+    # Bass events come first at equal times
+    assert merged.to_dicts()[0]['instrument'] == 'bass'
+    assert len(merged.select('bass')) == 4
+    
+    window = merged.between(2.0, 4.0)
+    assert len(window) == 1 + 4
+    assert np.shares_memory(window.time, merged.time)
+
+def test_buffer_export():
+    """Test zero-copy byte export and reconstruction."""
+    timeline = build_metronome_timeline(4, 4, 0.5)
+    buffer = timeline.to_buffer()
+    assert buffer.nbytes == len(timeline) * EVENT_BYTES
+    assert np.shares_memory(np.frombuffer(buffer, dtype=np.uint8), timeline.time)
+    
+    restored = EventTimeline.from_buffer(bytes(buffer))
+    assert restored.to_dicts() == timeline.to_dicts()
+    
+    # Slices are packed on export
+    assert EventTimeline.from_buffer(timeline[2:5].to_buffer()).time.tolist() == [1.0, 1.5, 2.0]
+    
+    # Single events are not selected by index, whatever the integer type
+    for index in (3, np.int64(3)):
+        with pytest.raises(TypeError):
+            timeline[index]
+    
+    with pytest.raises(ValueError):
+        EventTimeline.from_buffer(b'\x00' * (EVENT_BYTES + 1))
@@ -0,0 +1,63 @@
+"""Tests for chord voicings and voice leading."""
+
+import pytest
+import itertools
+import numpy as np
+from meatball.music.theory import CHORD_TYPES, NOTES, note_to_pitch_class
+from meatball.music.voicing import (
+    CHORD_INTERVALS, NUM_VOICES, VOICING_LOW, VOICING_HIGH,
+    voicing_candidates, chord_voicings, voice_lead
+)
+from meatball.music.sequence import generate_chord_sequence, build_voicing_timeline
+
+def test_voicing_candidates():
+    """Test that every candidate holds the chord's tones within the register."""
+    assert set(CHORD_INTERVALS) == set(CHORD_TYPES)
+    for note, chord_type in itertools.product(NOTES, CHORD_TYPES):
+        candidates = voicing_candidates(note, chord_type)
+        assert candidates.shape[1] == NUM_VOICES
+        assert len(candidates) >= 12
+        assert candidates.min() >= VOICING_LOW and candidates.max() <= VOICING_HIGH
+        # Four distinct notes, no collapsed unisons
+        assert np.all(np.diff(candidates, axis=1) > 0)
+
+        root = note_to_pitch_class(note)
+        allowed = {(root + interval) % 12 for intervals in CHORD_INTERVALS[chord_type]
+                   for interval in intervals}
+        assert set((candidates % 12).ravel().tolist()) <= allowed
+
+    # Cached and shared
+    assert chord_voicings('Dm7') is voicing_candidates('D', 'Minor 7')
+    with pytest.raises(ValueError):
+        chord_voicings('Dm13')
+
+def test_voice_lead_is_optimal():
+    """Test the dynamic program against a brute-force search."""
+    chords = ['Dm7', 'G7', 'Cmaj7']
+    result = voice_lead(chords)
+
+    def movement(voicings):
+        return sum(np.abs(a - b).sum() for a, b in zip(voicings, voicings[1:]))
+
+    best = min(movement(voicings) for voicings in itertools.product(
+        *(chord_voicings(chord) for chord in chords)))
+    assert movement(result) == best
+    for chord, voicing in zip(chords, result):
+        assert any((voicing == candidate).all() for candidate in chord_voicings(chord))
+
+    assert voice_lead([]).shape == (0, NUM_VOICES)
+
+def test_voicing_timeline():
+    """Test long sequences and the voicing track."""
+    _, chords = generate_chord_sequence(128, 'Random', NOTES, list(CHORD_TYPES), 2.0, seed=5)
+    voicings = voice_lead(chords)
+    assert voicings.shape == (128, NUM_VOICES)
+    # Voice leading keeps the voices close from chord to chord
+    assert np.abs(np.diff(voicings, axis=0)).sum(axis=1).mean() < 12
+
+    timeline = build_voicing_timeline(chords, 2.0)
+    assert len(timeline) == 128 * NUM_VOICES
+    assert timeline.time[:NUM_VOICES].tolist() == [0.0] * NUM_VOICES
+    assert timeline.time[-1] == 127 * 2.0
+    assert timeline.pitch.tolist() == voicings.ravel().tolist()
+    assert timeline.to_dicts()[0]['instrument'] == 'chords'
@@ -0,0 +1,65 @@
+"""Tests for the command-line session generator."""
+
+import pytest
+import json
+from meatball.cli import main
+from meatball.music.sequence import generate_chord_sequence, generate_metronome_sequence
+from meatball.music.midi import read_midi
+from meatball.music.theory import NOTES, CHORD_TYPES, note_to_midi
+
+def test_jsonl_sessions(tmp_path):
+    """Test that windows add up to the sessions the library generates."""
+    path = tmp_path / 'bank.jsonl'
+    args = ['--sessions', '3', '--chords', '10', '--progression', 'II-V-I', '--notes', 'C', 'Eb',
+            '--seed', '7', '--window', '4', '--subdivision', '2']
+    assert main(args + ['-o', str(path)]) == 0
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(line['session'], line['start']) for line in lines] == [
+        (session, start) for session in range(3) for start in (0, 4, 8)]
+    assert [line['final'] for line in lines] == [False, False, True] * 3
+
+    for session in range(3):
+        windows = [line for line in lines if line['session'] == session]
+        assert windows[0]['seed'] == 7 + session
+        midi_sequence, display_sequence = generate_chord_sequence(
+            10, 'II-V-I', ['C', 'Eb'], [], 2.0, seed=7 + session)
+        assert sum((window['chords'] for window in windows), []) == display_sequence
+        assert sum((window['bass'] for window in windows), []) == midi_sequence
+        assert len(sum((window['voicings'] for window in windows), [])) == 4 * 10
+        clicks = sum((window['metronome'] for window in windows), [])
+        expected = generate_metronome_sequence(10, 4, 0.5)
+        assert len(clicks) == 2 * len(expected)
+        assert [click['time'] for click in clicks[::2]] == pytest.approx([click['time'] for click in expected])
+
+    # Worker processes write the same lines in the same order
+    parallel = tmp_path / 'parallel.jsonl'
+    assert main(args + ['-o', str(parallel), '--workers', '2']) == 0
+    assert parallel.read_text() == path.read_text()
+
+def test_midi_sessions(tmp_path):
+    """Test MIDI files, one per session."""
+    assert main(['--sessions', '2', '--chords', '12', '--seed', '1', '--window', '5',
+                 '--format', 'midi', '-o', str(tmp_path / 'bank')]) == 0
+    for index in range(2):
+        sequence = read_midi(str(tmp_path / 'bank' / f'session_{index}.mid'))
+        assert sequence.bpm == 120
+        midi_sequence, _ = generate_chord_sequence(12, 'Random', NOTES, list(CHORD_TYPES), 2.0, seed=1 + index)
+        assert sequence.timeline.select('bass').pitch.tolist() == [
+            note_to_midi(event['note']) for event in midi_sequence]
+        assert len(sequence.timeline.select('metronome')) == 12 * 4
+        assert len(sequence.timeline.select('chords')) == 12 * 4
+
+    with pytest.raises(SystemExit):
+        main(['--sessions', '2', '-o', str(tmp_path / 'bank.mid')])
+
+def test_midi_directory(tmp_path):
+    """Test that a single MIDI session written to a new directory path works."""
+    directory = tmp_path / 'exercises'
+    assert main(['--progression', 'II-V-I', '--notes', 'C', 'F', 'Bb', '--seed', '2',
+                 '--format', 'midi', '-o', str(directory) + '/']) == 0
+    assert [path.name for path in directory.iterdir()] == ['session_0.mid']
+    assert len(read_midi(str(directory / 'session_0.mid')).timeline.select('bass')) == 16
+    
+    # A .mid path is still a single file
+    assert main(['--seed', '2', '-o', str(tmp_path / 'one.mid')]) == 0
+    assert read_midi(str(tmp_path / 'one.mid')).bpm == 120
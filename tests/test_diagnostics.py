@@ -0,0 +1,49 @@
+"""Tests for the instrumentation layer."""
+
+import pytest
+import json
+from meatball import diagnostics
+
+@pytest.fixture
+def instrumentation(tmp_path):
+    path = tmp_path / 'spans.jsonl'
+    diagnostics.reset()
+    diagnostics.enable(str(path))
+    yield path
+    diagnostics.disable()
+    diagnostics.reset()
+
+def test_disabled_spans_are_shared_no_ops():
+    """Test that nothing is recorded while instrumentation is off."""
+    diagnostics.disable()
+    diagnostics.reset()
+    assert diagnostics.span('a') is diagnostics.span('b')
+    with diagnostics.span('a'):
+        pass
+    diagnostics.count('c')
+    assert diagnostics.summary() == {}
+    assert diagnostics.counters() == {}
+
+def test_spans_and_counters(instrumentation):
+    """Test recording, percentiles and JSONL export."""
+    @diagnostics.timed('work')
+    def work(n):
+        return sum(range(n))
+    
+    for _ in range(10):
+        assert work(1000) == 499500
+    rerun = diagnostics.span('rerun').start()
+    rerun.stop()
+    diagnostics.count('bytes', 100)
+    diagnostics.count('bytes', 50)
+    
+    stats = diagnostics.summary()
+    assert stats['work']['count'] == 10
+    assert stats['work']['p50'] <= stats['work']['p99'] <= stats['work']['max']
+    assert stats['rerun']['count'] == 1
+    assert diagnostics.counters() == {'bytes': 150}
+    
+    diagnostics.flush()
+    records = [json.loads(line) for line in instrumentation.read_text().splitlines()]
+    assert len(records) == 13
+    assert {record['name'] for record in records} == {'work', 'rerun', 'bytes'}
@@ -0,0 +1,84 @@
+"""Tests for practice session descriptors."""
+
+import pytest
+from itertools import islice
+from meatball.music.sequence import iter_chord_symbols, make_rng
+from meatball.music.tempo import PPQ
+import streamlit as st
+from meatball.ui.session import (
+    PracticeSettings, practice_chords, practice_window, MEASURES_PER_WINDOW,
+    init_session_state, player_chunk, handle_player_request
+)
+
+def test_finite_practice_windows():
+    """Test that windows of a finite session cover its chords and then end."""
+    settings = PracticeSettings('Random', ('C', 'F', 'G'), ('Major', 'Minor'), 4, 120, 24, 9)
+    chords = practice_chords(settings)
+    assert len(chords) == 24
+    
+    first = practice_window(settings, 0)
+    second = practice_window(settings, MEASURES_PER_WINDOW)
+    assert first['chords'] + second['chords'] == list(chords)
+    assert not first['final']
+    assert second['final']
+    assert second['bass'][0]['tick'] == MEASURES_PER_WINDOW * 4 * PPQ
+    
+    # Windows are rebuilt from the descriptor alone
+    assert practice_window(settings._replace(), 0) is first
+    # and shared between tempos, as they are laid out in ticks
+    assert practice_window(settings._replace(bpm=90), 0) is first
+    assert practice_chords(settings._replace(bpm=90)) is chords
+
+def test_endless_practice_windows():
+    """Test that endless windows continue the seeded chord stream."""
+    settings = PracticeSettings('II-V-I', ('C', 'F', 'Bb'), ('Major',), 3, 90, None, 4)
+    assert practice_chords(settings) is None
+    
+    stream = iter_chord_symbols('II-V-I', ['C', 'F', 'Bb'], ['Major'], make_rng(4))
+    expected = list(islice(stream, 3 * MEASURES_PER_WINDOW))
+    windows = [practice_window(settings, start)
+               for start in range(0, 3 * MEASURES_PER_WINDOW, MEASURES_PER_WINDOW)]
+    assert sum((window['chords'] for window in windows), []) == expected
+    assert not any(window['final'] for window in windows)
+
+def test_focus_weights():
+    """Test that focused roots and chord types weigh more in Random mode."""
+    settings = PracticeSettings('Random', ('C', 'F'), ('Major', 'Minor'), 4, 120, 16, 9,
+                                focus_notes=('C',), focus_chord_types=('Minor',), focus_weight=3.0)
+    weights = settings.chord_weights
+    assert weights[('C', 'Minor')] == 9.0
+    assert weights[('C', 'Major')] == weights[('F', 'Minor')] == 3.0
+    assert weights[('F', 'Major')] == 1.0
+    
+    assert settings._replace(progression_type='II-V-I').chord_weights is None
+    assert settings._replace(focus_weight=1.0).chord_weights is None
+    assert practice_chords(settings) != practice_chords(settings._replace(focus_notes=(), focus_chord_types=()))
+
+def test_window_delivery():
+    """Test that windows are resent until the player reports having them."""
+    init_session_state()
+    st.session_state.practice_id = 5
+    st.session_state.practice_settings = PracticeSettings('Random', ('C',), ('Major',), 4, 120, 40, 1)
+    st.session_state.window_start = 0
+    st.session_state.received_measure = 0
+    
+    # Lost on the way: sent again on the next rerun
+    assert player_chunk()['start'] == 0
+    assert player_chunk()['start'] == 0
+    handle_player_request({'session': 5, 'received': 16, 'need': None})
+    assert player_chunk() is None
+    
+    # Requests are served by measure, and retries change nothing
+    for _ in range(2):
+        handle_player_request({'session': 5, 'received': 16, 'need': 16})
+        assert player_chunk()['start'] == 16
+    handle_player_request({'session': 4, 'received': 0, 'need': 0})
+    assert st.session_state.window_start == 16
+    handle_player_request({'session': 5, 'received': 32, 'need': 32})
+    assert player_chunk()['final']
+    
+    # Nothing past the final window or beyond the next one
+    handle_player_request({'session': 5, 'received': 40, 'need': 48})
+    handle_player_request({'session': 5, 'received': 40, 'need': 80})
+    assert st.session_state.window_start == 32
+    assert player_chunk() is None